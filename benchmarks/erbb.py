@@ -0,0 +1,62 @@
+"""Synthetic inputs shaped like the ErbB network used in the breast cancer example."""
+
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+GENE_EXPRESSION: Dict[str, List[str]] = {
+    "ErbB1": ["EGFR"],
+    "ErbB2": ["ERBB2"],
+    "ErbB3": ["ERBB3"],
+    "ErbB4": ["ERBB4"],
+    "Grb2": ["GRB2"],
+    "Shc": ["SHC1", "SHC2", "SHC3", "SHC4"],
+    "RasGAP": ["RASA1", "RASA2", "RASA3"],
+    "PI3K": ["PIK3CA", "PIK3CB", "PIK3CD", "PIK3CG"],
+    "PTEN": ["PTEN"],
+    "SOS": ["SOS1", "SOS2"],
+    "Gab1": ["GAB1"],
+    "RasGDP": ["HRAS", "KRAS", "NRAS"],
+    "Raf": ["ARAF", "BRAF", "RAF1"],
+    "MEK": ["MAP2K1", "MAP2K2"],
+    "ERK": ["MAPK1", "MAPK3"],
+    "Akt": ["AKT1", "AKT2"],
+    "PTP1B": ["PTPN1"],
+    "GSK3b": ["GSK3B"],
+    "DUSP": ["DUSP5", "DUSP6", "DUSP7"],
+    "cMyc": ["MYC"],
+}
+GENES: List[str] = [gene for genes in GENE_EXPRESSION.values() for gene in genes]
+# 610 parameters and 228 species, as in the ErbB model with weighting factors.
+PARAMETERS: List[str] = (
+    [f"k{i}" for i in range(290)]
+    + ["V291"]
+    + [f"k{i}" for i in range(291, 310)]
+    + ["V310"]
+    + [f"k{i}" for i in range(311, 572)]
+    + [f"w_{gene}" for gene in GENES]
+)
+SPECIES: List[str] = list(GENE_EXPRESSION) + [f"s{i}" for i in range(228 - len(GENE_EXPRESSION))]
+
+
+def write_transcriptome(
+    path: str,
+    n_samples: int = 368,
+    n_genes: int = 20000,
+    seed: int = 0,
+) -> List[str]:
+    """
+    Write a synthetic, RLE-normalized-like expression table and return its sample names.
+    """
+    rng = np.random.default_rng(seed)
+    samples = [f"TCGA_{i:04d}" for i in range(n_samples)]
+    index = GENES + [f"GENE{i}" for i in range(n_genes - len(GENES))]
+    df = pd.DataFrame(
+        rng.lognormal(0.0, 0.3, (len(index), n_samples)), index=index, columns=samples
+    )
+    df.index.name = "Description"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    df.to_csv(path)
+    return samples
@@ -0,0 +1,117 @@
+"""
+Per-call latency of Individualization on the ErbB gene map.
+
+Usage: python benchmarks/individualization.py
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from erbb import GENE_EXPRESSION, PARAMETERS, SPECIES, write_transcriptome  # noqa: E402
+
+from pasmopy import Individualization  # noqa: E402
+
+
+def baseline_weighted_sum(indiv, id, x):
+    """Implementation prior to the compiled gene map."""
+    weighted_sum = dict.fromkeys(indiv.gene_expression, 0.0)
+    for protein, genes in indiv.gene_expression.items():
+        for gene in genes:
+            weighted_sum[protein] += (
+                x[indiv.parameters.index(indiv.prefix + gene)]
+                * indiv.expression_level.at[gene, id]
+            )
+    return weighted_sum
+
+
+def baseline_as_reaction_rate(indiv, id, x, param_name, protein):
+    weighted_sum = baseline_weighted_sum(indiv, id, x)
+    return x[indiv.parameters.index(param_name)] * weighted_sum[protein]
+
+
+def baseline_as_initial_conditions(indiv, id, x, y0):
+    weighted_sum = baseline_weighted_sum(indiv, id, x)
+    for protein in indiv.gene_expression.keys():
+        y0[indiv.species.index(protein)] *= weighted_sum[protein]
+    return y0
+
+
+def main(number: int = 2000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "transcriptome.csv")
+        samples = write_transcriptome(path, n_samples=368, n_genes=2000)
+        indiv = Individualization(
+            parameters=PARAMETERS,
+            species=SPECIES,
+            transcriptomic_data=path,
+            gene_expression=GENE_EXPRESSION,
+            read_csv_kws={"index_col": "Description"},
+            cache=False,
+        )
+    id = samples[0]
+    x = list(np.random.default_rng(0).uniform(0.1, 10.0, len(PARAMETERS)))
+    y0 = [1.0] * len(SPECIES)
+
+    def update_baseline():
+        baseline_as_reaction_rate(indiv, id, x, "V291", "DUSP")
+        baseline_as_reaction_rate(indiv, id, x, "V310", "cMyc")
+        baseline_as_initial_conditions(indiv, id, x, list(y0))
+
+    def update_compiled():
+        indiv.as_reaction_rate(id, x, "V291", "DUSP")
+        indiv.as_reaction_rate(id, x, "V310", "cMyc")
+        indiv.as_initial_conditions(id, x, list(y0))
+
+    rows = [
+        (
+            "as_reaction_rate",
+            lambda: baseline_as_reaction_rate(indiv, id, x, "V291", "DUSP"),
+            lambda: indiv.as_reaction_rate(id, x, "V291", "DUSP"),
+        ),
+        (
+            "as_initial_conditions",
+            lambda: baseline_as_initial_conditions(indiv, id, x, list(y0)),
+            lambda: indiv.as_initial_conditions(id, x, list(y0)),
+        ),
+        ("SearchParam.update (3 calls)", update_baseline, update_compiled),
+    ]
+    print(f"{'':30s} {'before [us]':>12s} {'after [us]':>12s} {'speedup':>8s}")
+    for name, before, after in rows:
+        t_before = min(timeit.repeat(before, number=number // 10, repeat=5)) / (number // 10)
+        t_after = min(timeit.repeat(after, number=number, repeat=5)) / number
+        print(
+            f"{name:30s} {t_before * 1e6:12.1f} {t_after * 1e6:12.1f} "
+            f"{t_before / t_after:7.0f}x"
+        )
+
+    def cohort_loop():
+        for patient in samples:
+            x_patient = list(x)
+            x_patient[PARAMETERS.index("V291")] = indiv.as_reaction_rate(
+                patient, x_patient, "V291", "DUSP"
+            )
+            x_patient[PARAMETERS.index("V310")] = indiv.as_reaction_rate(
+                patient, x_patient, "V310", "cMyc"
+            )
+            indiv.as_initial_conditions(patient, x_patient, list(y0))
+
+    def cohort_batched():
+        indiv.as_cohort(samples, x, y0, {"V291": "DUSP", "V310": "cMyc"})
+
+    t_loop = min(timeit.repeat(cohort_loop, number=10, repeat=5)) / 10
+    t_batched = min(timeit.repeat(cohort_batched, number=10, repeat=5)) / 10
+    print(
+        f"{f'cohort of {len(samples)} patients':30s} {t_loop * 1e6:12.1f} "
+        f"{t_batched * 1e6:12.1f} {t_loop / t_batched:7.0f}x  (per-patient loop -> as_cohort)"
+    )
+
+
+if __name__ == "__main__":
+    main()
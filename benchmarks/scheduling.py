@@ -0,0 +1,73 @@
+"""
+Makespan of InSilico.parallel_execute on a skewed workload: list order vs longest-first
+scheduling from the runtime history.
+
+Patients sleep for a lognormally distributed time, so that a few of them take several
+times longer than the others. The first run has no history and executes patients in list
+order; the second run starts the patients recorded as slowest first.
+
+Usage: python benchmarks/scheduling.py [n_patients] [n_proc]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pasmopy import WorkerPool  # noqa: E402
+from pasmopy.patient_model import PatientModelSimulations  # noqa: E402
+
+N_PATIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+# Seconds per patient, median 0.05 s; the slowest take ~20 times the median.
+DURATIONS = {
+    f"P{i}": d for i, d in enumerate(0.05 * np.random.default_rng(0).lognormal(0, 1.2, N_PATIENTS))
+}
+
+
+def _simulate(patient: str) -> None:
+    time.sleep(DURATIONS[patient])
+
+
+def _lpt(durations: list, n_proc: int) -> float:
+    """
+    Makespan of greedy list scheduling of durations in the given order.
+    """
+    finish = np.zeros(n_proc)
+    for d in durations:
+        finish[np.argmin(finish)] += d
+    return float(finish.max())
+
+
+def main(n_proc: int = 4) -> None:
+    durations = list(DURATIONS.values())
+    print(
+        f"{N_PATIENTS} patients, {n_proc} processes, total {sum(durations):.2f} s, "
+        f"slowest {max(durations):.2f} s, lower bound {sum(durations) / n_proc:.2f} s"
+    )
+    print(f"{'schedule':<20}{'expected [s]':>14}{'measured [s]':>14}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        os.makedirs("cohort")
+        executor = PatientModelSimulations(
+            "cohort", list(DURATIONS), runtime_history="runtime_history.json"
+        )
+        with WorkerPool(n_proc=n_proc) as pool:
+            # Wait until the workers have started.
+            list(pool.imap(abs, range(n_proc)))
+            for name, expected in [
+                ("list order", _lpt(durations, n_proc)),
+                ("longest first", _lpt(sorted(durations, reverse=True), n_proc)),
+            ]:
+                start = time.perf_counter()
+                executor.parallel_execute(_simulate, n_proc, "spawn", progress=False, pool=pool)
+                print(f"{name:<20}{expected:>14.2f}{time.perf_counter() - start:>14.2f}")
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[2:3]))
@@ -0,0 +1,98 @@
+"""
+Disk footprint, load time and feature error of compact storage of simulation results.
+
+A patient's simulations_all.npy is replicated to a cohort of n_patients, stored with
+each storage_kws and loaded back; response characteristics are compared with those
+extracted from the full-precision results.
+
+Usage: python benchmarks/storage.py path/to/simulation_data [n_patients]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pasmopy import PatientModelSimulations  # noqa: E402
+from pasmopy.features import extract_features  # noqa: E402
+from pasmopy.store import compact_simulations, load_simulations  # noqa: E402
+
+STORAGE_KWS = {
+    "full": {},
+    "float32": {"dtype": "float32"},
+    "compress": {"compress": True},
+    "float32+compress": {"dtype": "float32", "compress": True},
+    "decimate 2": {"decimate": 2},
+    "float32+decimate 4+compress": {"dtype": "float32", "decimate": 4, "compress": True},
+}
+METRICS = ["max", "AUC", "time_to_peak", "half_decay_time", "steady_state", "droprate"]
+
+
+def _features(data: np.ndarray) -> np.ndarray:
+    conditions = [f"c{i}" for i in range(data.shape[-2])]
+    normalized = PatientModelSimulations._normalize(
+        data[:, 0].copy(), conditions, "obs", {"obs": {"timepoint": None, "condition": []}}
+    )
+    return extract_features(
+        normalized,
+        [str(i) for i in range(len(data))],
+        conditions,
+        {c: METRICS for c in conditions},
+        PatientModelSimulations("models", []).response_characteristics,
+    ).to_numpy()
+
+
+def main(simulation_data: str, n_patients: int = 200) -> None:
+    original = np.load(os.path.join(simulation_data, "simulations_all.npy"))
+    print(f"simulations_all.npy {original.shape}, {n_patients} patients")
+    print("Maximum error of features relative to the cohort-wide maximum of each feature")
+    print(
+        f"{'storage':<30}{'disk [MB]':>10}{'load [s]':>10}"
+        + "".join(f"{metric:>16}" for metric in METRICS)
+    )
+    reference = None
+    for name, storage_kws in STORAGE_KWS.items():
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i in range(n_patients):
+                dirname = os.path.join(tmpdir, str(i))
+                os.makedirs(dirname)
+                # Perturbed copies, so that compression does not see identical patients
+                np.save(
+                    os.path.join(dirname, "simulations_all.npy"),
+                    original * rng.uniform(0.9, 1.1, original.shape[:-1] + (1,)),
+                )
+                if storage_kws:
+                    compact_simulations(dirname, range(original.shape[-1]), storage_kws)
+            disk = sum(
+                os.path.getsize(os.path.join(tmpdir, str(i), f))
+                for i in range(n_patients)
+                for f in os.listdir(os.path.join(tmpdir, str(i)))
+            )
+            start = time.perf_counter()
+            data = np.stack(
+                [load_simulations(os.path.join(tmpdir, str(i))) for i in range(n_patients)]
+            )
+            elapsed = time.perf_counter() - start
+            features = _features(data)
+            if reference is None:
+                reference = features
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                scale = np.nanmax(np.abs(reference), axis=0)
+                error = np.abs(features - reference) / np.where(scale > 0, scale, 1)
+                error = [np.nanmax(error[:, i :: len(METRICS)]) for i in range(len(METRICS))]
+            print(
+                f"{name:<30}{disk / 1e6:>10.2f}{elapsed:>10.3f}"
+                + "".join(f"{e:>16.2e}" for e in error)
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], *map(int, sys.argv[2:3]))
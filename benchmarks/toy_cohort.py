@@ -0,0 +1,140 @@
+"""
+Toy cohort shared by benchmarks and tests: a small signaling model individualized with
+synthetic transcriptomic data, as patient-specific models and as overlays.
+"""
+
+import os
+import shutil
+import sys
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from pasmopy import Text2Model, create_model
+from pasmopy.patient_model import _shared_models
+from pasmopy.preprocessing import WeightingFactors
+
+TOY_NETWORK = """\
+L binds R <--> LR | kf=0.1, kr=0.1 | R=1
+LR is phosphorylated --> pLR | kf=0.1
+pLR is dephosphorylated --> LR | V=0.1, K=1
+pLR phosphorylates E --> pE | V=0.5, K=1 | E=1
+pE is dephosphorylated --> E | V=0.1, K=1
+
+@obs Phosphorylated_E: u[pE]
+@obs Active_receptor: u[pLR]
+
+@sim tspan: [0, 60]
+@sim condition high: init[L] = 10.0
+@sim condition low: init[L] = 1.0
+"""
+
+GENE_EXPRESSION = {"R": ["GENE_R"], "E": ["GENE_E1", "GENE_E2"]}
+
+PATIENTS: List[str] = ["P1", "P2", "P3"]
+
+N_PARAMSETS: int = 3
+
+INDIVIDUALIZATION = """\
+import os
+from pasmopy import Individualization
+
+from . import __path__
+
+incorporating_gene_expression_levels = Individualization(
+    parameters=C.NAMES,
+    species=V.NAMES,
+    transcriptomic_data={transcriptome!r},
+    gene_expression={gene_expression!r},
+    read_csv_kws={{"index_col": "Description"}},
+    cache=False,
+)
+"""
+
+INCORPORATION = """\
+        y0 = incorporating_gene_expression_levels.as_initial_conditions({id}, x, y0)
+"""
+
+# ID passed by the patient-specific copies; the shared model leaves it to PatientOverlay.
+PATIENT_ID = "__path__[0].split(os.sep)[-1]"
+
+
+def build_toy_model(root: str) -> None:
+    """
+    Create toy_models/toy (shared model) and toy_models/P* (patient-specific copies),
+    each with estimated parameter sets in out/.
+    """
+    # Toy models built for another test module in another directory
+    for module in [m for m in sys.modules if m.split(".")[0] == "toy_models"]:
+        del sys.modules[module]
+    _shared_models.clear()
+    transcriptome = os.path.join(root, "transcriptome.csv")
+    genes = [gene for genes in GENE_EXPRESSION.values() for gene in genes]
+    df = pd.DataFrame(
+        np.random.default_rng(0).uniform(0.5, 2.0, (len(genes), len(PATIENTS))),
+        index=genes,
+        columns=PATIENTS,
+    )
+    df.index.name = "Description"
+    df.to_csv(transcriptome)
+
+    modeldir = os.path.join(root, "toy_models", "toy")
+    os.makedirs(os.path.dirname(modeldir))
+    with open(modeldir + ".txt", mode="w") as f:
+        f.write(TOY_NETWORK)
+    Text2Model(modeldir + ".txt").convert()
+    # Options of the solver set by retry_solver
+    with open(os.path.join(modeldir, "observable.py")) as f:
+        code = f.read()
+    code = code.replace(
+        "        super(Observable, self).__init__(perturbation={})\n",
+        "        super(Observable, self).__init__(perturbation={})\n"
+        "        self.solver_options = {}\n",
+    ).replace(
+        "solve_ode(self.diffeq, y0, self.t, tuple(x))",
+        "solve_ode(self.diffeq, y0, self.t, tuple(x), **self.solver_options)",
+    )
+    with open(os.path.join(modeldir, "observable.py"), mode="w") as f:
+        f.write(code)
+    model = create_model("toy_models.toy")
+    weighting_factors = WeightingFactors(model, GENE_EXPRESSION)
+    weighting_factors.add_to_params()
+    weighting_factors.set_search_bounds()
+    with open(os.path.join(modeldir, "search_param.py")) as f:
+        code = f.read()
+    code = code.replace(
+        "from .ode import initial_values, param_values\n",
+        "from .ode import initial_values, param_values\n\n"
+        + INDIVIDUALIZATION.format(transcriptome=transcriptome, gene_expression=GENE_EXPRESSION),
+    )
+    code = code.replace(
+        "        return x, y0\n", INCORPORATION.format(id=None) + "\n        return x, y0\n"
+    )
+    with open(os.path.join(modeldir, "search_param.py"), mode="w") as f:
+        f.write(code)
+    for module in [m for m in sys.modules if m.startswith("toy_models.toy")]:
+        del sys.modules[module]
+
+    model = create_model("toy_models.toy")
+    bounds = model.problem.get_region()
+    n_estimated = len(model.problem.idx_params) + len(model.problem.idx_initials)
+    rng = np.random.default_rng(1)
+    for paramset in range(1, N_PARAMSETS + 1):
+        out = os.path.join(root, "out", f"{paramset:d}")
+        os.makedirs(out)
+        indiv = model.gene2val(rng.uniform(0.4, 0.6, bounds.shape[1]))
+        indiv = indiv[np.nonzero(bounds[0])[0]][:n_estimated]
+        np.save(os.path.join(out, "generation.npy"), 1)
+        np.save(os.path.join(out, "fit_param1.npy"), indiv)
+        np.save(os.path.join(out, "best_fitness.npy"), rng.uniform())
+    for patient in PATIENTS:
+        shutil.copytree(modeldir, os.path.join(root, "toy_models", patient))
+        with open(os.path.join(root, "toy_models", patient, "search_param.py"), mode="w") as f:
+            f.write(
+                code.replace(INCORPORATION.format(id=None), INCORPORATION.format(id=PATIENT_ID))
+            )
+        shutil.copytree(
+            os.path.join(root, "out"), os.path.join(root, "toy_models", patient, "out")
+        )
+        shutil.copytree(os.path.join(root, "out"), os.path.join(root, "overlays", patient, "out"))
@@ -0,0 +1,75 @@
+"""
+Startup cost of loading transcriptomic_data: full CSV parse vs pruned vs binary cache.
+
+Each variant runs in a fresh interpreter so that wall time and peak RSS are comparable.
+
+Usage: python benchmarks/transcriptome.py [path/to/transcriptome.csv]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from erbb import GENES, write_transcriptome  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+from pasmopy.transcriptome import load_expression_level
+start = time.perf_counter()
+if {mode!r} == "full":
+    df = pd.read_csv({path!r}, index_col="Description")
+else:
+    df = load_expression_level(
+        {path!r}, {genes!r}, {samples!r}, {{"index_col": "Description"}}, {cache_dir!r}
+    )
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "shape": list(df.shape),
+}}))
+"""
+
+
+def measure(mode, path, samples=None, cache_dir=None):
+    code = SCRIPT.format(
+        root=ROOT, mode=mode, path=path, genes=GENES, samples=samples, cache_dir=cache_dir
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+            with open(path) as f:
+                sample = f.readline().strip().split(",")[1]
+        else:
+            path = os.path.join(tmpdir, "transcriptome.csv")
+            sample = write_transcriptome(path, n_samples=368, n_genes=20000)[0]
+        cache_dir = os.path.join(tmpdir, "cache")
+        rows = [
+            ("pandas.read_csv (all genes)", measure("full", path)),
+            ("pruned (mapped genes)", measure("pruned", path)),
+            ("pruned (1 sample)", measure("pruned", path, [sample])),
+            ("pruned + cache (cold)", measure("pruned", path, [sample], cache_dir)),
+            ("pruned + cache (warm)", measure("pruned", path, [sample], cache_dir)),
+        ]
+        print(f"{'':30s} {'time [s]':>9s} {'peak RSS [MB]':>14s} {'shape':>14s}")
+        for name, r in rows:
+            print(
+                f"{name:30s} {r['elapsed']:9.3f} {r['maxrss']:14.1f} {str(tuple(r['shape'])):>14s}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Startup overhead of InSilico.parallel_execute: a fresh pool per run() vs one warm WorkerPool.
+
+Usage: python benchmarks/worker_pool.py [n_runs] [n_proc]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from toy_cohort import PATIENTS, build_toy_model  # noqa: E402
+
+from pasmopy import PatientModelSimulations, PatientOverlay, WorkerPool  # noqa: E402
+
+
+def main(n_runs: int = 3, n_proc: int = 2) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        sys.path.insert(0, tmpdir)
+        build_toy_model(tmpdir)
+        patients = [PatientOverlay(p, os.path.join("overlays", p)) for p in PATIENTS]
+        simulations = PatientModelSimulations("toy_models.toy", patients)
+
+        fresh = []
+        for _ in range(n_runs):
+            start = time.perf_counter()
+            simulations.run(n_proc=n_proc, progress=False)
+            fresh.append(time.perf_counter() - start)
+
+        warm = []
+        start = time.perf_counter()
+        with WorkerPool(n_proc=n_proc, preload=["toy_models.toy"]) as pool:
+            # Wait until the workers have finished importing.
+            list(pool.imap(abs, range(n_proc)))
+            startup = time.perf_counter() - start
+            for _ in range(n_runs):
+                start = time.perf_counter()
+                simulations.run(pool=pool, progress=False)
+                warm.append(time.perf_counter() - start)
+        os.chdir(ROOT)
+
+    print(f"{len(PATIENTS)} patients, {n_proc} workers (spawn)")
+    print(f"{'run':>4s} {'fresh pool [s]':>15s} {'warm pool [s]':>14s}")
+    for i, (a, b) in enumerate(zip(fresh, warm), start=1):
+        print(f"{i:4d} {a:15.2f} {b:14.2f}")
+    print(f"{'sum':>4s} {sum(fresh):15.2f} {sum(warm) + startup:14.2f}  (warm includes startup)")
+    print(f"warm pool startup (once): {startup:.2f} s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -5,7 +5,16 @@ from biomass.core import *
 from biomass.result import OptimizationResults
 
 from .individualization import Individualization
-from .patient_model import PatientModelAnalyses, PatientModelSimulations
+from .parallel import WorkerPool
+from .patient_model import (
+    PatientCharacteristics,
+    PatientModelAnalyses,
+    PatientModelSimulations,
+    PatientOverlay,
+    TaskFailure,
+)
+from .profiling import Profiling
+from .store import CohortStore
 from .version import __version__
 
 __author__ = __maintainer__ = "Hiroaki Imoto"
@@ -0,0 +1,278 @@
+import argparse
+import copy
+import glob
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from .features import load_features, save_features
+from .patient_model import PatientModelSimulations, PatientOverlay
+
+
+@dataclass
+class Job(object):
+    """
+    A cohort run, read from a JSON job spec by ``pasmopy run`` and ``pasmopy merge``.
+    Relative paths are resolved from the working directory, from which
+    ``path_to_models`` is also imported.
+
+    Attributes
+    ----------
+    path_to_models : str
+        Path (dot-separated) to the directory containing patient-specific models,
+        or to the shared model package if ``overlay`` is given.
+
+    patients : list of strings or str
+        Patients' names or identifiers, or a text file listing one per line.
+
+    overlay : str, optional
+        Directory of each patient's parameter sets, e.g., ``"patients/{patient}"``.
+        If given, patients are simulated as :class:`~pasmopy.patient_model.PatientOverlay`.
+
+    biomass_kws, storage_kws : dict, optional
+        See :class:`~pasmopy.patient_model.PatientModelSimulations`.
+
+    dynamical_features : dict, optional
+        ``{"observable": {"condition": ["metric", ...], ...}, ...}``.
+        If given, response characteristics of each shard are extracted after simulation.
+
+    normalization : dict, optional
+        Normalization condition of each observable, see ``subtyping()``.
+
+    run_kws : dict, optional
+        Keyword arguments to pass to ``PatientModelSimulations.run()``, e.g.,
+        ``{"n_proc": "auto", "render": false, "retries": 1}``.
+
+    output : str (default: "shards")
+        Directory of the outputs of each shard, ``shard-{i}-of-{n}/``,
+        and of the merged outputs.
+    """
+
+    path_to_models: str
+    patients: Union[List[str], str]
+    overlay: Optional[str] = None
+    biomass_kws: Optional[dict] = None
+    storage_kws: Optional[dict] = None
+    dynamical_features: Optional[dict] = None
+    normalization: Optional[dict] = None
+    run_kws: dict = field(default_factory=dict)
+    output: str = "shards"
+
+    def __post_init__(self) -> None:
+        if isinstance(self.patients, str):
+            with open(self.patients, mode="r") as f:
+                self.patients = [line.strip() for line in f if line.strip()]
+
+    @classmethod
+    def load(cls, path: str) -> "Job":
+        """
+        Read a job spec.
+        """
+        with open(path, mode="r") as f:
+            spec = json.load(f)
+        unknown = set(spec) - {attr.name for attr in fields(cls)}
+        if unknown:
+            raise ValueError(
+                "{}: unknown keys: {}.".format(path, ", ".join(sorted(map(repr, unknown))))
+            )
+        return cls(**spec)
+
+    def cohort(self, patients: Sequence[str]) -> List[Union[str, PatientOverlay]]:
+        if self.overlay is None:
+            return list(patients)
+        return [
+            PatientOverlay(patient, self.overlay.format(patient=patient)) for patient in patients
+        ]
+
+    def shard(self, i: int, n: int) -> List[str]:
+        """
+        Patients of the i-th of n shards, every n-th patient starting from the i-th,
+        so that slow patients that are listed together are spread over shards.
+        """
+        return self.patients[i::n]
+
+    def shard_dir(self, i: int, n: int) -> str:
+        return os.path.join(self.output, f"shard-{i:d}-of-{n:d}")
+
+
+def _shard(value: str) -> Tuple[int, int]:
+    """
+    Parse ``i/N``, 0 <= i < N.
+    """
+    match = re.fullmatch(r"(\d+)/(\d+)", value)
+    if match is None or not int(match[1]) < int(match[2]):
+        raise argparse.ArgumentTypeError(f"expected i/N with 0 <= i < N, got {value!r}")
+    return int(match[1]), int(match[2])
+
+
+def _n_proc(value: str) -> Union[int, str]:
+    return value if value == "auto" else int(value)
+
+
+def run(job: Job, i: int, n: int, n_proc: Optional[Union[int, str]] = None) -> int:
+    """
+    Simulate the patients of a shard and extract their response characteristics.
+    Returns 1 if any patient failed.
+    """
+    start = time.perf_counter()
+    patients = job.shard(i, n)
+    simulations = PatientModelSimulations(
+        job.path_to_models,
+        job.cohort(patients),
+        biomass_kws=copy.deepcopy(job.biomass_kws),
+        storage_kws=job.storage_kws,
+    )
+    kwargs = dict(job.run_kws)
+    kwargs.setdefault("progress", False)
+    if n_proc is not None:
+        kwargs["n_proc"] = n_proc
+    if patients:
+        simulations.run(**kwargs)
+    failed = {failure.patient for failure in simulations.failures}
+    if kwargs.get("split_paramsets"):
+        # A failed parameter set, named {patient}/{n}, fails its patient.
+        failed |= {patient.rsplit("/", 1)[0] for patient in failed}
+    succeeded = [patient for patient in patients if patient not in failed]
+    os.makedirs(job.shard_dir(i, n), exist_ok=True)
+    if job.dynamical_features is not None:
+        simulations.patients = job.cohort(succeeded)
+        characteristics = (
+            simulations.extract_characteristics(
+                job.dynamical_features,
+                copy.deepcopy(job.normalization),
+                progress=False,
+                n_proc=kwargs.get("n_proc"),
+            )
+            if succeeded
+            else {}
+        )
+        save_features(
+            os.path.join(job.shard_dir(i, n), "features.npz"),
+            characteristics,
+            job.dynamical_features,
+            job.normalization,
+        )
+    with open(os.path.join(job.shard_dir(i, n), "shard.json"), mode="w") as f:
+        json.dump(
+            dict(
+                shard=i,
+                n_shards=n,
+                patients=succeeded,
+                failures=[
+                    dict(
+                        patient=failure.patient,
+                        exception=repr(failure.exception),
+                        elapsed=failure.elapsed,
+                        attempts=failure.attempts,
+                    )
+                    for failure in simulations.failures
+                ],
+                elapsed=time.perf_counter() - start,
+            ),
+            f,
+            indent=2,
+        )
+    print(f"shard {i:d}/{n:d}: {len(succeeded):d} of {len(patients):d} patients simulated.")
+    return 1 if failed else 0
+
+
+def merge(job: Job) -> int:
+    """
+    Combine the outputs of all shards into ``{output}/features.npz`` and
+    ``{output}/merged.json``. Returns 1 if any patient failed.
+    """
+    shards: Dict[str, dict] = {}
+    for path in glob.glob(os.path.join(job.output, "shard-*-of-*", "shard.json")):
+        with open(path, mode="r") as f:
+            shards[os.path.dirname(path)] = json.load(f)
+    if not shards:
+        raise FileNotFoundError(f"No shards in {job.output}. Run 'pasmopy run' first.")
+    if len({shard["n_shards"] for shard in shards.values()}) > 1:
+        raise ValueError(f"{job.output} contains shards of different runs.")
+    n = next(iter(shards.values()))["n_shards"]
+    missing = sorted(set(range(n)) - {shard["shard"] for shard in shards.values()})
+    if missing:
+        raise ValueError("Missing shards: {}.".format(", ".join(f"{i:d}/{n:d}" for i in missing)))
+    succeeded = {patient for shard in shards.values() for patient in shard["patients"]}
+    failures = [failure for shard in shards.values() for failure in shard["failures"]]
+    unknown = succeeded - set(job.patients)
+    if unknown:
+        raise ValueError("Patients not in the job: {}.".format(", ".join(sorted(unknown))))
+    patients = [patient for patient in job.patients if patient in succeeded]
+    if job.dynamical_features is not None:
+        per_shard = [
+            load_features(os.path.join(dirname, "features.npz"))[0]
+            for dirname, shard in sorted(shards.items())
+            if shard["patients"]
+        ]
+        characteristics = {
+            obs_name: pd.concat([features[obs_name] for features in per_shard]).loc[patients]
+            for obs_name in job.dynamical_features
+        }
+        save_features(
+            os.path.join(job.output, "features.npz"),
+            characteristics,
+            job.dynamical_features,
+            job.normalization,
+        )
+    with open(os.path.join(job.output, "merged.json"), mode="w") as f:
+        json.dump(dict(n_shards=n, patients=patients, failures=failures), f, indent=2)
+    print(
+        f"{n:d} shards: {len(patients):d} of {len(job.patients):d} patients merged"
+        + (
+            ". Failed: " + ", ".join(failure["patient"] for failure in failures)
+            if failures
+            else "."
+        )
+    )
+    return 1 if failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point of the ``pasmopy`` command.
+
+    Examples
+    --------
+    Simulate a cohort in four shards, e.g., as four jobs of a batch array,
+    then combine their response characteristics::
+
+        $ pasmopy run job.json --shard 0/4
+        ...
+        $ pasmopy run job.json --shard 3/4
+        $ pasmopy merge job.json
+    """
+    parser = argparse.ArgumentParser(prog="pasmopy", description="Patient-Specific Modeling")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="simulate the patients of a shard")
+    run_parser.add_argument("job", help="JSON job spec")
+    run_parser.add_argument(
+        "--shard",
+        type=_shard,
+        default=(0, 1),
+        help="i/N: simulate the i-th (0-based) of N shards of patients (default: 0/1)",
+    )
+    run_parser.add_argument(
+        "--n-proc", type=_n_proc, default=None, help="worker processes, overrides the job spec"
+    )
+    merge_parser = subparsers.add_parser("merge", help="combine the outputs of all shards")
+    merge_parser.add_argument("job", help="JSON job spec")
+    args = parser.parse_args(argv)
+
+    # Model packages are imported from the working directory, as in a script.
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    try:
+        job = Job.load(args.job)
+        if args.command == "run":
+            return run(job, *args.shard, n_proc=args.n_proc)
+        return merge(job)
+    except (OSError, ValueError) as e:
+        print(f"pasmopy: error: {e}", file=sys.stderr)
+        return 2
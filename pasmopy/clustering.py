@@ -0,0 +1,391 @@
+import json
+from dataclasses import dataclass, field
+from typing import Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, leaves_list
+
+
+def ward_linkage(X: np.ndarray) -> np.ndarray:
+    """
+    Ward's hierarchical clustering in O(N) memory.
+
+    Clusters are merged with the nearest-neighbor chain algorithm on cluster centroids,
+    using the Ward distance :math:`\\sqrt{2 n_a n_b / (n_a + n_b)} \\lVert c_a - c_b \\rVert`,
+    so no pairwise distance matrix is formed.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        Observations of shape (N, features).
+
+    Returns
+    -------
+    Z : numpy.ndarray
+        Linkage matrix in the format of ``scipy.cluster.hierarchy.linkage(X, "ward")``.
+    """
+    X = np.asarray(X, dtype=float)
+    n = len(X)
+    if n < 2:
+        raise ValueError("At least two observations are required.")
+    centroids = X.copy()
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    merges = np.empty((n - 1, 3))  # (a, b, distance), a and b: indices of observations
+    chain = []
+
+    def distance(a: int) -> np.ndarray:
+        d = np.sqrt(
+            2
+            * sizes[a]
+            * sizes
+            / (sizes[a] + sizes)
+            * np.sum((centroids - centroids[a]) ** 2, axis=1)
+        )
+        d[~active] = np.inf
+        d[a] = np.inf
+        return d
+
+    for k in range(n - 1):
+        if not chain:
+            chain.append(int(np.flatnonzero(active)[0]))
+        while True:
+            a = chain[-1]
+            d = distance(a)
+            b = int(np.argmin(d))
+            # Prefer the previous element of the chain on ties to guarantee termination.
+            if len(chain) > 1 and d[chain[-2]] <= d[b]:
+                b = chain[-2]
+                break
+            chain.append(b)
+        chain = chain[:-2]
+        merges[k] = a, b, d[b]
+        # The merged cluster is kept in the slot of b.
+        centroids[b] = (sizes[a] * centroids[a] + sizes[b] * centroids[b]) / (sizes[a] + sizes[b])
+        sizes[b] += sizes[a]
+        active[a] = False
+    return _label(merges, n)
+
+
+def _label(merges: np.ndarray, n: int) -> np.ndarray:
+    """
+    Sort merges by distance and relabel clusters as in ``scipy.cluster.hierarchy``.
+    """
+    merges = merges[np.argsort(merges[:, 2], kind="mergesort")]
+    parent = np.arange(2 * n - 1)
+    size = np.ones(2 * n - 1)
+
+    def find(x: int) -> int:
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    Z = np.empty((n - 1, 4))
+    for i, (a, b, d) in enumerate(merges):
+        x, y = sorted((find(int(a)), find(int(b))))
+        parent[x] = parent[y] = n + i
+        size[n + i] = size[x] + size[y]
+        Z[i] = x, y, d, size[n + i]
+    return Z
+
+
+def minibatch_kmeans(
+    X: np.ndarray,
+    n_clusters: int,
+    batch_size: int = 1024,
+    max_iter: int = 100,
+    random_state: Optional[int] = 0,
+) -> np.ndarray:
+    """
+    Mini-batch k-means (Sculley, 2010) with k-means++ initialization.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        Observations of shape (N, features).
+
+    n_clusters : int
+        The number of clusters.
+
+    batch_size : int (default: 1024)
+        The number of observations per iteration.
+
+    max_iter : int (default: 100)
+        The maximum number of iterations.
+
+    random_state : int, optional
+        Seed of the random number generator.
+
+    Returns
+    -------
+    centroids : numpy.ndarray
+        Cluster centroids of shape (n_clusters, features).
+    """
+    X = np.asarray(X, dtype=float)
+    if not 0 < n_clusters <= len(X):
+        raise ValueError("n_clusters must be between 1 and the number of observations.")
+    rng = np.random.default_rng(random_state)
+    # k-means++ on a sample
+    sample = X[rng.choice(len(X), min(len(X), max(batch_size, 10 * n_clusters)), replace=False)]
+    centroids = [sample[rng.integers(len(sample))]]
+    d2 = np.sum((sample - centroids[0]) ** 2, axis=1)
+    for _ in range(1, n_clusters):
+        p = d2 / d2.sum() if d2.sum() > 0 else None
+        centroids.append(sample[rng.choice(len(sample), p=p)])
+        d2 = np.minimum(d2, np.sum((sample - centroids[-1]) ** 2, axis=1))
+    centroids = np.array(centroids)
+    counts = np.zeros(n_clusters)
+    for _ in range(max_iter):
+        batch = X[rng.choice(len(X), min(batch_size, len(X)), replace=False)]
+        labels = _nearest(batch, centroids)
+        previous = centroids.copy()
+        for j in np.unique(labels):
+            members = batch[labels == j]
+            counts[j] += len(members)
+            # Per-center learning rate 1 / count
+            centroids[j] += (members.sum(axis=0) - len(members) * centroids[j]) / counts[j]
+        if np.allclose(previous, centroids, rtol=0, atol=1e-8):
+            break
+    return centroids
+
+
+def _nearest(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmin(
+        np.sum(X**2, axis=1)[:, np.newaxis]
+        - 2 * X @ centroids.T
+        + np.sum(centroids**2, axis=1)[np.newaxis],
+        axis=1,
+    )
+
+
+@dataclass
+class Subtypes(object):
+    """
+    Subtype classification of patients based on their response characteristics.
+
+    Features are z-scored per column, then clustered.
+
+    Attributes
+    ----------
+    n_clusters : int (default: 4)
+        The number of subtypes.
+
+    method : Literal["ward", "kmeans"] (default: "ward")
+        * 'ward' : Exact Ward's hierarchical clustering with O(N) memory.
+        * 'kmeans' : Mini-batch k-means, for large cohorts.
+
+    batch_size, max_iter, random_state
+        Parameters of mini-batch k-means.
+
+    Examples
+    --------
+    >>> from pasmopy.clustering import Subtypes
+    >>> subtypes = simulations.subtyping(
+    ...     "subtypes.pdf", dynamical_features, normalization, clustering=Subtypes(n_clusters=4)
+    ... )
+    >>> subtypes.labels_.value_counts()
+    """
+
+    n_clusters: int = 4
+    method: Literal["ward", "kmeans"] = "ward"
+    batch_size: int = 1024
+    max_iter: int = 100
+    random_state: Optional[int] = 0
+    features_: Optional[pd.DataFrame] = field(default=None, init=False, repr=False)
+    mean_: Optional[pd.Series] = field(default=None, init=False, repr=False)
+    scale_: Optional[pd.Series] = field(default=None, init=False, repr=False)
+    centroids_: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    linkage_: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    labels_: Optional[pd.Series] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.method not in (methods := ["ward", "kmeans"]):
+            raise ValueError("method must be one of '{}'.".format("', '".join(methods)))
+
+    def transform(self, features: pd.DataFrame) -> np.ndarray:
+        """
+        Z-scored features with the parameters of the fitted cohort.
+        """
+        return ((features[self.mean_.index] - self.mean_) / self.scale_).to_numpy()
+
+    def fit(self, features: pd.DataFrame) -> "Subtypes":
+        """
+        Classify patients.
+
+        Parameters
+        ----------
+        features : pandas.DataFrame
+            Response characteristics, indexed by patient.
+
+        Returns
+        -------
+        self : :class:`Subtypes`
+        """
+        if not np.isfinite(features.to_numpy(dtype=float)).all():
+            raise ValueError("features must be finite.")
+        self.features_ = features.astype(float)
+        self.mean_ = self.features_.mean()
+        # Same z-score as seaborn.clustermap(z_score=1)
+        self.scale_ = self.features_.std().replace(0.0, 1.0).fillna(1.0)
+        X = self.transform(self.features_)
+        if self.method == "ward":
+            self.linkage_ = ward_linkage(X)
+            labels = fcluster(self.linkage_, self.n_clusters, criterion="maxclust") - 1
+            self.centroids_ = np.array([X[labels == j].mean(axis=0) for j in np.unique(labels)])
+        else:
+            self.linkage_ = None
+            self.centroids_ = minibatch_kmeans(
+                X, self.n_clusters, self.batch_size, self.max_iter, self.random_state
+            )
+            labels = _nearest(X, self.centroids_)
+        self.labels_ = pd.Series(
+            labels.astype(np.int64), index=self.features_.index, name="subtype"
+        )
+        return self
+
+    def predict(self, features: pd.DataFrame) -> pd.Series:
+        """
+        Assign patients to the nearest subtype centroid.
+        """
+        return pd.Series(
+            _nearest(self.transform(features), self.centroids_),
+            index=features.index,
+            name="subtype",
+        )
+
+    def assign(self, features: pd.DataFrame) -> pd.Series:
+        """
+        Place new patients into the fitted subtypes without reclustering.
+
+        The patients are added to ``features_`` and ``labels_``, replacing previous
+        entries of the same patients; z-score parameters and centroids are kept.
+
+        Parameters
+        ----------
+        features : pandas.DataFrame
+            Response characteristics of the new patients.
+
+        Returns
+        -------
+        labels : pandas.Series
+            Subtypes of the new patients.
+        """
+        if not np.isfinite(features[self.mean_.index].to_numpy(dtype=float)).all():
+            raise ValueError("features must be finite.")
+        labels = self.predict(features)
+        self.features_ = pd.concat(
+            [self.features_.drop(features.index, errors="ignore"), features[self.mean_.index]]
+        ).astype(float)
+        self.labels_ = pd.concat([self.labels_.drop(features.index, errors="ignore"), labels])
+        # Merge order of the linkage no longer covers all patients.
+        self.linkage_ = None if self.method == "ward" else self.linkage_
+        return labels
+
+    def save(self, path: str, **metadata) -> None:
+        """
+        Save the fitted state, i.e., features, z-score parameters and the cluster model.
+
+        Parameters
+        ----------
+        path : str, path-like
+            ``.npz`` file.
+
+        **metadata
+            JSON-serializable values saved alongside, e.g., how features were extracted.
+        """
+        arrays = dict(
+            params=json.dumps(
+                dict(
+                    n_clusters=self.n_clusters,
+                    method=self.method,
+                    batch_size=self.batch_size,
+                    max_iter=self.max_iter,
+                    random_state=self.random_state,
+                )
+            ),
+            metadata=json.dumps(metadata),
+            patients=self.features_.index.to_numpy(dtype=str),
+            columns=self.features_.columns.to_numpy(dtype=str),
+            features=self.features_.to_numpy(),
+            mean=self.mean_.to_numpy(),
+            scale=self.scale_.to_numpy(),
+            centroids=self.centroids_,
+            labels=self.labels_.to_numpy(),
+        )
+        if self.linkage_ is not None:
+            arrays["linkage"] = self.linkage_
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["Subtypes", dict]:
+        """
+        Load a fitted state saved by ``save()``.
+
+        Returns
+        -------
+        subtypes : :class:`Subtypes`
+        metadata : dict
+        """
+        with np.load(path, allow_pickle=False) as f:
+            subtypes = cls(**json.loads(str(f["params"])))
+            index = pd.Index(f["patients"].tolist(), name=None)
+            columns = f["columns"].tolist()
+            subtypes.features_ = pd.DataFrame(f["features"], index=index, columns=columns)
+            subtypes.mean_ = pd.Series(f["mean"], index=columns)
+            subtypes.scale_ = pd.Series(f["scale"], index=columns)
+            subtypes.centroids_ = f["centroids"]
+            subtypes.linkage_ = f["linkage"] if "linkage" in f.files else None
+            subtypes.labels_ = pd.Series(f["labels"], index=index, name="subtype")
+            metadata = json.loads(str(f["metadata"]))
+        return subtypes, metadata
+
+    def plot(
+        self,
+        fname: str,
+        max_patients: int = 2000,
+        figsize: Optional[tuple] = None,
+        cmap: str = "RdBu_r",
+    ) -> None:
+        """
+        Draw a heatmap of z-scored features with patients ordered by subtype.
+
+        Parameters
+        ----------
+        fname : str, path-like
+            The heatmap is saved as fname.
+
+        max_patients : int (default: 2000)
+            Patients drawn at most; larger cohorts are subsampled within each subtype.
+
+        figsize : tuple, optional
+            Figure size.
+
+        cmap : str (default: "RdBu_r")
+            Colormap.
+        """
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        if self.linkage_ is not None:
+            order = leaves_list(self.linkage_)
+            order = order[np.argsort(self.labels_.to_numpy()[order], kind="stable")]
+        else:
+            order = np.argsort(self.labels_.to_numpy(), kind="stable")
+        if len(order) > max_patients:
+            rng = np.random.default_rng(self.random_state)
+            order = order[np.sort(rng.choice(len(order), max_patients, replace=False))]
+        X = pd.DataFrame(
+            self.transform(self.features_.iloc[order]),
+            index=self.features_.index[order],
+            columns=self.features_.columns,
+        )
+        fig, ax = plt.subplots(figsize=figsize)
+        sns.heatmap(X, cmap=cmap, center=0, ax=ax, yticklabels=len(X) <= 100)
+        boundaries = np.flatnonzero(np.diff(self.labels_.to_numpy()[order])) + 1
+        ax.hlines(boundaries, *ax.get_xlim(), colors="k", linewidth=1)
+        fig.savefig(fname, bbox_inches="tight")
+        plt.close(fig)
@@ -0,0 +1,267 @@
+import json
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy.integrate import simpson
+
+#: Functions that reduce an array along ``axis`` when called as ``func(data, axis=-1)``.
+#: Time courses are passed to them all at once instead of one at a time.
+_VECTORIZED = {np.max, np.min, np.mean, np.median, np.nanmax, np.nanmin, np.nanmean, simpson}
+
+
+def vectorized(func: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+    """
+    Mark a response characteristic as a reduction along ``axis``.
+
+    Examples
+    --------
+    >>> from pasmopy.features import vectorized
+    >>> @vectorized
+    ... def get_range(time_course, axis=-1):
+    ...     return np.ptp(time_course, axis=axis)
+    >>> simulations.response_characteristics["range"] = get_range
+    """
+    _VECTORIZED.add(func)
+    return func
+
+
+def is_vectorized(func: Callable[..., Union[int, float, np.ndarray]]) -> bool:
+    try:
+        return func in _VECTORIZED
+    except TypeError:  # unhashable callable
+        return False
+
+
+@vectorized
+def time_to_peak(time_course: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    Index of the time point at which the signal is at its maximum
+    (the time is ``model.problem.t[index]``).
+    """
+    return np.argmax(time_course, axis=axis)
+
+
+@vectorized
+def half_decay_time(time_course: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    The number of time points from the peak until the signal decays to half of
+    its maximum, NaN if it does not.
+    """
+    time_course = np.moveaxis(np.asarray(time_course), axis, -1)
+    peak = np.argmax(time_course, axis=-1)[..., np.newaxis]
+    decayed = (time_course <= np.take_along_axis(time_course, peak, axis=-1) / 2) & (
+        np.arange(time_course.shape[-1]) > peak
+    )
+    return np.where(
+        decayed.any(axis=-1), np.argmax(decayed, axis=-1) - peak[..., 0], np.nan
+    ).astype(float)
+
+
+@vectorized
+def steady_state(time_course: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    Signal level at the last time point.
+    """
+    return np.take(time_course, -1, axis=axis)
+
+
+@vectorized
+def droprate(time_course: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    Average decrease per time point (sample, not unit of time) from the peak to
+    the last time point.
+    """
+    time_course = np.moveaxis(np.asarray(time_course), axis, -1)
+    return -(time_course[..., -1] - np.max(time_course, axis=-1)) / (
+        time_course.shape[-1] - np.argmax(time_course, axis=-1)
+    )
+
+
+def evaluate(
+    time_courses: np.ndarray,
+    functions: Sequence[Callable[..., Union[int, float, np.ndarray]]],
+) -> np.ndarray:
+    """
+    Evaluate response characteristics of time courses.
+
+    Parameters
+    ----------
+    time_courses : numpy.ndarray
+        Time courses along the last axis, e.g., patients × conditions × time.
+
+    functions : sequence of callables
+        Response characteristics. Vectorized ones are evaluated in a single call,
+        other ones are applied to one time course at a time.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Characteristics of shape ``time_courses.shape[:-1] + (len(functions),)``.
+    """
+    time_courses = np.asarray(time_courses, dtype=float)
+    values = np.empty(time_courses.shape[:-1] + (len(functions),))
+    for i, func in enumerate(functions):
+        if is_vectorized(func):
+            values[..., i] = func(time_courses, axis=-1)
+        elif time_courses.shape[:-1] and not np.prod(time_courses.shape[:-1]):
+            continue
+        else:
+            values[..., i] = np.apply_along_axis(func, -1, time_courses)
+    return values
+
+
+def check_conditions(conditions: Iterable[str]) -> None:
+    """
+    Reject conditions containing ``_``, which separates them from metrics in the column
+    names ``{condition}_{metric}``: metrics such as ``time_to_peak`` may contain it,
+    so only the first ``_`` splits a column name back into its condition and metric.
+    """
+    if invalid := sorted({condition for condition in conditions if "_" in condition}):
+        raise ValueError(
+            f"Conditions of response characteristics must not contain '_': {invalid}."
+        )
+
+
+def extract_features(
+    time_courses: np.ndarray,
+    index: Sequence[str],
+    conditions: Sequence[str],
+    conditions_and_metrics: Mapping[str, List[str]],
+    response_characteristics: Dict[str, Callable[..., Union[int, float, np.ndarray]]],
+) -> pd.DataFrame:
+    """
+    Response characteristics of a cohort.
+
+    Parameters
+    ----------
+    time_courses : numpy.ndarray
+        Time courses of shape (patients, conditions, time).
+
+    index : sequence of strings
+        Patient IDs.
+
+    conditions : sequence of strings
+        Experimental conditions along the second axis of ``time_courses``.
+
+    conditions_and_metrics : Mapping[str, List[str]]
+        ``{"condition": ["metric", ...], ...}``. Conditions must not contain ``_``.
+
+    response_characteristics : dict[str, Callable]
+        Functions extracting each metric.
+
+    Returns
+    -------
+    features : pandas.DataFrame
+        Float characteristics with columns ``{condition}_{metric}``.
+    """
+    check_conditions(conditions_and_metrics)
+    metrics = list(dict.fromkeys(m for ms in conditions_and_metrics.values() for m in ms))
+    values = evaluate(time_courses, [response_characteristics[m] for m in metrics])
+    return pd.DataFrame(
+        {
+            f"{condition}_{metric}": values[:, conditions.index(condition), metrics.index(metric)]
+            for condition, condition_metrics in conditions_and_metrics.items()
+            for metric in condition_metrics
+        },
+        index=pd.Index(index, name="Sample"),
+        dtype=float,
+    )
+
+
+def save_features(
+    path: str,
+    characteristics: Mapping[str, pd.DataFrame],
+    dynamical_features: Mapping[str, Mapping[str, List[str]]],
+    normalization: Optional[dict] = None,
+) -> None:
+    """
+    Save response characteristics of all observables to a single ``.npz`` file.
+
+    Values are stored as one float64 matrix of shape (patients, features), and each
+    column is described by its observable, condition, metric and normalization,
+    so that they can be loaded without parsing column names.
+
+    Parameters
+    ----------
+    path : str, path-like
+        ``.npz`` file.
+
+    characteristics : Mapping[str, pandas.DataFrame]
+        Response characteristics of each observable with columns ``{condition}_{metric}``,
+        all indexed by the same patients.
+
+    dynamical_features : Mapping[str, Mapping[str, List[str]]]
+        ``{"observable": {"condition": ["metric", ...], ...}, ...}``.
+
+    normalization : dict, optional
+        Normalization condition of each observable.
+    """
+    check_conditions(c for conditions in dynamical_features.values() for c in conditions)
+    if normalization is None:
+        normalization = {}
+    columns = [
+        (obs_name, condition, metric)
+        for obs_name in characteristics
+        for condition, metrics in dynamical_features[obs_name].items()
+        for metric in metrics
+    ]
+    index = next(iter(characteristics.values())).index if characteristics else pd.Index([])
+    np.savez(
+        path,
+        values=np.column_stack(
+            [np.empty((len(index), 0))]
+            + [
+                characteristics[obs_name][f"{condition}_{metric}"].to_numpy(dtype=float)
+                for obs_name, condition, metric in columns
+            ]
+        ),
+        patients=np.array(index, dtype=str),
+        observable=np.array([column[0] for column in columns], dtype=str),
+        condition=np.array([column[1] for column in columns], dtype=str),
+        metric=np.array([column[2] for column in columns], dtype=str),
+        normalization=np.array(
+            [json.dumps(normalization.get(column[0])) for column in columns], dtype=str
+        ),
+    )
+
+
+def load_features(path: str) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Load response characteristics saved by ``save_features()``.
+
+    Parameters
+    ----------
+    path : str, path-like
+        ``.npz`` file.
+
+    Returns
+    -------
+    characteristics : Dict[str, pandas.DataFrame]
+        Response characteristics of each observable, indexed by patient,
+        with columns ``{condition}_{metric}``.
+
+    columns : pandas.DataFrame
+        Observable, condition, metric and normalization of each feature,
+        in the order in which they are stored.
+    """
+    with np.load(path) as f:
+        values = f["values"]
+        index = pd.Index(f["patients"].tolist(), name="Sample")
+        columns = pd.DataFrame(
+            {
+                "observable": f["observable"].tolist(),
+                "condition": f["condition"].tolist(),
+                "metric": f["metric"].tolist(),
+                "normalization": [json.loads(s) for s in f["normalization"].tolist()],
+            }
+        )
+    characteristics = {}
+    for obs_name in dict.fromkeys(columns["observable"]):
+        selected = np.flatnonzero(columns["observable"] == obs_name)
+        characteristics[obs_name] = pd.DataFrame(
+            values[:, selected],
+            index=index,
+            columns=[f"{columns['condition'][i]}_{columns['metric'][i]}" for i in selected],
+        )
+    return characteristics, columns
@@ -1,7 +1,48 @@
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
+
+from .profiling import stage
+from .transcriptome import default_cache_dir, get_expression_level
+
+# Patient individualized where the model passes no ID, see active_patient.
+_active_patient: Optional[str] = None
+
+
+@contextmanager
+def active_patient(id: str) -> Iterator[None]:
+    """
+    Individualize models for ``id`` within this context.
+
+    This is how a single, shared model package is simulated for many patients
+    (see :class:`pasmopy.patient_model.PatientOverlay`): the package's ``search_param.py``
+    passes :obj:`None` as ID, which is resolved to ``id`` here.
+    An ID other than ``id`` passed within this context raises :class:`ValueError`.
+
+    Parameters
+    ----------
+    id : str
+        CCLE_ID or TCGA_ID.
+    """
+    global _active_patient
+    previous, _active_patient = _active_patient, id
+    try:
+        yield
+    finally:
+        _active_patient = previous
+
+
+def _gather(x: Sequence[float], index: np.ndarray) -> np.ndarray:
+    """
+    Gather ``x[index]`` as a float array without converting the whole of ``x``.
+    """
+    if isinstance(x, np.ndarray):
+        return x[index]
+    return np.fromiter(map(x.__getitem__, index.tolist()), dtype=float, count=len(index))
 
 
 @dataclass
@@ -9,6 +50,10 @@ class Individualization(object):
     """
     Individualize a mechanistic model by incorporating gene expression levels.
 
+    Expression levels are loaded once per process: instances sharing
+    ``transcriptomic_data``, ``gene_expression``, ``samples`` and ``read_csv_kws``
+    reuse the same table.
+
     Attributes
     ----------
     parameters : List[str]
@@ -37,6 +82,36 @@ class Individualization(object):
     read_csv_kws : dict, optional
         Keyword arguments to pass to ``pandas.read_csv``.
 
+    samples : List[str], optional
+        Samples (CCLE_IDs or TCGA_IDs) to load from ``transcriptomic_data``.
+        If :obj:`None`, all samples are loaded.
+        Only the genes listed in ``gene_expression`` are loaded in any case.
+        Leave it unset in models simulated as
+        :class:`~pasmopy.patient_model.PatientOverlay` or with ``shared_memory``:
+        these need the columns of all patients, and each distinct ``samples``
+        loads a table of its own.
+
+    cache : bool (default: :obj:`True`)
+        If :obj:`True`, the loaded expression levels are stored in ``cache_dir``
+        as a binary sidecar keyed by the hash of ``transcriptomic_data``,
+        so that subsequent loads skip CSV parsing.
+        Remote (URL) and compressed ``transcriptomic_data`` are also downloaded
+        and decompressed into ``cache_dir`` only once.
+
+    cache_dir : str, optional
+        Directory used for caching. If :obj:`None`, ``$PASMOPY_CACHE_DIR`` or
+        ``~/.cache/pasmopy`` is used.
+
+    checksum : str, optional
+        Expected SHA-256 of ``transcriptomic_data`` (``"<hex>"`` or ``"sha256:<hex>"``).
+        Remote ``transcriptomic_data`` can only be verified with ``cache=True``.
+
+    offline : bool (default: :obj:`False`)
+        If :obj:`True`, raise ``FileNotFoundError`` instead of downloading
+        ``transcriptomic_data`` that is not cached yet (always the case with
+        ``cache=False``).
+        Setting the environment variable ``PASMOPY_OFFLINE=1`` has the same effect.
+
     prefix : str (default: "w_")
         Prefix of weighting factors on gene expression levels.
 
@@ -79,7 +154,7 @@ class Individualization(object):
                 "DUSP": ["DUSP5", "DUSP6", "DUSP7"],
                 "cMyc": ["MYC"],
             },
-            read_csv_kws={"index_col": "Description"}
+            read_csv_kws={"index_col": "Description"},
         )
 
         ...
@@ -111,43 +186,135 @@ class Individualization(object):
     transcriptomic_data: str
     gene_expression: Dict[str, List[str]]
     read_csv_kws: Optional[dict] = field(default=None)
+    samples: Optional[List[str]] = field(default=None)
+    cache: bool = field(default=True)
+    cache_dir: Optional[str] = field(default=None)
+    checksum: Optional[str] = field(default=None)
+    offline: bool = field(default=False)
     prefix: str = field(default="w_", init=False)
 
     def __post_init__(self) -> None:
-        kwargs = self.read_csv_kws
-        if kwargs is None:
-            kwargs = {}
-        self._expression_level: pd.DataFrame = pd.read_csv(self.transcriptomic_data, **kwargs)
+        if self.cache_dir is None:
+            self.cache_dir = default_cache_dir()
+        with stage("transcriptome"):
+            self._expression_level: pd.DataFrame = get_expression_level(
+                self.transcriptomic_data,
+                [gene for genes in self.gene_expression.values() for gene in genes],
+                self.samples,
+                self.read_csv_kws,
+                self.cache_dir if self.cache else None,
+                self.checksum,
+                self.offline,
+            )
+        self._compile()
 
     @property
     def expression_level(self) -> pd.DataFrame:
         return self._expression_level
 
+    def _compile(self) -> None:
+        """
+        Precompile the protein-gene map into index arrays, so that each call to
+        :meth:`as_reaction_rate` or :meth:`as_initial_conditions` is a single gather-and-dot.
+        """
+        self._parameter_index: Dict[str, int] = {}
+        for i, name in enumerate(self.parameters):
+            self._parameter_index.setdefault(name, i)
+        self._genes: List[str] = []
+        self._segments: Dict[str, slice] = {}
+        for protein, genes in self.gene_expression.items():
+            self._segments[protein] = slice(len(self._genes), len(self._genes) + len(genes))
+            self._genes.extend(genes)
+        # Position of each weighting factor in x.
+        self._weight_index = np.array(
+            [self.parameters.index(self.prefix + gene) for gene in self._genes], dtype=np.intp
+        )
+        # Protein to which each gene contributes.
+        self._gene_to_protein = np.repeat(
+            np.arange(len(self.gene_expression), dtype=np.intp),
+            [len(genes) for genes in self.gene_expression.values()],
+        )
+        # Indicator matrix (genes x proteins) summing weighted genes into proteins.
+        self._gene_protein_matrix = np.zeros((len(self._genes), len(self.gene_expression)))
+        self._gene_protein_matrix[np.arange(len(self._genes)), self._gene_to_protein] = 1.0
+        # Position of each protein in y0 (-1 if it is not a model species).
+        self._species_index = np.array(
+            [
+                self.species.index(protein) if protein in self.species else -1
+                for protein in self.gene_expression
+            ],
+            dtype=np.intp,
+        )
+        self._expression_vectors: Dict[str, np.ndarray] = {}
+        self._gene_matrix: Optional[np.ndarray] = None
+        self._sample_index: Dict[str, int] = {}
+
+    def _get_expression_vector(self, id: Optional[str]) -> np.ndarray:
+        """
+        Expression levels of all mapped genes in a sample, ordered as in the compiled map.
+        If ``id`` is :obj:`None`, the sample of the enclosing :func:`active_patient`.
+        """
+        if id is None:
+            if _active_patient is None:
+                raise ValueError("No ID is given outside of active_patient().")
+            id = _active_patient
+        elif _active_patient is not None and id != _active_patient:
+            raise ValueError(f"{id} is individualized within active_patient({_active_patient!r}).")
+        if id not in self._expression_vectors:
+            self._expression_vectors[id] = (
+                self.expression_level.loc[self._genes, id].to_numpy(dtype=float).copy()
+            )
+        return self._expression_vectors[id]
+
+    def _get_expression_matrix(self, ids: List[str]) -> np.ndarray:
+        """
+        Expression levels of all mapped genes, patients x genes.
+        """
+        if self._gene_matrix is None:
+            self._gene_matrix = self.expression_level.loc[self._genes].to_numpy(dtype=float)
+            self._sample_index = {
+                sample: j for j, sample in enumerate(self.expression_level.columns)
+            }
+        try:
+            columns = [self._sample_index[id] for id in ids]
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]} not in transcriptomic_data.") from None
+        return self._gene_matrix[:, columns].T
+
+    def _check_species(self) -> None:
+        """
+        Check that every protein in ``gene_expression`` is a model species.
+        """
+        if np.any(self._species_index < 0):
+            missing = [
+                protein for protein, i in zip(self.gene_expression, self._species_index) if i < 0
+            ]
+            raise ValueError(f"{', '.join(missing)} not in species.")
+
     def _calculate_weighted_sum(
         self,
-        id: str,
+        id: Optional[str],
         x: List[float],
-    ) -> Dict[str, float]:
+    ) -> np.ndarray:
         """
         Incorporate gene expression levels in the model.
 
         Returns
         -------
-        weighted_sum : Dict[str, float]
-            Estimated protein levels after incorporating transcriptomic data.
+        weighted_sum : numpy.ndarray
+            Estimated protein levels after incorporating transcriptomic data,
+            ordered as in ``gene_expression``.
         """
-        weighted_sum = dict.fromkeys(self.gene_expression, 0.0)
-        for protein, genes in self.gene_expression.items():
-            for gene in genes:
-                weighted_sum[protein] += (
-                    x[self.parameters.index(self.prefix + gene)]
-                    * self.expression_level.at[gene, id]
-                )
+        weighted_sum = np.bincount(
+            self._gene_to_protein,
+            weights=_gather(x, self._weight_index) * self._get_expression_vector(id),
+            minlength=len(self.gene_expression),
+        )
         return weighted_sum
 
     def as_reaction_rate(
         self,
-        id: str,
+        id: Optional[str],
         x: List[float],
         param_name: str,
         protein: str,
@@ -157,8 +324,10 @@ class Individualization(object):
 
         Parameters
         ----------
-        id : str
-            CCLE_ID or TCGA_ID.
+        id : str or None
+            CCLE_ID or TCGA_ID. :obj:`None` for the patient of the enclosing
+            :func:`active_patient`, e.g., in a shared model,
+            see :class:`~pasmopy.patient_model.PatientOverlay`.
 
         x : List[float]
             List of parameter values.
@@ -173,14 +342,20 @@ class Individualization(object):
         -------
         param_value : float
         """
-        weighted_sum = self._calculate_weighted_sum(id, x)
-        param_value = x[self.parameters.index(param_name)]
-        param_value *= weighted_sum[protein]
+        segment = self._segments[protein]
+        weighted_sum = float(
+            np.dot(
+                _gather(x, self._weight_index[segment]),
+                self._get_expression_vector(id)[segment],
+            )
+        )
+        param_value = x[self._parameter_index[param_name]]
+        param_value *= weighted_sum
         return param_value
 
     def as_initial_conditions(
         self,
-        id: str,
+        id: Optional[str],
         x: List[float],
         y0: List[float],
     ) -> List[float]:
@@ -189,8 +364,10 @@ class Individualization(object):
 
         Parameters
         ----------
-        id : str
-            CCLE_ID or TCGA_ID.
+        id : str or None
+            CCLE_ID or TCGA_ID. :obj:`None` for the patient of the enclosing
+            :func:`active_patient`, e.g., in a shared model,
+            see :class:`~pasmopy.patient_model.PatientOverlay`.
 
         x : List[float]
             List of parameter values.
@@ -203,7 +380,176 @@ class Individualization(object):
         y0 (individualized) : List[float]
             Cell-line- or patient-specific initial conditions.
         """
+        self._check_species()
         weighted_sum = self._calculate_weighted_sum(id, x)
-        for protein in self.gene_expression.keys():
-            y0[self.species.index(protein)] *= weighted_sum[protein]
+        for i, value in zip(self._species_index.tolist(), weighted_sum.tolist()):
+            y0[i] *= value
         return y0
+
+    def reaction_rate_jacobian(
+        self,
+        id: Optional[str],
+        x: List[float],
+        param_name: str,
+        protein: str,
+    ) -> csr_matrix:
+        """
+        Derivatives of :meth:`as_reaction_rate` with respect to the weighting factors.
+
+        Parameters
+        ----------
+        id : str or None
+            CCLE_ID or TCGA_ID. :obj:`None` for the patient of the enclosing
+            :func:`active_patient`, e.g., in a shared model,
+            see :class:`~pasmopy.patient_model.PatientOverlay`.
+
+        x : List[float]
+            List of parameter values (before individualization).
+
+        param_name : str
+            Name of the parameter incorporating gene_expression_data.
+
+        protein: str
+            Protein involved in the reaction.
+
+        Returns
+        -------
+        jacobian : scipy.sparse.csr_matrix
+            Matrix of shape (1, n_parameters) whose only nonzero entries are in the columns
+            of the weighting factors on the genes of ``protein``.
+        """
+        segment = self._segments[protein]
+        return csr_matrix(
+            (
+                x[self._parameter_index[param_name]] * self._get_expression_vector(id)[segment],
+                (
+                    np.zeros(segment.stop - segment.start, dtype=np.intp),
+                    self._weight_index[segment],
+                ),
+            ),
+            shape=(1, len(self.parameters)),
+        )
+
+    def initial_conditions_jacobian(
+        self,
+        id: Optional[str],
+        x: List[float],
+        y0: List[float],
+    ) -> csr_matrix:
+        """
+        Derivatives of :meth:`as_initial_conditions` with respect to the weighting factors.
+
+        Parameters
+        ----------
+        id : str or None
+            CCLE_ID or TCGA_ID. :obj:`None` for the patient of the enclosing
+            :func:`active_patient`, e.g., in a shared model,
+            see :class:`~pasmopy.patient_model.PatientOverlay`.
+
+        x : List[float]
+            List of parameter values.
+
+        y0 : List[float]
+            List of initial values (before individualization).
+
+        Returns
+        -------
+        jacobian : scipy.sparse.csr_matrix
+            Matrix of shape (n_species, n_parameters), where entry (i, j) is the derivative
+            of the i-th individualized initial value with respect to ``x[j]``.
+            Only the columns of the weighting factors are nonzero.
+
+        Examples
+        --------
+        Chain rule for the gradient of a function ``f`` of the initial conditions
+
+        >>> jac = incorporating_gene_expression_levels.initial_conditions_jacobian(id, x, y0)
+        >>> grad_x = jac.T @ df_dy0
+        """
+        self._check_species()
+        rows = self._species_index[self._gene_to_protein]
+        return csr_matrix(
+            (
+                _gather(y0, rows) * self._get_expression_vector(id),
+                (rows, self._weight_index),
+            ),
+            shape=(len(self.species), len(self.parameters)),
+        )
+
+    def as_cohort(
+        self,
+        ids: List[str],
+        x: Union[List[float], np.ndarray],
+        y0: Union[List[float], np.ndarray],
+        reaction_rates: Optional[Dict[str, str]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Individualize parameters and initial conditions for many patients at once.
+
+        This is equivalent to calling :meth:`as_reaction_rate` for each item in
+        ``reaction_rates`` and then :meth:`as_initial_conditions` for every patient,
+        but the weighted sums for the whole cohort are obtained from a single
+        matrix multiplication over the expression table.
+
+        Parameters
+        ----------
+        ids : List[str]
+            CCLE_IDs or TCGA_IDs.
+
+        x : array_like
+            Parameter values, either a single vector of shape (n_parameters,)
+            or a stack of candidates of shape (n_candidates, n_parameters).
+
+        y0 : array_like
+            Initial values, of shape (n_species,) or (n_candidates, n_species).
+            A single vector of ``x`` is used for every candidate of a stack of ``y0``.
+
+        reaction_rates : Dict[str, str], optional
+            Pairs of parameters incorporating gene expression levels and
+            the proteins involved in the reactions, e.g., ``{"V291": "DUSP"}``.
+
+        Returns
+        -------
+        x (individualized) : numpy.ndarray
+            Patient-specific parameter values, of shape (n_patients, n_parameters),
+            or (n_candidates, n_patients, n_parameters) if a stack of ``x`` or ``y0``
+            is given.
+
+        y0 (individualized) : numpy.ndarray
+            Patient-specific initial conditions, of shape (n_patients, n_species),
+            or (n_candidates, n_patients, n_species) if a stack of ``x`` or ``y0``
+            is given.
+
+        Examples
+        --------
+        >>> x_cohort, y0_cohort = incorporating_gene_expression_levels.as_cohort(
+        ...     TCGA_ID, param_values(), initial_values(), {"V291": "DUSP", "V310": "cMyc"}
+        ... )
+        """
+        self._check_species()
+        if reaction_rates is None:
+            reaction_rates = {}
+        x = np.asarray(x, dtype=float)
+        y0 = np.asarray(y0, dtype=float)
+        stacked = x.ndim == 2 or y0.ndim == 2
+        x, y0 = np.atleast_2d(x), np.atleast_2d(y0)
+        if x.shape[0] != y0.shape[0] and 1 not in (x.shape[0], y0.shape[0]):
+            raise ValueError(
+                f"x and y0 are stacks of {x.shape[0]:d} and {y0.shape[0]:d} candidates."
+            )
+        n_candidates = max(x.shape[0], y0.shape[0])
+        x = np.broadcast_to(x, (n_candidates, x.shape[1]))
+        y0 = np.broadcast_to(y0, (n_candidates, y0.shape[1]))
+        # (candidates, genes, proteins) x (patients, genes) -> (candidates, patients, proteins)
+        weights = x[:, self._weight_index, np.newaxis] * self._gene_protein_matrix
+        weighted_sum = np.matmul(self._get_expression_matrix(ids), weights)
+        x_cohort = np.repeat(x[:, np.newaxis, :], len(ids), axis=1)
+        for param_name, protein in reaction_rates.items():
+            x_cohort[..., self._parameter_index[param_name]] *= weighted_sum[
+                ..., list(self.gene_expression).index(protein)
+            ]
+        y0_cohort = np.repeat(y0[:, np.newaxis, :], len(ids), axis=1)
+        y0_cohort[..., self._species_index] *= weighted_sum
+        if not stacked:
+            return x_cohort[0], y0_cohort[0]
+        return x_cohort, y0_cohort
@@ -0,0 +1,275 @@
+import math
+import multiprocessing
+import os
+import sys
+import warnings
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from importlib import import_module
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Iterable, Iterator, List, Literal, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from threadpoolctl import threadpool_limits
+
+from .transcriptome import (
+    SharedExpressionLevel,
+    attach_expression_levels,
+    share_expression_levels,
+)
+
+#: Root of the cgroup filesystem, read for CPU and memory limits of containers.
+_CGROUP = "/sys/fs/cgroup"
+
+#: Environment variables limiting the threads of numerical libraries.
+_THREAD_LIMITS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, mode="r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def available_cpus() -> int:
+    """
+    The number of CPUs this process may use, limited by the CPU affinity mask and
+    the cgroup CPU quota (``cpu.max`` or ``cpu.cfs_quota_us``), e.g., of a container.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        n_cpus = len(os.sched_getaffinity(0))
+    else:
+        n_cpus = multiprocessing.cpu_count()
+    if (cpu_max := _read(os.path.join(_CGROUP, "cpu.max"))) is not None:
+        quota, period = (cpu_max.split() + ["100000"])[:2]
+    else:
+        quota = _read(os.path.join(_CGROUP, "cpu", "cpu.cfs_quota_us")) or "max"
+        period = _read(os.path.join(_CGROUP, "cpu", "cpu.cfs_period_us")) or "100000"
+    if quota not in ["max", "-1"]:
+        n_cpus = min(n_cpus, max(math.ceil(int(quota) / int(period)), 1))
+    return n_cpus
+
+
+def available_memory() -> Optional[int]:
+    """
+    Memory in bytes available to this process, limited by the cgroup memory limit
+    (``memory.max`` or ``memory.limit_in_bytes``). :obj:`None` if unknown.
+    """
+    for limit_file, usage_file in [
+        (("memory.max",), ("memory.current",)),
+        (("memory", "memory.limit_in_bytes"), ("memory", "memory.usage_in_bytes")),
+    ]:
+        limit = _read(os.path.join(_CGROUP, *limit_file))
+        usage = _read(os.path.join(_CGROUP, *usage_file))
+        # No limit is reported as "max" (v2) or as a huge number (v1).
+        if limit is not None and limit != "max" and int(limit) < 2**60 and usage is not None:
+            return max(int(limit) - int(usage), 0)
+    meminfo = _read("/proc/meminfo")
+    if meminfo is not None:
+        for line in meminfo.splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size of this process in bytes, 0 if unknown.
+    """
+    if resource is None:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _worker_peak_rss(_: Any) -> int:
+    """
+    Peak resident set size of a worker process.
+    """
+    return peak_rss()
+
+
+def auto_n_proc(worker_rss: int = 0, memory_fraction: float = 0.8) -> int:
+    """
+    The number of worker processes that fit in the available CPUs and memory.
+
+    Parameters
+    ----------
+    worker_rss : int (default: 0)
+        Peak resident set size of a worker process in bytes. If 0, memory is not considered.
+
+    memory_fraction : float (default: 0.8)
+        Fraction of the available memory that worker processes may use.
+
+    Returns
+    -------
+    n_proc : int
+        One less than the available CPUs, and at least 1.
+    """
+    n_proc = max(available_cpus() - 1, 1)
+    memory = available_memory()
+    if worker_rss > 0 and memory is not None:
+        n_proc = min(n_proc, max(int(memory * memory_fraction) // worker_rss, 1))
+    return n_proc
+
+
+def _limit_threads(n_threads: Optional[int]) -> None:
+    """
+    Limit threads of numerical libraries in this (worker) process. Libraries loaded
+    already, e.g., numpy's BLAS imported with pasmopy, are limited through threadpoolctl,
+    and libraries loaded later through environment variables not set by the user.
+    """
+    if n_threads is None:
+        return
+    threadpool_limits(n_threads)
+    for name in _THREAD_LIMITS:
+        os.environ.setdefault(name, str(n_threads))
+
+
+def _initialize_worker(
+    preload: List[str], shared: List[SharedExpressionLevel], n_threads: Optional[int] = None
+) -> None:
+    """
+    Limit threads, attach shared transcriptomic data and import modules
+    in a new worker process.
+    """
+    _limit_threads(n_threads)
+    if shared:
+        attach_expression_levels(shared)
+    # Third-party libraries used by every task.
+    import_module("pasmopy.patient_model")
+    for module in preload:
+        try:
+            import_module(module)
+        except ImportError as e:
+            warnings.warn(f"Could not import {module} in a worker process: {e}", RuntimeWarning)
+
+
+@dataclass
+class WorkerPool(object):
+    """
+    Persistent pool of worker processes for executing patient-specific models.
+
+    Worker processes are started once, with the model packages in ``preload``
+    (and thus their transcriptomic data) already imported, and are reused by every
+    ``run()`` it is passed to until the pool is closed.
+
+    Attributes
+    ----------
+    n_proc : int, optional
+        The number of worker processes to use.
+        If :obj:`None`, one less than :func:`available_cpus`.
+
+    context : Literal["spawn", "fork", "forkserver"] (default: "spawn")
+        The context used for starting the worker processes.
+
+    preload : list of strings
+        Modules imported by each worker process at startup,
+        typically the (dot-separated) model package.
+
+    shared_memory : bool (default: :obj:`False`)
+        If :obj:`True`, ``preload`` is imported in the parent process first and
+        the transcriptomic data loaded by it are published in ``multiprocessing.shared_memory``,
+        so that worker processes attach to them instead of loading their own copies.
+
+    chunksize : int (default: 1)
+        The number of tasks sent to a worker process at once.
+        Larger values reduce communication overhead for many short tasks.
+
+    threads_per_worker : int, optional (default: 1)
+        Threads of numerical libraries (OpenMP, OpenBLAS, MKL, ...) in each worker process,
+        so that workers do not oversubscribe the CPUs. Set by each worker process at
+        startup through ``threadpoolctl``, also in workers restarted by the pool.
+        If :obj:`None`, not limited, e.g., to use ``OMP_NUM_THREADS`` set by the user.
+
+    Examples
+    --------
+    >>> from pasmopy import PatientModelAnalyses, PatientModelSimulations, WorkerPool
+    >>> with WorkerPool(n_proc=8, preload=["models.breast.TCGA_3C_AALK_01A"]) as pool:
+    ...     PatientModelSimulations("models.breast", TCGA_ID).run(pool=pool)
+    ...     PatientModelAnalyses("models.breast", TCGA_ID).run(pool=pool)
+    """
+
+    n_proc: Optional[int] = None
+    context: Literal["spawn", "fork", "forkserver"] = "spawn"
+    preload: List[str] = field(default_factory=list)
+    shared_memory: bool = False
+    chunksize: int = 1
+    threads_per_worker: Optional[int] = 1
+
+    def __post_init__(self) -> None:
+        if self.context not in (contexts := ["spawn", "fork", "forkserver"]):
+            raise ValueError("context must be one of '{}'.".format("', '".join(contexts)))
+        if self.n_proc is None:
+            self.n_proc = max(available_cpus() - 1, 1)
+        self._pool: Optional[Pool] = None
+        self._stack = ExitStack()
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def start(self) -> "WorkerPool":
+        """
+        Start the worker processes. Called automatically on first use.
+        """
+        if self._pool is None:
+            shared: List[SharedExpressionLevel] = []
+            if self.shared_memory:
+                for module in self.preload:
+                    import_module(module)
+                shared = self._stack.enter_context(share_expression_levels())
+            self._pool = multiprocessing.get_context(self.context).Pool(
+                processes=self.n_proc,
+                initializer=_initialize_worker,
+                initargs=(self.preload, shared, self.threads_per_worker),
+            )
+        return self
+
+    def imap(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        """
+        Apply func to each item in iterable, yielding results in completion order.
+        """
+        self.start()
+        return self._pool.imap_unordered(func, iterable, chunksize=self.chunksize)
+
+    def close(self) -> None:
+        """
+        Wait for the pending tasks and shut down the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._stack.close()
+
+    def terminate(self) -> None:
+        """
+        Stop the worker processes immediately.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._stack.close()
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -1,17 +1,340 @@
+import copy
 import csv
-import multiprocessing
+import hashlib
+import json
 import os
-from dataclasses import dataclass, field
-from typing import Callable, Dict, List, Literal, Optional, Union
+import pickle
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import traceback
+import warnings
+from contextlib import AbstractContextManager, ExitStack, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from functools import partial, wraps
+from importlib import import_module
+from multiprocessing.pool import RemoteTraceback
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
 import seaborn as sns
-from biomass import create_model, run_analysis, run_simulation
+from biomass import create_model, run_analysis
+from biomass.analysis import (
+    InitialConditionSensitivity,
+    ParameterSensitivity,
+    ReactionSensitivity,
+)
+from biomass.dynamics import SignalingSystems
 from biomass.model_object import ModelObject
 from scipy.integrate import simpson
 from tqdm import tqdm
 
+from . import features
+from .clustering import Subtypes
+from .features import extract_features, load_features, save_features
+from .individualization import active_patient
+from .parallel import WorkerPool, _worker_peak_rss, auto_n_proc, available_cpus
+from .profiling import Profiling, _Report, record, stage
+from .store import CohortStore, compact_simulations, load_simulations
+
+# Shared model packages imported in this process, see InSilico._create_model.
+_shared_models: Dict[str, ModelObject] = {}
+
+
+class PatientOverlay(NamedTuple):
+    """
+    A patient simulated with a shared model package instead of a copy of its own.
+
+    Attributes
+    ----------
+    patient : str
+        Patient's name or identifier, e.g., TCGA_ID.
+        Individualizes the shared model, whose ``search_param.py`` passes :obj:`None`
+        as ID to :class:`~pasmopy.individualization.Individualization`.
+
+    path : str
+        Directory of the patient containing ``out/`` (the estimated parameter sets).
+        Simulation results and figures are also saved here.
+
+    Examples
+    --------
+    >>> from pasmopy import PatientModelSimulations, PatientOverlay
+    >>> patients = [PatientOverlay(id, os.path.join("patients", id)) for id in TCGA_ID]
+    >>> simulations = PatientModelSimulations("models.erbb_network", patients)
+    >>> simulations.run()
+    """
+
+    patient: str
+    path: str
+
+
+class _ParamsetTask(NamedTuple):
+    """
+    A parameter set of a patient, executed as a task of its own.
+    """
+
+    patient: Union[str, PatientOverlay]
+    paramset: int
+
+
+class _ParamsetModel(ModelObject):
+    """
+    A model whose only executable parameter set is ``paramset``, so that analyses of
+    biomass, which execute ``model.get_executable()``, are restricted to it.
+    """
+
+    def __init__(self, model: ModelObject, paramset: int) -> None:
+        vars(self).update(vars(model))
+        self.paramset = paramset
+
+    def get_executable(self) -> List[int]:
+        return [self.paramset]
+
+
+class TaskFailure(NamedTuple):
+    """
+    A patient (or a parameter set of a patient) that failed in ``run()``.
+
+    Attributes
+    ----------
+    patient : str
+        Patient ID, ``{patient}/{parameter set}`` with ``split_paramsets``.
+
+    exception : Exception
+        The exception raised by the last attempt, :class:`TimeoutError` if it timed out.
+
+    traceback : str
+        Formatted traceback of the exception.
+
+    elapsed : float
+        Wall time in seconds spent on all attempts.
+
+    attempts : int
+        The number of attempts made.
+    """
+
+    patient: str
+    exception: Exception
+    traceback: str
+    elapsed: float
+    attempts: int
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Raise :class:`TimeoutError` in the main thread after ``seconds``.
+    Not enforced without ``signal.setitimer``, i.e., on Windows.
+    """
+    if (
+        seconds is None
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def timeout(signum, frame):
+        raise TimeoutError(f"Timed out after {seconds} s.")
+
+    previous = signal.signal(signal.SIGALRM, timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# Arguments of solve_ode for the models created in this context, set while retrying.
+_retry_solver: ContextVar[Optional[dict]] = ContextVar("retry_solver", default=None)
+
+
+def _with_solver(model: ModelObject, **kwargs) -> ModelObject:
+    """
+    Make simulations of a newly created model pass the given arguments of
+    ``biomass.dynamics.solver.solve_ode``, e.g., ``method``, to the solver.
+
+    biomass has no way to configure the solver of a model, so the model's ``problem``
+    must have a ``solver_options`` dict, which its ``simulate`` (and any helper it calls,
+    e.g., for steady states) passes to ``solve_ode``.
+    """
+    problem = model.problem
+    if not isinstance(getattr(problem, "solver_options", None), dict):
+        raise ValueError(
+            f"retry_solver cannot be applied to the model in {model.path}: "
+            "define problem.solver_options and pass it to solve_ode."
+        )
+    problem.solver_options = dict(problem.solver_options, **kwargs)
+    return model
+
+
+def _execute_indexed(
+    func: Callable[[Any], Any],
+    task: Tuple[int, Any],
+    timeout: Optional[float] = None,
+    retries: int = 0,
+    retry_solver: Optional[dict] = None,
+    instrument: bool = False,
+    profile_dir: Optional[str] = None,
+) -> Tuple[int, Any, float, Optional[Tuple[Exception, str, int]], Optional[Dict[str, Any]]]:
+    """
+    Execute func on a patient, keeping track of its position in the cohort
+    and of the wall time it took. Exceptions are returned instead of raised,
+    so that the other patients are not affected.
+    If ``instrument``, the stages of the patient are recorded (and profiled to
+    ``{profile_dir}/{i}.prof`` if ``profile_dir`` is given), see ``pasmopy.profiling``.
+    """
+    i, patient = task
+    start = time.perf_counter()
+    result, failure, stats = None, None, None
+    with ExitStack() as recording:
+        if instrument:
+            stats = recording.enter_context(
+                record(os.path.join(profile_dir, f"{i:d}.prof") if profile_dir else None)
+            )
+        for attempt in range(retries + 1):
+            try:
+                with ExitStack() as stack:
+                    if attempt > 0 and retry_solver:
+                        stack.callback(_retry_solver.reset, _retry_solver.set(retry_solver))
+                    stack.enter_context(_time_limit(timeout))
+                    result = func(patient)
+                break
+            except Exception as e:
+                exception, formatted = e, traceback.format_exc()
+        else:
+            try:
+                pickle.loads(pickle.dumps(exception))
+            except Exception:
+                exception = RuntimeError(repr(exception))
+            failure = (exception, formatted, retries + 1)
+    return i, result, time.perf_counter() - start, failure, stats
+
+
+def _task_name(func: Callable[[Any], Any]) -> str:
+    """
+    Name under which the wall times of func are recorded.
+    """
+    while isinstance(func, partial):
+        func = func.func
+    return getattr(func, "__name__", type(func).__name__)
+
+
+def _profiled(method: Callable) -> Callable:
+    """
+    Record the stages of a call of method if ``profiling`` is set, see
+    :class:`~pasmopy.profiling.Profiling`.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.profiling is None or self._report is not None:
+            return method(self, *args, **kwargs)
+        self._report = _Report(self.profiling, f"{type(self).__name__}.{method.__name__}")
+        try:
+            with record() as stats:
+                result = method(self, *args, **kwargs)
+        finally:
+            report, self._report = self._report, None
+        report.finish(stats["stages"])
+        return result
+
+    return wrapper
+
+
+def _extract_time_courses(
+    path_to_models: str,
+    patient: Union[str, PatientOverlay],
+    dynamical_features: Dict[str, Dict[str, List[str]]],
+    normalization: dict,
+) -> Dict[str, np.ndarray]:
+    """
+    Time courses of a patient used for extracting response characteristics,
+    see ``PatientModelSimulations.extract_characteristics()``.
+    """
+    return PatientModelSimulations(path_to_models, [patient])._extract_single_patient(
+        patient, dynamical_features, normalization
+    )
+
+
+@dataclass
+class _SimulationData(SignalingSystems):
+    """
+    ``biomass.run_simulation`` keeping simulation results in memory,
+    optionally without saving them or drawing figures.
+    If ``precomputed`` is given, simulation results of each parameter set are
+    loaded from ``{precomputed}/{nth_paramset}.npy`` instead of being computed.
+    """
+
+    render: bool = True
+    save: bool = True
+    precomputed: Optional[str] = None
+    simulations_all: Optional[np.ndarray] = field(default=None, init=False)
+
+    def _validate(self, nth_paramset: int) -> bool:
+        if self.precomputed is None:
+            with stage("integration"):
+                return super()._validate(nth_paramset)
+        # Simulated by a task of its own, see PatientModelSimulations._simulate_paramset()
+        path = os.path.join(self.precomputed, f"{nth_paramset:d}.npy")
+        if not os.path.isfile(path):
+            warnings.warn(f"Simulation failed. #{nth_paramset:d}", RuntimeWarning)
+            return False
+        with stage("read"):
+            self.model.problem.simulations = np.load(path)
+        return True
+
+    def _save_simulations(self, viz_type: str, simulated_values: np.ndarray) -> None:
+        if simulated_values.ndim == 4:
+            self.simulations_all = self._preprocessing(simulated_values)
+        if self.save:
+            with stage("write"):
+                super()._save_simulations(viz_type, simulated_values)
+
+    def plot_timecourse(self, *args, **kwargs) -> None:
+        if self.render:
+            with stage("render"):
+                super().plot_timecourse(*args, **kwargs)
+
+
+class PatientCharacteristics(NamedTuple):
+    """
+    Response characteristics of a patient, streamed from
+    :meth:`PatientModelSimulations.stream`.
+
+    Attributes
+    ----------
+    patient : str
+        Patient ID.
+
+    characteristics : Dict[str, pandas.Series]
+        Characteristics of each observable, indexed by ``{condition}_{metric}``.
+
+    time_courses : Dict[str, numpy.ndarray], optional
+        Normalized time courses of each observable, of shape (conditions, time).
+    """
+
+    patient: str
+    characteristics: Dict[str, pd.Series]
+    time_courses: Optional[Dict[str, np.ndarray]] = None
+
 
 @dataclass
 class InSilico(object):
@@ -21,30 +344,309 @@ class InSilico(object):
     Attributes
     ----------
     path_to_models : str
-        Path (dot-separated) to the directory containing patient-specific models.
+        Path (dot-separated) to the directory containing patient-specific models,
+        or to the shared model package if ``patients`` are :class:`PatientOverlay`.
 
-    patients : list of strings
+    patients : list of strings or :class:`PatientOverlay`
         List of patients' names or identifiers.
+        Each name refers to a model package in ``path_to_models``.
+        A :class:`PatientOverlay` instead pairs a patient with a directory of
+        parameter sets, and is simulated with the model in ``path_to_models``,
+        which is imported only once per process.
+
+    failures : list of :class:`TaskFailure`
+        Patients that failed in the last ``run()``.
     """
 
     path_to_models: str
-    patients: List[str]
+    patients: List[Union[str, PatientOverlay]]
+    failures: List[TaskFailure] = field(default_factory=list, init=False, repr=False)
+    _report: Optional[_Report] = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
         """
         Check for duplicates in self.patients.
         """
-        duplicate = [patient for patient in set(self.patients) if self.patients.count(patient) > 1]
+        ids = [self._patient_id(patient) for patient in self.patients]
+        duplicate = [id for id in set(ids) if ids.count(id) > 1]
         if duplicate:
             raise NameError(f"Duplicate patient: {', '.join(duplicate)}")
 
-    def parallel_execute(
+    def __getstate__(self) -> dict:
+        # The report is collected in the parent process only.
+        return dict(self.__dict__, _report=None)
+
+    @staticmethod
+    def _patient_id(patient: Union[str, PatientOverlay]) -> str:
+        """
+        Name or identifier of a patient.
+        """
+        if isinstance(patient, PatientOverlay):
+            return patient.patient
+        return patient.strip()
+
+    def _create_model(self, patient: Union[str, PatientOverlay]) -> ModelObject:
+        """
+        Create the model of a patient.
+        """
+        with stage("model"):
+            if isinstance(patient, PatientOverlay):
+                if self.path_to_models not in _shared_models:
+                    _shared_models[self.path_to_models] = create_model(self.path_to_models)
+                # The module is imported (and checked by create_model) once, but each patient
+                # gets a problem of its own, since simulations are written into it.
+                model = ModelObject(patient.path, import_module(self.path_to_models))
+            else:
+                model = create_model(".".join([self.path_to_models, patient.strip()]))
+        solver = _retry_solver.get()
+        return model if solver is None else _with_solver(model, **solver)
+
+    @staticmethod
+    def _individualize(patient: Union[str, PatientOverlay]) -> AbstractContextManager:
+        """
+        Context in which the model of a patient is executed.
+        """
+        if isinstance(patient, PatientOverlay):
+            return active_patient(patient.patient)
+        return nullcontext()
+
+    def _model_package(self, patient: Union[str, PatientOverlay]) -> str:
+        """
+        Model package (dot-separated) executed for a patient.
+        """
+        if isinstance(patient, PatientOverlay):
+            return self.path_to_models
+        return ".".join([self.path_to_models, patient.strip()])
+
+    def _patient_path(self, patient: Union[str, PatientOverlay]) -> str:
+        """
+        Directory of a patient, i.e., ``model.path`` of its model.
+        """
+        if isinstance(patient, PatientOverlay):
+            return patient.path
+        return self._model_package(patient).replace(".", os.sep)
+
+    def _paramsets(self, patient: Union[str, PatientOverlay]) -> List[int]:
+        """
+        Parameter sets executed by biomass, see ModelObject.get_executable().
+        """
+        out = os.path.join(self._patient_path(patient), "out")
+        if not os.path.isdir(out):
+            return []
+        return sorted(
+            int(n)
+            for n in os.listdir(out)
+            if n.isdecimal() and os.path.isfile(os.path.join(out, n, "generation.npy"))
+        )
+
+    def _n_paramsets(self, patient: Union[str, PatientOverlay]) -> int:
+        return len(self._paramsets(patient))
+
+    def _task_id(self, task: Union[str, PatientOverlay, _ParamsetTask]) -> str:
+        """
+        Identifier of a patient, or of a parameter set of a patient, in the runtime history.
+        """
+        if isinstance(task, _ParamsetTask):
+            return f"{self._patient_id(task.patient)}/{task.paramset:d}"
+        return self._patient_id(task)
+
+    def _history_file(self) -> Optional[str]:
+        # A field of the subclasses that record runtimes, following their own fields
+        return getattr(self, "runtime_history", None)
+
+    def _load_history(self) -> Dict[str, Dict[str, float]]:
+        """
+        Recorded wall times, ``{"task": {"patient": seconds, ...}, ...}``.
+        """
+        path = self._history_file()
+        if path is None or not os.path.isfile(path):
+            return {}
+        try:
+            with open(path, mode="r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record_runtimes(self, task: str, runtimes: Dict[str, float]) -> None:
+        """
+        Add wall times of patients to the runtime history.
+        """
+        path = self._history_file()
+        if path is None or not runtimes:
+            return
+        history = self._load_history()
+        history.setdefault(task, {}).update(runtimes)
+        os.makedirs(os.path.dirname(path) or os.curdir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or os.curdir)
+        with os.fdopen(fd, mode="w") as f:
+            json.dump(history, f, indent=2)
+        os.replace(tmp, path)
+
+    def _schedule(self, patients: List[Union[str, PatientOverlay]], task: str) -> List[int]:
+        """
+        Indices of patients in the order they are executed, longest expected first.
+        """
+        if self._history_file() is None:
+            return list(range(len(patients)))
+        history = self._load_history().get(task, {})
+        n_paramsets = [
+            1 if isinstance(patient, _ParamsetTask) else self._n_paramsets(patient)
+            for patient in patients
+        ]
+        expected = [history.get(self._task_id(patient)) for patient in patients]
+        # Seconds per parameter set, to estimate patients not recorded yet
+        rates = [t / n for t, n in zip(expected, n_paramsets) if t is not None and n > 0]
+        rate = float(np.median(rates)) if rates else None
+        for i, n in enumerate(n_paramsets):
+            if expected[i] is None:
+                expected[i] = n * rate if rate is not None else np.inf
+        return sorted(range(len(patients)), key=lambda i: (-expected[i], -n_paramsets[i]))
+
+    def _worker_pool(
         self,
-        func: Callable[[str], None],
+        n_proc: Optional[int],
+        method: Literal["spawn", "fork", "forkserver"],
+        shared_memory: bool,
+        patients: List[Union[str, PatientOverlay, _ParamsetTask]],
+    ) -> WorkerPool:
+        """
+        Worker processes for executing patients, started on first use.
+        """
+        if patients and isinstance(patients[0], _ParamsetTask):
+            patients = [patients[0].patient]
+        return WorkerPool(
+            n_proc,
+            method,
+            preload=[self._model_package(patients[0])] if shared_memory and patients else [],
+            shared_memory=shared_memory,
+        )
+
+    def _split_execute(
+        self,
+        func: Callable[[_ParamsetTask], None],
+        reduce: Callable[[Union[str, PatientOverlay]], None],
         n_proc: int,
         method: Literal["spawn", "fork", "forkserver"],
         progress: bool,
+        shared_memory: bool = False,
+        pool: Optional[WorkerPool] = None,
+        patients: Optional[List[Union[str, PatientOverlay]]] = None,
+        **kwargs,
     ) -> None:
+        """
+        Execute each parameter set of each patient as a task of its own, then reduce
+        the results of each patient. See ``parallel_execute()`` for parameters.
+        """
+        if patients is None:
+            patients = self.patients
+        tasks = [
+            _ParamsetTask(patient, paramset)
+            for patient in patients
+            for paramset in self._paramsets(patient)
+        ]
+        with ExitStack() as stack:
+            if pool is None:
+                # Started on first use: with "auto", sized by the first phase and reused
+                # by the second one.
+                pool = self._worker_pool(
+                    None if n_proc == "auto" else n_proc, method, shared_memory, patients
+                )
+                stack.push(pool)
+            self.parallel_execute(
+                func, n_proc, method, progress, pool=pool, patients=tasks, **kwargs
+            )
+            self.parallel_execute(
+                reduce, n_proc, method, progress, pool=pool, patients=patients, **kwargs
+            )
+
+    def imap_execute(
+        self,
+        func: Callable[[str], Any],
+        n_proc: Union[int, Literal["auto"]],
+        method: Literal["spawn", "fork", "forkserver"],
+        progress: bool,
+        shared_memory: bool = False,
+        pool: Optional[WorkerPool] = None,
+        patients: Optional[List[Union[str, PatientOverlay]]] = None,
+        *,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_solver: Optional[dict] = None,
+        failures: Optional[List[TaskFailure]] = None,
+    ) -> Iterator[Tuple[int, Any]]:
+        """
+        Execute multiple models in parallel, yielding ``(index of patient, return value)``
+        as each patient finishes. Failed patients are not yielded if ``failures`` is given.
+        See ``parallel_execute()`` for parameters.
+        """
+        if patients is None:
+            patients = self.patients
+        task = _task_name(func)
+        order = self._schedule(patients, task)
+        runtimes: Dict[str, float] = {}
+        report = self._report
+        execute = partial(
+            _execute_indexed,
+            func,
+            timeout=timeout,
+            retries=retries,
+            retry_solver=retry_solver,
+            instrument=report is not None,
+            profile_dir=report.profile_dir(task) if report is not None else None,
+        )
+
+        def imap(pool: WorkerPool, indices: List[int]) -> Iterator[Tuple[int, Any]]:
+            for i, result, elapsed, failure, stats in pool.imap(
+                execute, ((i, patients[i]) for i in indices)
+            ):
+                runtimes[self._task_id(patients[i])] = elapsed
+                if report is not None:
+                    report.add(
+                        task, i, self._task_id(patients[i]), elapsed, stats, failure is not None
+                    )
+                t.update(1)
+                if failure is None:
+                    yield i, result
+                elif failures is None:
+                    raise failure[0] from RemoteTraceback(failure[1])
+                else:
+                    failures.append(
+                        TaskFailure(self._task_id(patients[i]), *failure[:2], elapsed, failure[2])
+                    )
+
+        with ExitStack() as stack:
+            stack.callback(self._record_runtimes, task, runtimes)
+            t = stack.enter_context(tqdm(total=len(patients), disable=not progress))
+            if n_proc == "auto" and (pool is None or not pool.started):
+                # Execute the first patient alone and size the pool by the memory it took.
+                with self._worker_pool(1, method, shared_memory, patients) as probe:
+                    yield from imap(probe, order[:1])
+                    worker_rss = max(probe.imap(_worker_peak_rss, [None]))
+                order = order[1:]
+                n_proc = min(auto_n_proc(worker_rss), max(len(order), 1))
+                if pool is not None:
+                    pool.n_proc = n_proc
+            if pool is None:
+                pool = stack.enter_context(
+                    self._worker_pool(n_proc, method, shared_memory, patients)
+                )
+            yield from imap(pool, order)
+
+    def parallel_execute(
+        self,
+        func: Callable[[str], None],
+        n_proc: Union[int, Literal["auto"]],
+        method: Literal["spawn", "fork", "forkserver"],
+        progress: bool,
+        shared_memory: bool = False,
+        pool: Optional[WorkerPool] = None,
+        patients: Optional[List[Union[str, PatientOverlay]]] = None,
+        *,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_solver: Optional[dict] = None,
+        failures: Optional[List[TaskFailure]] = None,
+    ) -> list:
         """
         Execute multiple models in parallel.
 
@@ -53,24 +655,101 @@ class InSilico(object):
         func : Callable
             Function executing a single patient-specific model.
 
-        n_proc : int
-            The number of worker processes to use.
+        n_proc : int or "auto"
+            The number of worker processes to use. If "auto", the first patient is executed
+            alone and the number of worker processes is then chosen from the available CPUs
+            and memory and the peak memory usage of that worker, see
+            :func:`~pasmopy.parallel.auto_n_proc`.
 
         method : Literal["spawn", "fork", "forkserver"]
             Start method in ``multiprocessing``.
 
         progress : bool
             Whether the progress bar is animating or not.
+
+        shared_memory : bool (default: :obj:`False`)
+            If :obj:`True`, the transcriptomic data used by the models are loaded once
+            in the parent process and published in ``multiprocessing.shared_memory``,
+            and worker processes attach to them instead of loading their own copies.
+
+        pool : :class:`~pasmopy.parallel.WorkerPool`, optional
+            Running worker processes to reuse. If given, ``n_proc``, ``method`` and
+            ``shared_memory`` are ignored and the pool is left open, except that a pool
+            not started yet is sized as above if ``n_proc`` is "auto".
+            Otherwise a new pool is started and shut down for this call.
+
+        patients : list, optional
+            Patients to execute. If :obj:`None`, all ``self.patients``.
+
+        timeout : float, optional
+            Wall time in seconds after which an attempt of a patient is aborted with
+            :class:`TimeoutError`. Enforced with ``signal.setitimer``, i.e., not on Windows,
+            and only when control returns to Python, e.g., between integration steps.
+
+        retries : int (default: 0)
+            The number of times a failed patient is executed again.
+
+        retry_solver : dict, optional
+            Arguments of ``biomass.dynamics.solver.solve_ode`` passed by the models of
+            retried patients, e.g., ``{"method": "BDF"}`` for stiff models.
+            The models must define a ``problem.solver_options`` dict and pass it to
+            ``solve_ode``, e.g., ``solve_ode(..., **self.solver_options)`` in ``simulate``.
+
+        failures : list, optional
+            If given, patients that still fail after all attempts are appended to it as
+            :class:`TaskFailure` and the other patients are executed to completion.
+            Otherwise the first failure is raised.
+
+        Returns
+        -------
+        results : list
+            Return values of func, in the order of patients (:obj:`None` for failed patients).
         """
+        if patients is None:
+            patients = self.patients
+        results = [None] * len(patients)
+        for i, result in self.imap_execute(
+            func,
+            n_proc,
+            method,
+            progress,
+            shared_memory,
+            pool,
+            patients,
+            timeout=timeout,
+            retries=retries,
+            retry_solver=retry_solver,
+            failures=failures,
+        ):
+            results[i] = result
+        return results
 
-        ctx = multiprocessing.get_context(method)
-        p = ctx.Pool(processes=n_proc)
-        try:
-            with tqdm(total=len(self.patients), disable=not progress) as t:
-                for _ in p.imap_unordered(func, self.patients):
-                    t.update(1)
-        finally:
-            p.close()
+    def _report_failures(self) -> None:
+        """
+        Warn about patients that failed in ``run()``.
+        """
+        if self.failures:
+            warnings.warn(
+                "Failed: {}. See failures for details.".format(
+                    ", ".join(failure.patient for failure in self.failures)
+                ),
+                RuntimeWarning,
+            )
+
+    @staticmethod
+    def _check_retries(retries: int) -> None:
+        """
+        Check the number of retries.
+        """
+        if retries < 0:
+            raise ValueError(f"retries must be 0 or greater, got {retries}.")
+
+    def _check_retry_solver(self, retry_solver: Optional[dict]) -> None:
+        """
+        Check that retry_solver can be applied to the models, see ``_with_solver()``.
+        """
+        if retry_solver and self.patients:
+            _with_solver(self._create_model(self.patients[0]), **retry_solver)
 
     @staticmethod
     def _check_ctx(context: str) -> None:
@@ -91,45 +770,402 @@ class PatientModelSimulations(InSilico):
     biomass_kws : dict, optional
         Keyword arguments to pass to ``biomass.run_simulation``.
 
+    storage_kws : dict, optional
+        Store simulation results in compact form, see
+        :func:`pasmopy.store.compact_simulations`, e.g.,
+        ``{"dtype": "float32", "decimate": 4, "compress": True}``.
+        Time points that are not stored are linearly interpolated when loading.
+        Not used with ``viz_type`` "original" and "experiment", which save no
+        ``simulations_all``.
+
+    cohort_store : str, optional
+        Directory of a :class:`~pasmopy.store.CohortStore`. If given, ``run()`` also writes
+        the simulation results of every patient into it and response characteristics are
+        extracted from it, without loading patient models. Requires ``viz_type`` other than
+        "original" and "experiment", which save no simulation results of parameter sets. An existing store is grown when
+        patients or parameter sets are added, but a store of another model is not replaced,
+        see :meth:`~pasmopy.store.CohortStore.create`.
+
+    runtime_history : str, optional
+        JSON file recording the wall time of each patient. If given, patients expected
+        to take longest are started first, which shortens the total run time when a few
+        patients are much slower than the others. Patients not recorded yet are expected
+        to take time proportional to their number of parameter sets. Concurrent runs,
+        e.g., shards of ``pasmopy run``, should not share a file.
+        If :obj:`None` (default), patients are executed in list order.
+
+    profiling : :class:`~pasmopy.profiling.Profiling`, optional
+        If given, ``run()`` and ``subtyping()`` record the wall time of each stage
+        of each patient and the peak memory usage of worker processes, and write a report
+        at the end. :obj:`None` (default) to record nothing.
+
     response_characteristics : dict[str, Callable[[1d-array], int ot float]]
         A dictionary containing functions to extract dynamic response characteristics
-        from time-course simulations.
+        from time-course simulations. Functions marked with
+        :func:`pasmopy.features.vectorized` are applied to all time courses at once.
     """
 
     biomass_kws: Optional[dict] = field(default=None)
+    storage_kws: Optional[dict] = field(default=None)
+    cohort_store: Optional[str] = field(default=None)
+    runtime_history: Optional[str] = field(default=None)
+    profiling: Optional[Profiling] = field(default=None)
     response_characteristics: Dict[str, Callable[[np.ndarray], Union[int, float]]] = field(
         default_factory=lambda: dict(
             max=np.max,
             AUC=simpson,
+            time_to_peak=features.time_to_peak,
+            half_decay_time=features.half_decay_time,
+            steady_state=features.steady_state,
+            droprate=features.droprate,
         ),
         init=False,
     )
 
-    def _run_single_patient(self, patient: str) -> None:
+    def _create_store(self) -> CohortStore:
         """
-        Run a single patient-specifc model simulation.
+        Create the cohort store with the layout of the first patient's model,
+        or grow the existing one to the current patients and parameter sets.
         """
+        if not self.patients:
+            raise ValueError("No patients to store in cohort_store.")
+        if self._simulation_kws()["viz_type"] in ["original", "experiment"]:
+            raise ValueError(
+                "cohort_store requires a viz_type saving simulation results of "
+                "the estimated parameter sets: 'best', 'average' or 'n(=1, 2, ...)'."
+            )
+        model = self._create_model(self.patients[0])
+        return CohortStore.create(
+            self.cohort_store,
+            [self._patient_id(patient) for patient in self.patients],
+            model.observables,
+            model.problem.conditions,
+            model.problem.t,
+            max(map(self._n_paramsets, self.patients)),
+        )
 
-        kwargs = self.biomass_kws
-        if kwargs is None:
-            kwargs = {}
+    def _simulation_kws(self) -> dict:
+        """
+        Keyword arguments passed to ``biomass.run_simulation``.
+        """
+        kwargs = dict(self.biomass_kws) if self.biomass_kws is not None else {}
         kwargs.setdefault("viz_type", "average")
         kwargs.setdefault("stdev", True)
+        if (
+            kwargs["viz_type"] not in ["best", "average", "original", "experiment"]
+            and not str(kwargs["viz_type"]).isdecimal()
+        ):
+            raise ValueError(
+                "Available viz_type are: 'best','average','original','experiment','n(=1, 2, ...)'"
+            )
+        return kwargs
+
+    def _manifest(self, patient: Union[str, PatientOverlay]) -> Dict[str, str]:
+        """
+        Hashes of the inputs of a patient's simulation:
+        model code, estimated parameter sets in ``out/``, ``biomass_kws`` and ``storage_kws``.
+        """
+
+        def digest(dirname: str, include: Callable[[str], bool]) -> str:
+            sha256 = hashlib.sha256()
+            for root, dirs, files in os.walk(dirname):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    if include(os.path.relpath(path, dirname)):
+                        sha256.update(os.path.relpath(path, dirname).encode())
+                        with open(path, mode="rb") as f:
+                            sha256.update(hashlib.sha256(f.read()).digest())
+            return sha256.hexdigest()
 
-        model = create_model(".".join([self.path_to_models, patient.strip()]))
-        run_simulation(model, **kwargs)
+        path = self._patient_path(patient)
+        return {
+            "model": digest(
+                self._model_package(patient).replace(".", os.sep),
+                lambda f: f.endswith(".py")
+                and f.split(os.sep)[0] not in {"out", "simulation_data"},
+            ),
+            # Numbered parameter sets only; run_simulation itself writes out/best_fit_param.txt.
+            "out": digest(
+                os.path.join(path, "out"),
+                lambda f: f.split(os.sep)[0].isdecimal() and f.endswith(".npy"),
+            ),
+            "biomass_kws": hashlib.sha256(
+                json.dumps(self._simulation_kws(), sort_keys=True, default=repr).encode()
+            ).hexdigest(),
+            "storage_kws": hashlib.sha256(
+                json.dumps(self.storage_kws or {}, sort_keys=True, default=repr).encode()
+            ).hexdigest(),
+        }
 
+    def _manifest_file(self, patient: Union[str, PatientOverlay]) -> str:
+        return os.path.join(self._patient_path(patient), "simulation_data", "manifest.json")
+
+    def _is_fresh(self, patient: Union[str, PatientOverlay]) -> bool:
+        """
+        Whether the saved simulations of a patient are up to date.
+        """
+        if not any(
+            os.path.isfile(
+                os.path.join(
+                    self._patient_path(patient), "simulation_data", f"simulations_all{ext}"
+                )
+            )
+            for ext in [".npy", ".npz"]
+        ):
+            return False
+        try:
+            with open(self._manifest_file(patient), mode="r") as f:
+                return json.load(f) == self._manifest(patient)
+        except (OSError, ValueError):
+            return False
+
+    def _simulate(
+        self,
+        patient: Union[str, PatientOverlay],
+        render: bool = True,
+        save: bool = True,
+        precomputed: Optional[str] = None,
+    ) -> Tuple[ModelObject, Optional[np.ndarray]]:
+        """
+        Simulate a single patient-specific model.
+
+        Returns the model and ``simulations_all`` (:obj:`None` if no parameter sets
+        were executed). If ``save`` is :obj:`False`, simulation results are
+        not written to the patient's directory. If ``precomputed`` is given,
+        simulation results of each parameter set are loaded from it.
+        """
+        kwargs = self._simulation_kws()
+        kwargs.setdefault("show_all", False)
+        model = self._create_model(patient)
+        manifest = self._manifest_file(patient)
+        if save and os.path.isfile(manifest):
+            # Invalidate until this run completes.
+            os.remove(manifest)
+        simulation = _SimulationData(model, render=render, save=save, precomputed=precomputed)
+        with self._individualize(patient):
+            simulation.simulate_all(**kwargs)
+        if not save:
+            return model, simulation.simulations_all
+        with stage("write"):
+            # Not saved for viz_type "original" and "experiment"
+            simulated = os.path.isfile(
+                os.path.join(model.path, "simulation_data", "simulations_all.npy")
+            )
+            if self.storage_kws and simulated:
+                compact_simulations(
+                    os.path.join(model.path, "simulation_data"), model.problem.t, self.storage_kws
+                )
+            if self.cohort_store is not None:
+                CohortStore(self.cohort_store).write(
+                    self._patient_id(patient),
+                    load_simulations(os.path.join(model.path, "simulation_data")),
+                )
+            os.makedirs(os.path.dirname(manifest), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(manifest))
+            with os.fdopen(fd, mode="w") as f:
+                json.dump(self._manifest(patient), f, indent=2)
+            os.replace(tmp, manifest)
+        return model, simulation.simulations_all
+
+    def _run_single_patient(
+        self, patient: Union[str, PatientOverlay], render: bool = True
+    ) -> None:
+        """
+        Run a single patient-specifc model simulation.
+        """
+        self._simulate(patient, render=render)
+
+    def _paramset_dir(self, patient: Union[str, PatientOverlay]) -> str:
+        return os.path.join(self._patient_path(patient), "simulation_data", "paramsets")
+
+    def _simulate_paramset(self, task: _ParamsetTask) -> None:
+        """
+        Simulate a single parameter set of a patient-specific model.
+        """
+        model = self._create_model(task.patient)
+        os.makedirs(self._paramset_dir(task.patient), exist_ok=True)
+        path = os.path.join(self._paramset_dir(task.patient), f"{task.paramset:d}.npy")
+        if os.path.isfile(path):
+            os.remove(path)
+        with self._individualize(task.patient):
+            if _SimulationData(model, render=False, save=False)._validate(task.paramset):
+                with stage("write"):
+                    np.save(path, model.problem.simulations)
+
+    def _reduce_single_patient(
+        self, patient: Union[str, PatientOverlay], render: bool = True
+    ) -> None:
+        """
+        Assemble simulation results of the parameter sets of a patient.
+        """
+        self._simulate(patient, render=render, precomputed=self._paramset_dir(patient))
+        shutil.rmtree(self._paramset_dir(patient), ignore_errors=True)
+
+    @_profiled
     def run(
         self,
-        n_proc: Optional[int] = None,
+        n_proc: Optional[Union[int, Literal["auto"]]] = None,
         context: Literal["spawn", "fork", "forkserver"] = "spawn",
         progress: bool = True,
+        shared_memory: bool = False,
+        pool: Optional[WorkerPool] = None,
+        incremental: bool = False,
+        render: bool = True,
+        split_paramsets: bool = False,
+        *,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_solver: Optional[dict] = None,
     ) -> None:
         """
         Run simulations of multiple patient-specific models in parallel.
 
         Parameters
         ----------
+        n_proc : int or "auto", optional
+            The number of worker processes to use. If :obj:`None`, one less than
+            the CPUs available, respecting the CPU affinity and the cgroup CPU quota.
+            If "auto", additionally limited by the available memory, measured from the
+            peak memory usage of a worker process executing the first patient.
+
+        context : Literal["spawn", "fork", "forkserver"] (default: "spawn")
+            The context used for starting the worker processes.
+
+        progress : bool (default: :obj:`True`)
+            If :obj:`True`, the progress indicator will be shown.
+
+        shared_memory : bool (default: :obj:`False`)
+            If :obj:`True`, worker processes share a single copy of the transcriptomic data
+            through ``multiprocessing.shared_memory``.
+
+        pool : :class:`~pasmopy.parallel.WorkerPool`, optional
+            Running worker processes to reuse across calls.
+            If given, ``n_proc``, ``context`` and ``shared_memory`` are ignored.
+
+        incremental : bool (default: :obj:`False`)
+            If :obj:`True`, only patients whose model code, parameter sets in ``out/``,
+            ``biomass_kws`` or ``storage_kws`` changed since their last successful simulation
+            are simulated.
+            Each simulation records these in ``simulation_data/manifest.json``, so an
+            interrupted run resumes with the patients that did not finish.
+
+        render : bool (default: :obj:`True`)
+            If :obj:`False`, only simulation results are saved and figures are not drawn.
+            Figures can be drawn later with ``render()``.
+
+        split_paramsets : bool (default: :obj:`False`)
+            If :obj:`True`, each parameter set of each patient is simulated as a task
+            of its own, and the results of each patient are then assembled into
+            ``simulations_all.npy`` and figures. Use it when there are fewer patients than
+            worker processes, or when patients differ widely in the number of parameter sets.
+
+        timeout, retries, retry_solver
+            Wall time limit of each patient in seconds, the number of retries of failed ones
+            and arguments of ``biomass.dynamics.solver.solve_ode`` used when retrying,
+            e.g., ``{"method": "BDF"}``. See ``parallel_execute()``.
+            Patients that still fail are listed in ``failures`` with the exception and
+            the elapsed time, and the other ones are run to completion.
+        """
+        if n_proc is None:
+            n_proc = max(available_cpus() - 1, 1)
+        self._check_ctx(context)
+        self._check_retries(retries)
+        self._check_retry_solver(retry_solver)
+        viz_type = self._simulation_kws()["viz_type"]
+        self.failures = []
+        patients = self.patients
+        if self.cohort_store is not None and self.patients:
+            store = self._create_store()
+            written = dict(zip(store.patients, store.written()))
+            if incremental:
+                patients = [
+                    patient
+                    for patient in self.patients
+                    if not written[self._patient_id(patient)] or not self._is_fresh(patient)
+                ]
+        elif incremental:
+            patients = [patient for patient in self.patients if not self._is_fresh(patient)]
+        if split_paramsets and viz_type not in ["original", "experiment"]:
+            self._split_execute(
+                self._simulate_paramset,
+                partial(self._reduce_single_patient, render=render),
+                n_proc,
+                context,
+                progress,
+                shared_memory=shared_memory,
+                pool=pool,
+                patients=patients,
+                timeout=timeout,
+                retries=retries,
+                retry_solver=retry_solver,
+                failures=self.failures,
+            )
+        else:
+            self.parallel_execute(
+                partial(self._run_single_patient, render=render),
+                n_proc,
+                context,
+                progress,
+                shared_memory=shared_memory,
+                pool=pool,
+                patients=patients,
+                timeout=timeout,
+                retries=retries,
+                retry_solver=retry_solver,
+                failures=self.failures,
+            )
+        self._report_failures()
+
+    def _render_single_patient(self, patient: Union[str, PatientOverlay]) -> None:
+        """
+        Draw figures of saved simulation results of a single patient.
+        """
+        kwargs = self._simulation_kws()
+        model = self._create_model(patient)
+        simulation_data = os.path.join(model.path, "simulation_data")
+        if os.path.isfile(
+            simulations := os.path.join(simulation_data, f"simulations_{kwargs['viz_type']}.npy")
+        ):
+            # 'best', 'original' or 'n'
+            model.problem.simulations = np.load(simulations)
+        n_file = [] if kwargs["viz_type"] in ["original", "experiment"] else model.get_executable()
+        SignalingSystems(model).plot_timecourse(
+            n_file,
+            kwargs["viz_type"],
+            kwargs.get("show_all", False),
+            kwargs["stdev"],
+            (
+                load_simulations(simulation_data)
+                if n_file
+                else np.full(
+                    (
+                        len(model.observables),
+                        0,
+                        len(model.problem.conditions),
+                        len(model.problem.t),
+                    ),
+                    np.nan,
+                )
+            ),
+        )
+
+    def render(
+        self,
+        patients: Optional[List[str]] = None,
+        n_proc: Optional[int] = None,
+        context: Literal["spawn", "fork", "forkserver"] = "spawn",
+        progress: bool = True,
+        pool: Optional[WorkerPool] = None,
+    ) -> None:
+        """
+        Draw figures of simulation results saved by ``run(render=False)`` in parallel.
+
+        Parameters
+        ----------
+        patients : list of strings, optional
+            IDs of the patients to draw. If :obj:`None`, all patients.
+
         n_proc : int, optional
             The number of worker processes to use.
 
@@ -138,11 +1174,22 @@ class PatientModelSimulations(InSilico):
 
         progress : bool (default: :obj:`True`)
             If :obj:`True`, the progress indicator will be shown.
+
+        pool : :class:`~pasmopy.parallel.WorkerPool`, optional
+            Running worker processes to reuse. If given, ``n_proc`` and ``context`` are ignored.
         """
         if n_proc is None:
-            n_proc = multiprocessing.cpu_count() - 1
+            n_proc = max(available_cpus() - 1, 1)
         self._check_ctx(context)
-        self.parallel_execute(self._run_single_patient, n_proc, context, progress)
+        selected = self.patients
+        if patients is not None:
+            selected = [p for p in self.patients if self._patient_id(p) in set(patients)]
+            if len(selected) != len(set(patients)):
+                unknown = set(patients) - {self._patient_id(p) for p in self.patients}
+                raise NameError("Unknown patients: {}".format(", ".join(sorted(unknown))))
+        self.parallel_execute(
+            self._render_single_patient, n_proc, context, progress, pool=pool, patients=selected
+        )
 
     @staticmethod
     def _cleanup_csv(dirname: str) -> None:
@@ -162,19 +1209,26 @@ class PatientModelSimulations(InSilico):
     @staticmethod
     def _normalize(
         data: np.ndarray,
-        patient_specific: ModelObject,
+        conditions: List[str],
         obs_name: str,
         normalization: dict,
     ) -> np.ndarray:
         """
         Return normalized simulation results.
 
+        Each parameter set is divided by its value at ``timepoint`` (maximum over the
+        normalization conditions) or, if ``timepoint`` is :obj:`None`, by its maximum over
+        the normalization conditions; parameter sets that are all NaN or all zero are left
+        as they are. Results are then averaged over parameter sets and, if ``timepoint``
+        is :obj:`None`, scaled again by the maximum over the normalization conditions.
+
         Parameters
         ----------
         data : numpy.ndarray
-            Raw simulation results.
-        patient_specific : biomass.model_object.ModelObject
-            Patient-specific model object.
+            Raw simulation results of shape (..., parameter sets, conditions, time),
+            e.g., stacked over patients. Normalized in place if writable.
+        conditions : list of strings
+            Experimental conditions along the conditions axis, i.e., ``problem.conditions``.
         obs_name : str
             Observable name.
         normalization : dict
@@ -183,94 +1237,492 @@ class PatientModelSimulations(InSilico):
         Returns
         -------
         data : numpy.ndarray
-            Normalized simulation results.
+            Normalized simulation results of shape (..., conditions, time).
         """
         if not normalization[obs_name]["condition"]:
-            normalization[obs_name]["condition"] = patient_specific.problem.conditions
-        for i in range(data.shape[0]):
-            if not np.isnan(data[i]).all() and not np.all(data[i] == 0.0):
-                data[i] /= (
-                    data[i][
-                        [
-                            patient_specific.problem.conditions.index(c)
-                            for c in normalization[obs_name]["condition"]
-                        ],
-                        normalization[obs_name]["timepoint"],
-                    ]
-                    if normalization[obs_name]["timepoint"] is not None
-                    else np.nanmax(
-                        data[i][
-                            [
-                                patient_specific.problem.conditions.index(c)
-                                for c in normalization[obs_name]["condition"]
-                            ],
-                        ]
-                    )
+            normalization[obs_name]["condition"] = conditions
+        condition_index = [conditions.index(c) for c in normalization[obs_name]["condition"]]
+        timepoint: Optional[int] = normalization[obs_name]["timepoint"]
+        if not data.flags.writeable:
+            data = np.array(data)
+        to_scale = ~(np.isnan(data).all(axis=(-2, -1)) | np.all(data == 0.0, axis=(-2, -1)))
+        with warnings.catch_warnings():
+            # All-NaN parameter sets are not scaled.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            scale = (
+                np.nanmax(data[..., condition_index, timepoint], axis=-1)
+                if timepoint is not None
+                else np.nanmax(data[..., condition_index, :], axis=(-2, -1))
+            )
+        np.divide(
+            data,
+            scale[..., np.newaxis, np.newaxis],
+            out=data,
+            where=to_scale[..., np.newaxis, np.newaxis],
+        )
+        data = np.nanmean(data, axis=-3)
+        if timepoint is None:
+            norm_max = np.max(data[..., condition_index, :], axis=(-2, -1))
+            np.divide(
+                data,
+                norm_max[..., np.newaxis, np.newaxis],
+                out=data,
+                where=(norm_max != 0.0)[..., np.newaxis, np.newaxis],
+            )
+        return data
+
+    def _select_time_courses(
+        self,
+        all_data: np.ndarray,
+        observables: List[str],
+        conditions: List[str],
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: dict,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Time courses of all observables used for extracting response characteristics
+        from ``simulations_all`` of a single patient, each of shape (conditions, time).
+        """
+        time_courses = {}
+        for obs_name, conditions_and_metrics in dynamical_features.items():
+            data = all_data[observables.index(obs_name)]
+            if obs_name in normalization.keys():
+                data = self._normalize(data, conditions, obs_name, normalization)
+            else:
+                data = np.nanmean(data, axis=0)
+            time_courses[obs_name] = data[[conditions.index(c) for c in conditions_and_metrics]]
+        return time_courses
+
+    def _extract_single_patient(
+        self,
+        patient: Union[str, PatientOverlay],
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: dict,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Time courses of all observables used for extracting response characteristics
+        from saved simulation results of a single patient.
+        """
+        patient_specific = self._create_model(patient)
+        with stage("read"):
+            simulations_all = load_simulations(
+                os.path.join(patient_specific.path, "simulation_data"), mmap_mode="r"
+            )
+        with stage("features"):
+            return self._select_time_courses(
+                simulations_all,
+                patient_specific.observables,
+                patient_specific.problem.conditions,
+                dynamical_features,
+                normalization,
+            )
+
+    def _stream_single_patient(
+        self,
+        patient: Union[str, PatientOverlay],
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: dict,
+        render: bool,
+        save: bool,
+        time_courses: bool,
+    ) -> PatientCharacteristics:
+        """
+        Simulate a single patient and extract its response characteristics in memory.
+        """
+        model, simulations_all = self._simulate(patient, render=render, save=save)
+        if simulations_all is None:
+            raise ValueError(
+                f"{self._patient_id(patient)}: no estimated parameter sets were simulated."
+            )
+        with stage("features"):
+            selected = self._select_time_courses(
+                simulations_all,
+                model.observables,
+                model.problem.conditions,
+                dynamical_features,
+                normalization,
+            )
+            return PatientCharacteristics(
+                self._patient_id(patient),
+                {
+                    obs_name: extract_features(
+                        selected[obs_name][np.newaxis],
+                        [self._patient_id(patient)],
+                        list(conditions_and_metrics),
+                        conditions_and_metrics,
+                        self.response_characteristics,
+                    ).iloc[0]
+                    for obs_name, conditions_and_metrics in dynamical_features.items()
+                },
+                selected if time_courses else None,
+            )
+
+    def stream(
+        self,
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: Optional[dict] = None,
+        *,
+        time_courses: bool = False,
+        save: bool = True,
+        render: bool = False,
+        n_proc: Optional[int] = None,
+        context: Literal["spawn", "fork", "forkserver"] = "spawn",
+        progress: bool = True,
+        shared_memory: bool = False,
+        pool: Optional[WorkerPool] = None,
+    ) -> Iterator[PatientCharacteristics]:
+        """
+        Simulate patients and extract their response characteristics in one pass,
+        yielding each patient's results as soon as it finishes.
+
+        Parameters
+        ----------
+        dynamical_features : Dict[str, Dict[str, List[str]]]
+            ``{"observable": {"condition": ["metric", ...], ...}, ...}``.
+
+        normalization : dict, optional
+            Normalization condition of each observable. See ``subtyping()``.
+
+        time_courses : bool (default: :obj:`False`)
+            If :obj:`True`, normalized time courses are also returned.
+
+        save : bool (default: :obj:`True`)
+            If :obj:`False`, simulation results are not written to the patients' directories
+            (nor to ``storage_kws`` / ``cohort_store``).
+
+        render : bool (default: :obj:`False`)
+            If :obj:`True`, figures are drawn as in ``run()``.
+
+        n_proc, context, progress, shared_memory, pool
+            See ``run()``.
+
+        Yields
+        ------
+        characteristics : :class:`PatientCharacteristics`
+            Results of each patient, in order of completion.
+
+        Examples
+        --------
+        >>> simulations.subtyping(
+        ...     "subtype_classification.pdf",
+        ...     dynamical_features,
+        ...     normalization,
+        ...     results=simulations.stream(dynamical_features, normalization, save=False),
+        ... )
+        """
+        if normalization is None:
+            normalization = {}
+        if n_proc is None:
+            n_proc = max(available_cpus() - 1, 1)
+        self._check_ctx(context)
+        features.check_conditions(c for cs in dynamical_features.values() for c in cs)
+        if save and self.cohort_store is not None and self.patients:
+            self._create_store()
+        for _, result in self.imap_execute(
+            partial(
+                self._stream_single_patient,
+                dynamical_features=dynamical_features,
+                normalization=normalization,
+                render=render,
+                save=save,
+                time_courses=time_courses,
+            ),
+            n_proc,
+            context,
+            progress,
+            shared_memory=shared_memory,
+            pool=pool,
+        ):
+            yield result
+
+    def _read_store(
+        self,
+        patients: List[str],
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: dict,
+        chunk_bytes: int = 2**28,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Time courses of all observables used for extracting response characteristics
+        from the cohort store, each of shape (patients, conditions, time).
+        """
+        store = CohortStore(self.cohort_store)
+        written = dict(zip(store.patients, store.written()))
+        missing = [patient for patient in patients if not written.get(patient, False)]
+        if missing:
+            raise ValueError(
+                "Simulation results of {} are not in {}.".format(
+                    ", ".join(missing), self.cohort_store
                 )
-        data = np.nanmean(data, axis=0)
-        norm_max: float = np.max(
-            data[
+            )
+        index = [store.patients.index(patient) for patient in patients]
+        time_courses = {}
+        for obs_name, conditions_and_metrics in dynamical_features.items():
+            block = store.read(obs_name)
+            selected = [store.conditions.index(c) for c in conditions_and_metrics]
+            chunksize = max(1, chunk_bytes // max(1, block[0].nbytes))
+            time_courses[obs_name] = np.concatenate(
                 [
-                    patient_specific.problem.conditions.index(c)
-                    for c in normalization[obs_name]["condition"]
-                ],
-            ]
+                    (
+                        self._normalize(
+                            block[index[i : i + chunksize]],
+                            store.conditions,
+                            obs_name,
+                            normalization,
+                        )
+                        if obs_name in normalization.keys()
+                        else np.nanmean(block[index[i : i + chunksize]], axis=1)
+                    )[:, selected]
+                    for i in range(0, len(index), chunksize)
+                ]
+            )
+        return time_courses
+
+    def extract_characteristics(
+        self,
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: Optional[dict] = None,
+        progress: bool = True,
+        *,
+        n_proc: Optional[int] = None,
+        context: Literal["spawn", "fork", "forkserver"] = "spawn",
+        pool: Optional[WorkerPool] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Extract response characteristics from patient-specific signaling dynamics.
+
+        Each patient model is created and its simulation results are loaded once,
+        and patients are processed in parallel. With ``cohort_store``, time courses
+        are instead read from the store in chunks of patients. The time courses of all
+        patients are then stacked and each metric is evaluated for the whole cohort at once.
+
+        Parameters
+        ----------
+        dynamical_features : Dict[str, Dict[str, List[str]]]
+            ``{"observable": {"condition": ["metric", ...], ...}, ...}``.
+
+        normalization : dict, optional
+            Normalization condition of each observable. See ``subtyping()``.
+
+        progress : bool (default: :obj:`True`)
+            If :obj:`True`, the progress indicator will be shown.
+
+        n_proc : int, optional
+            The number of worker processes to use.
+
+        context : Literal["spawn", "fork", "forkserver"] (default: "spawn")
+            The context used for starting the worker processes.
+
+        pool : :class:`~pasmopy.parallel.WorkerPool`, optional
+            Running worker processes to reuse. If given, ``n_proc`` and ``context`` are ignored.
+
+        Returns
+        -------
+        characteristics : Dict[str, pandas.DataFrame]
+            Response characteristics of each observable, indexed by patient,
+            with columns ``{condition}_{metric}``.
+        """
+        if normalization is None:
+            normalization = {}
+        if n_proc is None:
+            n_proc = max(available_cpus() - 1, 1)
+        self._check_ctx(context)
+        features.check_conditions(c for cs in dynamical_features.values() for c in cs)
+        # Workers only select time courses, so response_characteristics, which may not be
+        # picklable (e.g., lambdas), are not sent to them.
+        extract = partial(
+            _extract_time_courses,
+            self.path_to_models,
+            dynamical_features=dynamical_features,
+            normalization=normalization,
         )
-        if normalization[obs_name]["timepoint"] is None and norm_max != 0.0:
-            data /= norm_max
-        return data
+        patients = [self._patient_id(patient) for patient in self.patients]
+        if self.cohort_store is not None:
+            with stage("read"):
+                time_courses = self._read_store(patients, dynamical_features, normalization)
+        else:
+            if pool is None and n_proc != "auto" and n_proc <= 1:
+                per_patient = [
+                    extract(patient) for patient in tqdm(self.patients, disable=not progress)
+                ]
+            else:
+                per_patient = self.parallel_execute(extract, n_proc, context, progress, pool=pool)
+            time_courses = {
+                obs_name: np.stack(
+                    [patient_specific[obs_name] for patient_specific in per_patient]
+                )
+                for obs_name in dynamical_features
+            }
+        with stage("features"):
+            return {
+                obs_name: extract_features(
+                    time_courses[obs_name],
+                    patients,
+                    list(conditions_and_metrics),
+                    conditions_and_metrics,
+                    self.response_characteristics,
+                )
+                for obs_name, conditions_and_metrics in dynamical_features.items()
+            }
 
     def _extract(
         self,
         dynamical_features: Dict[str, Dict[str, List[str]]],
         normalization: dict,
         progress: bool,
-    ) -> None:
+        n_proc: Optional[int] = None,
+        context: Literal["spawn", "fork", "forkserver"] = "spawn",
+        pool: Optional[WorkerPool] = None,
+    ) -> Dict[str, pd.DataFrame]:
         """
         Extract response characteristics from patient-specific signaling dynamics.
         """
-        os.makedirs("classification", exist_ok=True)
-        self._cleanup_csv("classification")
-        for obs_name, conditions_and_metrics in dynamical_features.items():
-            with open(
-                os.path.join("classification", f"{obs_name}.csv"),
-                "w",
-                newline="",
-            ) as f:
-                writer = csv.writer(f)
-                header = ["Sample"]
-                for condition, metrics in conditions_and_metrics.items():
-                    for metric in metrics:
-                        header.append(f"{condition}_{metric}")
-                writer.writerow(header)
-
-                for patient in tqdm(self.patients, disable=not progress):
-                    patient_specific = create_model(
-                        ".".join([self.path_to_models, patient.strip()])
-                    )
-                    all_data = np.load(
-                        os.path.join(
-                            patient_specific.path,
-                            "simulation_data",
-                            "simulations_all.npy",
-                        )
-                    )
-                    data = np.array(all_data[patient_specific.observables.index(obs_name)])
-                    if obs_name in normalization.keys():
-                        data = self._normalize(data, patient_specific, obs_name, normalization)
-                    patient_specific_characteristics = [patient]
-                    for h in header[1:]:
-                        condition, metric = h.split("_")
-                        patient_specific_characteristics.append(
-                            str(
-                                self.response_characteristics[metric](
-                                    data[patient_specific.problem.conditions.index(condition)],
-                                )
-                            )
-                        )
+        characteristics = self.extract_characteristics(
+            dynamical_features,
+            copy.deepcopy(normalization),
+            progress,
+            n_proc=n_proc,
+            context=context,
+            pool=pool,
+        )
+        self._write_characteristics(characteristics, dynamical_features, normalization)
+        return characteristics
+
+    def _collect(
+        self,
+        results: Iterable[PatientCharacteristics],
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Assemble streamed response characteristics, in the order of ``self.patients``.
+        """
+        received: Dict[str, PatientCharacteristics] = {}
+        for result in results:
+            received[result.patient] = result
+        patients = [
+            self._patient_id(patient)
+            for patient in self.patients
+            if self._patient_id(patient) in received
+        ]
+        return {
+            obs_name: pd.DataFrame(
+                [received[patient].characteristics[obs_name] for patient in patients],
+                index=pd.Index(patients, name="Sample"),
+                dtype=float,
+            )
+            for obs_name in dynamical_features
+        }
+
+    def _write_characteristics(
+        self,
+        characteristics: Dict[str, pd.DataFrame],
+        dynamical_features: Dict[str, Dict[str, List[str]]],
+        normalization: dict,
+    ) -> None:
+        """
+        Write response characteristics to classification/features.npz,
+        and of each observable to a CSV file for viewing.
+        """
+        with stage("write"):
+            os.makedirs("classification", exist_ok=True)
+            self._cleanup_csv("classification")
+            save_features(
+                os.path.join("classification", "features.npz"),
+                characteristics,
+                dynamical_features,
+                normalization,
+            )
+            for obs_name, df in characteristics.items():
+                with open(
+                    os.path.join("classification", f"{obs_name}.csv"),
+                    "w",
+                    newline="",
+                ) as f:
+                    writer = csv.writer(f)
+                    writer.writerow([df.index.name] + list(df.columns))
                     writer = csv.writer(f, lineterminator="\n")
-                    writer.writerow(patient_specific_characteristics)
+                    writer.writerows(df.itertuples())
+
+    @staticmethod
+    def _feature_table(characteristics: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Response characteristics of all observables in a single table.
+        """
+        all_info = pd.concat(
+            [
+                df.rename(columns=lambda s: observable.replace("_", " ") + "_" + s)
+                for observable, df in characteristics.items()
+            ],
+            axis=1,
+        )
+        all_info.index.name = ""
+        return all_info
+
+    def assign(
+        self,
+        patients: List[Union[str, PatientOverlay]],
+        recluster: bool = False,
+        progress: bool = True,
+        *,
+        n_proc: Optional[int] = None,
+        context: Literal["spawn", "fork", "forkserver"] = "spawn",
+        pool: Optional[WorkerPool] = None,
+    ) -> pd.Series:
+        """
+        Place new patients into the subtypes fitted by ``subtyping(clustering=...)``.
 
+        Response characteristics are extracted for the new patients only, with the
+        dynamical features and normalization used for subtyping, and each patient is
+        assigned to the nearest subtype. The fitted state in ``classification/subtypes.npz``
+        and the CSV files in ``classification/`` are updated.
+
+        Parameters
+        ----------
+        patients : list of strings or :class:`PatientOverlay`
+            New patients, simulated with ``run()`` beforehand.
+
+        recluster : bool (default: :obj:`False`)
+            If :obj:`True`, all patients are clustered again afterwards.
+
+        progress, n_proc, context, pool
+            See ``extract_characteristics()``.
+
+        Returns
+        -------
+        labels : pandas.Series
+            Subtypes of the new patients (of all patients if ``recluster``).
+        """
+        state = os.path.join("classification", "subtypes.npz")
+        if not os.path.isfile(state):
+            raise FileNotFoundError(f"{state} not found. Run subtyping(clustering=...) first.")
+        clustering, metadata = Subtypes.load(state)
+        new = replace(self, patients=patients)
+        new.response_characteristics = self.response_characteristics
+        characteristics = new.extract_characteristics(
+            metadata["dynamical_features"],
+            copy.deepcopy(metadata["normalization"]),
+            progress,
+            n_proc=n_proc,
+            context=context,
+            pool=pool,
+        )
+        labels = clustering.assign(self._feature_table(characteristics))
+        if recluster:
+            labels = clustering.fit(clustering.features_).labels_
+        clustering.save(state, **metadata)
+        path = os.path.join("classification", "features.npz")
+        if os.path.isfile(path):
+            stored, _ = load_features(path)
+            for obs_name, df in characteristics.items():
+                characteristics[obs_name] = pd.concat(
+                    [stored[obs_name].drop(df.index, errors="ignore"), df]
+                )
+        self._write_characteristics(
+            characteristics, metadata["dynamical_features"], metadata["normalization"]
+        )
+        return labels
+
+    @_profiled
     def subtyping(
         self,
         fname: Optional[str],
@@ -279,10 +1731,18 @@ class PatientModelSimulations(InSilico):
         progress: bool = True,
         *,
         clustermap_kws: Optional[dict] = None,
-    ):
+        n_proc: Optional[int] = None,
+        context: Literal["spawn", "fork", "forkserver"] = "spawn",
+        pool: Optional[WorkerPool] = None,
+        results: Optional[Iterable[PatientCharacteristics]] = None,
+        clustering: Optional[Subtypes] = None,
+    ) -> Optional[Subtypes]:
         """
         Classify patients based on dynamic characteristics extracted from simulation results.
 
+        Characteristics are saved to ``classification/features.npz``, which can be read
+        with :func:`pasmopy.features.load_features`, and to a CSV file per observable.
+
         Parameters
         ----------
         fname : str, path-like or :obj:`None`
@@ -291,6 +1751,8 @@ class PatientModelSimulations(InSilico):
         dynamical_features : Dict[str, Dict[str, List[str]]]
             ``{"observable": {"condition": ["metric", ...], ...}, ...}``.
             Characteristics in the signaling dynamics used for classification.
+            Conditions must not contain ``_``, which separates them from metrics
+            in the column names ``{condition}_{metric}``.
 
         normalization : dict, optional (default: :obj:`None`)
             * 'timepoint' : Optional[int]
@@ -306,6 +1768,31 @@ class PatientModelSimulations(InSilico):
         clustermap_kws : dict, optional
             Keyword arguments to pass to ``seaborn.clustermap()``.
 
+        n_proc : int, optional
+            The number of worker processes used to extract response characteristics.
+
+        context : Literal["spawn", "fork", "forkserver"] (default: "spawn")
+            The context used for starting the worker processes.
+
+        pool : :class:`~pasmopy.parallel.WorkerPool`, optional
+            Running worker processes to reuse, e.g., the one passed to ``run()``.
+            If given, ``n_proc`` and ``context`` are ignored.
+
+        results : Iterable[:class:`PatientCharacteristics`], optional
+            Response characteristics streamed from ``stream()``, consumed as they arrive
+            instead of being extracted from saved simulation results.
+
+        clustering : :class:`~pasmopy.clustering.Subtypes`, optional
+            If given, patients are classified by it and, if ``fname`` is not :obj:`None`,
+            a heatmap ordered by subtype is drawn instead of ``seaborn.clustermap``,
+            which does not scale beyond a few thousand patients.
+            The fitted state is saved to ``classification/subtypes.npz`` for ``assign()``.
+
+        Returns
+        -------
+        clustering : :class:`~pasmopy.clustering.Subtypes` or :obj:`None`
+            The fitted ``clustering``.
+
         Examples
         --------
         Subtype classification
@@ -332,10 +1819,11 @@ class PatientModelSimulations(InSilico):
         Add new characteristics
 
         >>> import numpy as np
-        >>> def get_droprate(time_course: np.ndarray) -> float:
-        ...     return - (time_course[-1] - np.max(time_course)) / (len(time_course) - np.argmax(time_course))
-        >>> simulations.response_characteristics["droprate"] = get_droprate
+        >>> def get_range(time_course: np.ndarray) -> float:
+        ...     return np.max(time_course) - np.min(time_course)
+        >>> simulations.response_characteristics["range"] = get_range
         """
+        features.check_conditions(c for cs in dynamical_features.values() for c in cs)
         if normalization is None:
             normalization = {}
         # seaborn clustermap
@@ -344,22 +1832,38 @@ class PatientModelSimulations(InSilico):
         clustermap_kws.setdefault("z_score", 1)
         clustermap_kws.setdefault("cmap", "RdBu_r")
         clustermap_kws.setdefault("center", 0)
+        metadata = dict(
+            dynamical_features=copy.deepcopy(dynamical_features),
+            normalization=copy.deepcopy(normalization),
+        )
         # extract response characteristics
-        self._extract(dynamical_features, normalization, progress)
+        if results is not None:
+            characteristics = self._collect(results, dynamical_features)
+            self._write_characteristics(characteristics, dynamical_features, normalization)
+        else:
+            characteristics = self._extract(
+                dynamical_features,
+                normalization,
+                progress,
+                n_proc=n_proc,
+                context=context,
+                pool=pool,
+            )
+        all_info = self._feature_table(characteristics)
+        if clustering is not None:
+            with stage("clustering"):
+                clustering.fit(all_info)
+            with stage("write"):
+                clustering.save(os.path.join("classification", "subtypes.npz"), **metadata)
+            if fname is not None:
+                with stage("render"):
+                    clustering.plot(fname)
+            return clustering
         if fname is not None:
-            characteristics: List[pd.DataFrame] = []
-            files = os.listdir("classification")
-            for file in files:
-                observable, ext = os.path.splitext(file)
-                if ext == ".csv":
-                    df = pd.read_csv(os.path.join("classification", file), index_col="Sample")
-                    characteristics.append(
-                        df.rename(columns=lambda s: observable.replace("_", " ") + "_" + s)
-                    )
-            all_info = pd.concat(characteristics, axis=1)
-            all_info.index.name = ""
-            fig = sns.clustermap(all_info, **clustermap_kws)
-            fig.savefig(fname)
+            with stage("render"):
+                fig = sns.clustermap(all_info, **clustermap_kws)
+                fig.savefig(fname)
+        return None
 
 
 @dataclass
@@ -371,15 +1875,24 @@ class PatientModelAnalyses(InSilico):
     ----------
     biomass_kws : dict, optional
         Keyword arguments to pass to ``biomass.run_analysis``.
+
+    runtime_history : str, optional
+        JSON file recording the wall time of each patient, see
+        :class:`PatientModelSimulations`.
+
+    profiling : :class:`~pasmopy.profiling.Profiling`, optional
+        If given, ``run()`` records the wall time of each stage of each patient,
+        see :class:`PatientModelSimulations`.
     """
 
     biomass_kws: Optional[dict] = field(default=None)
+    runtime_history: Optional[str] = field(default=None)
+    profiling: Optional[Profiling] = field(default=None)
 
-    def _run_single_patient(self, patient: str) -> None:
+    def _analysis_kws(self) -> dict:
         """
-        Run a single patient-specifc model analysis.
+        Keyword arguments passed to ``biomass.run_analysis``.
         """
-
         kwargs = self.biomass_kws
         if kwargs is None:
             kwargs = {}
@@ -387,31 +1900,185 @@ class PatientModelAnalyses(InSilico):
         kwargs.setdefault("metric", "integral")
         kwargs.setdefault("style", "heatmap")
         kwargs.setdefault("options", None)
+        return kwargs
+
+    def _run_single_patient(self, patient: Union[str, PatientOverlay]) -> None:
+        """
+        Run a single patient-specifc model analysis.
+        """
+        kwargs = self._analysis_kws()
+        model = self._create_model(patient)
+        with self._individualize(patient), stage("analysis"):
+            run_analysis(model, **kwargs)
 
-        model = create_model(".".join([self.path_to_models, patient.strip()]))
-        run_analysis(model, **kwargs)
+    def _sensitivity(
+        self, model: ModelObject
+    ) -> Tuple[
+        Union[ReactionSensitivity, ParameterSensitivity, InitialConditionSensitivity], list
+    ]:
+        """
+        Sensitivity analysis performed by ``biomass.run_analysis`` and the indices
+        of the perturbed reactions, parameters or initial conditions.
+        """
+        kwargs = self._analysis_kws()
+        options = dict(kwargs["options"]) if kwargs["options"] is not None else {}
+        options.setdefault("excluded_params", [])
+        options.setdefault("excluded_initials", [])
+        if kwargs["target"] == "reaction":
+            analysis = ReactionSensitivity(model, kwargs.get("create_metrics"))
+            if not model.rxn.reactions:
+                raise ValueError("Define reaction indices (reactions) in reaction_network.py")
+            return analysis, sum(analysis._group(), [])
+        elif kwargs["target"] == "parameter":
+            analysis = ParameterSensitivity(model, kwargs.get("create_metrics"))
+            return analysis, analysis._get_param_indices(options["excluded_params"])
+        elif kwargs["target"] == "initial_condition":
+            analysis = InitialConditionSensitivity(model, kwargs.get("create_metrics"))
+            return analysis, analysis._get_nonzero_indices(options["excluded_initials"])
+        raise ValueError(
+            "Available targets are: '{}'.".format(
+                "', '".join(["reaction", "parameter", "initial_condition"])
+            )
+        )
+
+    def _paramset_dir(self, patient: Union[str, PatientOverlay]) -> str:
+        return os.path.join(self._patient_path(patient), "sensitivity_coefficients", "paramsets")
 
+    def _analyze_paramset(self, task: _ParamsetTask) -> None:
+        """
+        Compute sensitivity coefficients of a single parameter set of a patient-specific model.
+        """
+        analysis, indices = self._sensitivity(
+            _ParamsetModel(self._create_model(task.patient), task.paramset)
+        )
+        with self._individualize(task.patient), stage("sensitivity"):
+            coefficients = analysis._calc_sensitivity_coefficients(
+                self._analysis_kws()["metric"], indices, False
+            )
+        with stage("write"):
+            os.makedirs(self._paramset_dir(task.patient), exist_ok=True)
+            np.save(
+                os.path.join(self._paramset_dir(task.patient), f"{task.paramset:d}.npy"),
+                coefficients,
+            )
+
+    def _reduce_single_patient(self, patient: Union[str, PatientOverlay]) -> None:
+        """
+        Assemble sensitivity coefficients of the parameter sets of a patient
+        and draw figures. Parameter sets whose analysis failed are NaN.
+        """
+        kwargs = dict(self._analysis_kws())
+        model = self._create_model(patient)
+        analysis, _ = self._sensitivity(model)
+        coefficients: Dict[int, np.ndarray] = {}
+        with stage("read"):
+            for paramset in model.get_executable():
+                path = os.path.join(self._paramset_dir(patient), f"{paramset:d}.npy")
+                if os.path.isfile(path):
+                    coefficients[paramset] = np.load(path)
+                else:
+                    warnings.warn(f"Sensitivity analysis failed. #{paramset:d}", RuntimeWarning)
+        if model.get_executable() and not coefficients:
+            raise RuntimeError(f"{self._patient_id(patient)}: no parameter sets were analyzed.")
+        if coefficients:
+            failed = np.full_like(next(iter(coefficients.values())), np.nan)
+            with stage("write"):
+                path = analysis._coefficients(kwargs["metric"])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                np.save(
+                    path,
+                    np.concatenate(
+                        [coefficients.get(paramset, failed) for paramset in model.get_executable()]
+                    ),
+                )
+            # Load the coefficients assembled above instead of computing them again.
+            kwargs["options"] = dict(kwargs["options"] or {}, overwrite=False)
+        with self._individualize(patient), stage("render"):
+            run_analysis(model, **kwargs)
+        shutil.rmtree(self._paramset_dir(patient), ignore_errors=True)
+
+    @_profiled
     def run(
         self,
-        n_proc: Optional[int] = None,
+        n_proc: Optional[Union[int, Literal["auto"]]] = None,
         context: Literal["spawn", "fork", "forkserver"] = "spawn",
         progress: bool = True,
+        shared_memory: bool = False,
+        pool: Optional[WorkerPool] = None,
+        split_paramsets: bool = False,
+        *,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_solver: Optional[dict] = None,
     ) -> None:
         """
         Run analyses of multiple patient-specific models in parallel.
 
         Parameters
         ----------
-        n_proc : int, optional
-            The number of worker processes to use.
+        n_proc : int or "auto", optional
+            The number of worker processes to use. If :obj:`None`, one less than
+            the CPUs available, respecting the CPU affinity and the cgroup CPU quota.
+            If "auto", additionally limited by the available memory, measured from the
+            peak memory usage of a worker process executing the first patient.
 
         context : Literal["spawn", "fork", "forkserver"] (default: "spawn")
             The context used for starting the worker processes.
 
         progress : bool (default: :obj:`True`)
             If :obj:`True`, the progress indicator will be shown.
+
+        shared_memory : bool (default: :obj:`False`)
+            If :obj:`True`, worker processes share a single copy of the transcriptomic data
+            through ``multiprocessing.shared_memory``.
+
+        pool : :class:`~pasmopy.parallel.WorkerPool`, optional
+            Running worker processes to reuse across calls.
+            If given, ``n_proc``, ``context`` and ``shared_memory`` are ignored.
+
+        split_paramsets : bool (default: :obj:`False`)
+            If :obj:`True`, sensitivity coefficients of each parameter set of each patient
+            are computed as a task of their own, and are then assembled for each patient
+            before figures are drawn.
+
+        timeout, retries, retry_solver
+            Wall time limit of each patient in seconds, the number of retries of failed ones
+            and arguments of ``biomass.dynamics.solver.solve_ode`` used when retrying,
+            e.g., ``{"method": "BDF"}``. See ``parallel_execute()``.
+            Patients that still fail are listed in ``failures`` with the exception and
+            the elapsed time, and the other ones are run to completion.
         """
         if n_proc is None:
-            n_proc = multiprocessing.cpu_count() - 1
+            n_proc = max(available_cpus() - 1, 1)
         self._check_ctx(context)
-        self.parallel_execute(self._run_single_patient, n_proc, context, progress)
+        self._check_retries(retries)
+        self._check_retry_solver(retry_solver)
+        self.failures = []
+        if split_paramsets:
+            self._split_execute(
+                self._analyze_paramset,
+                self._reduce_single_patient,
+                n_proc,
+                context,
+                progress,
+                shared_memory=shared_memory,
+                pool=pool,
+                timeout=timeout,
+                retries=retries,
+                retry_solver=retry_solver,
+                failures=self.failures,
+            )
+        else:
+            self.parallel_execute(
+                self._run_single_patient,
+                n_proc,
+                context,
+                progress,
+                shared_memory=shared_memory,
+                pool=pool,
+                timeout=timeout,
+                retries=retries,
+                retry_solver=retry_solver,
+                failures=self.failures,
+            )
+        self._report_failures()
@@ -0,0 +1,275 @@
+import cProfile
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from .parallel import peak_rss
+
+
+class _Stages(object):
+    """
+    Wall times of the stages of the task being recorded in this process.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        # Time spent in stages nested in each running stage
+        self.nested: List[float] = []
+
+
+# Stages of the task being recorded in this process, see record().
+_active: Optional[_Stages] = None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Record the wall time of a stage, e.g., "integration" or "render", of the task
+    executed in this process. Time spent in stages nested in it is attributed to those
+    only. Does nothing unless the task is being recorded.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage. Wall times of stages with the same name are summed.
+    """
+    stages = _active
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    stages.nested.append(0.0)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stages.seconds[name] = stages.seconds.get(name, 0.0) + elapsed - stages.nested.pop()
+        if stages.nested:
+            stages.nested[-1] += elapsed
+
+
+@contextmanager
+def record(profile: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Record the stages of a task executed in this context.
+
+    Yields a dictionary that is filled with ``"stages"`` (seconds of each stage) and
+    ``"peak_rss"`` (peak resident set size of this process in bytes) on exit.
+    If ``profile`` is given, cProfile statistics of the task are dumped to it.
+    """
+    global _active
+    previous, _active = _active, _Stages()
+    stats: Dict[str, Any] = {}
+    profiler = cProfile.Profile() if profile is not None else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield stats
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(os.path.dirname(profile), exist_ok=True)
+            profiler.dump_stats(profile)
+        stats.update(stages=_active.seconds, peak_rss=peak_rss())
+        _active = previous
+
+
+@dataclass
+class Profiling(object):
+    """
+    Instrumentation of cohort runs. Pass it as ``profiling`` to
+    :class:`~pasmopy.patient_model.PatientModelSimulations` or
+    :class:`~pasmopy.patient_model.PatientModelAnalyses` to record the wall time of each
+    stage of each patient and the peak memory usage of worker processes in ``run()``
+    and ``subtyping()``.
+
+    Stages are "model" (import of the model), "transcriptome" (loading of
+    transcriptomic data), "integration" (simulation of each parameter set),
+    "sensitivity" (sensitivity coefficients of each parameter set), "analysis"
+    (``biomass.run_analysis``), "read", "write", "features" and "render" (figures).
+    Time spent in none of them is reported as "other".
+
+    Attributes
+    ----------
+    path : str (default: "profile")
+        Directory of the reports. The report of each call, e.g.,
+        ``PatientModelSimulations.run.json``, is written at the end of it.
+
+    n_slowest : int (default: 0)
+        The number of slowest patients whose cProfile statistics are kept in
+        ``{path}/{method}/{task}/{patient}.prof``, readable with ``pstats`` or snakeviz.
+        All patients are profiled, which slows the run down, and only the slowest
+        statistics are kept.
+
+    summary : bool (default: :obj:`True`)
+        Whether to print a summary table at the end of each call.
+
+    Examples
+    --------
+    >>> from pasmopy import PatientModelSimulations, Profiling
+    >>> simulations = PatientModelSimulations(
+    ...     "models.breast", TCGA_ID, profiling=Profiling(n_slowest=3)
+    ... )
+    >>> simulations.run()
+    """
+
+    path: str = "profile"
+    n_slowest: int = 0
+    summary: bool = True
+
+
+class _Report(object):
+    """
+    Timings collected during a call of ``method``, e.g., "PatientModelSimulations.run".
+    """
+
+    def __init__(self, profiling: Profiling, method: str) -> None:
+        self.profiling = profiling
+        self.method = method
+        self.tasks: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.profiles: Dict[str, Dict[str, str]] = {}
+        self.start = time.perf_counter()
+        if profiling.n_slowest > 0:
+            shutil.rmtree(os.path.join(profiling.path, method), ignore_errors=True)
+
+    def profile_dir(self, task: str) -> Optional[str]:
+        """
+        Directory to which the worker executing the i-th patient of task dumps its
+        statistics as ``{i}.prof``, :obj:`None` if patients are not profiled.
+        """
+        if self.profiling.n_slowest <= 0:
+            return None
+        return os.path.join(self.profiling.path, self.method, task)
+
+    def add(
+        self,
+        task: str,
+        i: int,
+        patient: str,
+        elapsed: float,
+        stats: Dict[str, Any],
+        failed: bool = False,
+    ) -> None:
+        """
+        Add the timings of the i-th patient of task.
+        """
+        self.tasks.setdefault(task, {})[patient] = dict(
+            elapsed=elapsed, peak_rss=stats["peak_rss"], stages=stats["stages"], failed=failed
+        )
+        dirname = self.profile_dir(task)
+        if dirname is not None and os.path.isfile(profile := os.path.join(dirname, f"{i:d}.prof")):
+            path = os.path.join(dirname, patient.replace("/", "_") + ".prof")
+            os.replace(profile, path)
+            self.profiles.setdefault(task, {})[patient] = path
+
+    def _summarize(self, task: str) -> Dict[str, Any]:
+        patients = self.tasks[task]
+        names = sorted({name for timings in patients.values() for name in timings["stages"]})
+        seconds = pd.DataFrame(
+            [
+                [timings["stages"].get(name, 0.0) for name in names]
+                for timings in patients.values()
+            ],
+            index=list(patients),
+            columns=names,
+            dtype=float,
+        )
+        seconds["other"] = [
+            max(timings["elapsed"] - sum(timings["stages"].values()), 0.0)
+            for timings in patients.values()
+        ]
+        slowest = sorted(patients, key=lambda patient: -patients[patient]["elapsed"])
+        # Keep the statistics of the slowest patients only
+        profiles = self.profiles.get(task, {})
+        for patient in slowest[self.profiling.n_slowest :]:
+            if patient in profiles:
+                os.remove(profiles.pop(patient))
+        return dict(
+            patients=patients,
+            stages={
+                name: dict(
+                    total=float(seconds[name].sum()),
+                    mean=float(seconds[name].mean()),
+                    max=float(seconds[name].max()),
+                )
+                for name in seconds.columns
+            },
+            slowest=slowest,
+            profiles=profiles,
+        )
+
+    def finish(self, stages: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Write the report, given the stages recorded in the calling process.
+        """
+        report = dict(
+            method=self.method,
+            wall_time=time.perf_counter() - self.start,
+            stages=stages,
+            tasks={task: self._summarize(task) for task in self.tasks},
+        )
+        os.makedirs(self.profiling.path, exist_ok=True)
+        with open(os.path.join(self.profiling.path, f"{self.method}.json"), mode="w") as f:
+            json.dump(report, f, indent=2)
+        if self.profiling.summary:
+            print(summary(report))
+        return report
+
+
+def summary(report: Dict[str, Any], n_slowest: int = 5) -> str:
+    """
+    Summary table of a report written by :class:`Profiling`.
+
+    Parameters
+    ----------
+    report : dict
+        Contents of the JSON report.
+
+    n_slowest : int (default: 5)
+        The number of slowest patients listed for each task.
+
+    Returns
+    -------
+    summary : str
+        Total, mean and maximum wall time of each stage over patients and
+        the share of each stage in the total, for each task.
+    """
+    lines = [f"{report['method']}: {report['wall_time']:.2f} s"]
+    for name, seconds in report["stages"].items():
+        lines.append(f"  {name}: {seconds:.2f} s")
+    for task, summarized in report["tasks"].items():
+        table = pd.DataFrame.from_dict(summarized["stages"], orient="index")
+        table = table.sort_values("total", ascending=False)
+        table["share"] = table["total"] / max(table["total"].sum(), 1e-12)
+        table.columns = ["total [s]", "mean [s]", "max [s]", "share"]
+        lines.append("")
+        lines.append(f"{task} ({len(summarized['patients']):d} patients)")
+        lines.append(
+            table.to_string(
+                formatters={
+                    "total [s]": "{:.3f}".format,
+                    "mean [s]": "{:.3f}".format,
+                    "max [s]": "{:.3f}".format,
+                    "share": "{:.1%}".format,
+                }
+            )
+        )
+        lines.append(
+            "slowest: "
+            + ", ".join(
+                "{} ({:.2f} s, {:.0f} MiB{})".format(
+                    patient,
+                    summarized["patients"][patient]["elapsed"],
+                    summarized["patients"][patient]["peak_rss"] / 2**20,
+                    ", failed" if summarized["patients"][patient]["failed"] else "",
+                )
+                for patient in summarized["slowest"][:n_slowest]
+            )
+        )
+    return "\n".join(lines)
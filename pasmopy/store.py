@@ -0,0 +1,354 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+#: Version of the on-disk layout of cohort stores.
+STORE_VERSION: int = 1
+
+
+@dataclass
+class CohortStore(object):
+    """
+    Simulation results of a whole cohort in a single directory.
+
+    Each observable is stored in its own memory-mappable ``{observable}.npy``
+    of shape (patients, parameter sets, conditions, time), NaN-padded for patients with
+    fewer parameter sets and zero for patients not written yet, and ``index.json``
+    records the patients, observables, conditions and time points along each axis.
+    Patients are written independently, so worker processes can fill in the store
+    concurrently.
+
+    Attributes
+    ----------
+    path : str
+        Directory of the store.
+    """
+
+    path: str
+    _index: dict = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        with open(os.path.join(self.path, "index.json"), mode="r") as f:
+            self._index = json.load(f)
+        if self._index.get("version") != STORE_VERSION:
+            raise ValueError(f"{self.path} was written by an incompatible version of pasmopy.")
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        patients: Sequence[str],
+        observables: Sequence[str],
+        conditions: Sequence[str],
+        t: Sequence[float],
+        n_paramsets: int,
+        overwrite: bool = False,
+    ) -> "CohortStore":
+        """
+        Create an empty store, reusing an existing one with the same observables,
+        conditions and time points. An existing store is grown to hold patients and
+        parameter sets that are not in it yet, keeping the stored simulation results;
+        patients missing from ``patients`` are kept as well.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the store.
+
+        patients, observables, conditions : sequence of strings
+            Labels along the axes of the store.
+
+        t : sequence of float
+            Time points.
+
+        n_paramsets : int
+            The maximum number of parameter sets per patient.
+
+        overwrite : bool (default: :obj:`False`)
+            Whether to replace an existing store with other observables, conditions or
+            time points, or files left in ``path`` by an incomplete one.
+            Other files in ``path`` are kept.
+
+        Returns
+        -------
+        store : :class:`CohortStore`
+        """
+        index = dict(
+            version=STORE_VERSION,
+            patients=list(patients),
+            observables=list(observables),
+            conditions=list(conditions),
+            t=[float(time) for time in t],
+            n_paramsets=int(n_paramsets),
+        )
+        if os.path.isfile(os.path.join(path, "index.json")):
+            with open(os.path.join(path, "index.json"), mode="r") as f:
+                existing = json.load(f)
+            if all(
+                existing.get(key) == index[key]
+                for key in ["version", "observables", "conditions", "t"]
+            ):
+                index["patients"] = existing["patients"] + [
+                    patient for patient in index["patients"] if patient not in existing["patients"]
+                ]
+                index["n_paramsets"] = max(existing["n_paramsets"], index["n_paramsets"])
+                if existing == index:
+                    return cls(path)
+                return cls._grow(path, existing, index)
+            if not overwrite:
+                raise ValueError(
+                    f"{path} contains a cohort store with a different layout. "
+                    "Use another directory or pass overwrite=True."
+                )
+            os.remove(os.path.join(path, "index.json"))
+            for name in existing.get("observables", []) + ["written"]:
+                if os.path.isfile(os.path.join(path, f"{name}.npy")):
+                    os.remove(os.path.join(path, f"{name}.npy"))
+        elif os.path.isdir(path) and os.listdir(path) and not overwrite:
+            raise FileExistsError(
+                f"{path} is not empty and contains no cohort store. "
+                "Use another directory or pass overwrite=True."
+            )
+        os.makedirs(path, exist_ok=True)
+        shape = (len(patients), n_paramsets, len(conditions), len(t))
+        for obs_name in observables:
+            # Sparse until written
+            np.lib.format.open_memmap(
+                os.path.join(path, f"{obs_name}.npy"), mode="w+", shape=shape
+            )
+        np.lib.format.open_memmap(
+            os.path.join(path, "written.npy"), mode="w+", dtype=bool, shape=(len(patients),)
+        )
+        # index.json last: the store exists once it is complete.
+        with open(os.path.join(path, "index.json"), mode="w") as f:
+            json.dump(index, f, indent=2)
+        return cls(path)
+
+    @classmethod
+    def _grow(cls, path: str, existing: dict, index: dict) -> "CohortStore":
+        """
+        Enlarge the store in ``path`` from the layout ``existing`` to ``index``,
+        which has the same observables, conditions and time points.
+        """
+        n_patients, n_paramsets = len(existing["patients"]), existing["n_paramsets"]
+        shape = (
+            len(index["patients"]),
+            index["n_paramsets"],
+            len(index["conditions"]),
+            len(index["t"]),
+        )
+        # The store is incomplete until index.json is written again.
+        os.remove(os.path.join(path, "index.json"))
+        for name in index["observables"] + ["written"]:
+            stored = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            grown = np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.grow.npy"),
+                mode="w+",
+                dtype=stored.dtype,
+                shape=shape[: stored.ndim],
+            )
+            if name == "written":
+                grown[:n_patients] = stored
+            else:
+                grown[:n_patients, :n_paramsets] = stored
+                grown[:n_patients, n_paramsets:] = np.nan
+            grown.flush()
+            del stored, grown
+            os.replace(os.path.join(path, f"{name}.grow.npy"), os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, "index.json"), mode="w") as f:
+            json.dump(index, f, indent=2)
+        return cls(path)
+
+    @property
+    def patients(self) -> List[str]:
+        return self._index["patients"]
+
+    @property
+    def observables(self) -> List[str]:
+        return self._index["observables"]
+
+    @property
+    def conditions(self) -> List[str]:
+        return self._index["conditions"]
+
+    @property
+    def t(self) -> np.ndarray:
+        return np.array(self._index["t"])
+
+    def _block(self, name: str, mode: str = "r") -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode=mode)
+
+    def written(self) -> np.ndarray:
+        """
+        Whether simulation results of each patient are stored.
+        """
+        return np.array(self._block("written"))
+
+    def write(self, patient: str, simulations: np.ndarray) -> None:
+        """
+        Store simulation results of a patient.
+
+        Parameters
+        ----------
+        patient : str
+            Patient ID.
+
+        simulations : numpy.ndarray
+            ``simulations_all`` of shape (observables, parameter sets, conditions, time).
+        """
+        i = self.patients.index(patient)
+        n_obs, n_paramsets, n_conditions, n_t = simulations.shape
+        if (n_obs, n_conditions, n_t) != (
+            len(self.observables),
+            len(self.conditions),
+            len(self._index["t"]),
+        ) or n_paramsets > self._index["n_paramsets"]:
+            raise ValueError(
+                f"Simulation results of {patient} of shape {simulations.shape} "
+                "do not fit in the cohort store."
+            )
+        written = self._block("written", "r+")
+        written[i] = False
+        written.flush()
+        for obs_name, data in zip(self.observables, simulations):
+            block = self._block(obs_name, "r+")
+            block[i, :n_paramsets] = data
+            block[i, n_paramsets:] = np.nan
+            block.flush()
+        written[i] = True
+        written.flush()
+
+    def read(self, obs_name: str, patients: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Simulation results of an observable across the cohort.
+
+        Parameters
+        ----------
+        obs_name : str
+            Observable name.
+
+        patients : sequence of strings, optional
+            Patients to read. If :obj:`None`, all patients in the store.
+
+        Returns
+        -------
+        data : numpy.ndarray
+            Read-only array of shape (patients, parameter sets, conditions, time),
+            memory-mapped if ``patients`` is :obj:`None`.
+        """
+        if obs_name not in self.observables:
+            raise NameError(f"{obs_name} is not defined in observables.")
+        block = self._block(obs_name)
+        if patients is None:
+            return block
+        return block[[self.patients.index(patient) for patient in patients]]
+
+
+def _time_index(n_t: int, t: Sequence[float], storage_kws: dict) -> Optional[np.ndarray]:
+    """
+    Indices of the integration time points kept in storage, :obj:`None` for all.
+    """
+    if storage_kws.get("t") is not None:
+        index = []
+        for time in storage_kws["t"]:
+            matches = np.flatnonzero(np.isclose(np.asarray(t, dtype=float), time))
+            if not matches.size:
+                raise ValueError(f"t={time} is not an integration time point.")
+            index.append(matches[0])
+        return np.unique(index)
+    if storage_kws.get("decimate", 1) > 1:
+        return np.unique(np.append(np.arange(0, n_t, storage_kws["decimate"]), n_t - 1))
+    return None
+
+
+def compact_simulations(dirname: str, t: Sequence[float], storage_kws: dict) -> None:
+    """
+    Rewrite ``simulations_all.npy`` in ``dirname`` in compact form.
+
+    Parameters
+    ----------
+    dirname : str
+        ``simulation_data`` directory of a patient.
+
+    t : sequence of float
+        Integration time points, i.e., ``problem.t``.
+
+    storage_kws : dict
+        * 'dtype' : str (default: "float64")
+            Floating-point type of stored values, e.g., "float32".
+        * 'decimate' : int (default: 1)
+            Keep every n-th time point (and the last one).
+        * 't' : list of float, optional
+            Keep these time points only. Takes precedence over 'decimate'.
+        * 'compress' : bool (default: :obj:`False`)
+            Compress the stored values.
+
+        With a reduced time grid or compression, results are stored in
+        ``simulations_all.npz`` together with the indices of the kept time points
+        and the integration time points.
+    """
+    data = np.load(os.path.join(dirname, "simulations_all.npy"))
+    data = data.astype(storage_kws.get("dtype", "float64"), copy=False)
+    index = _time_index(data.shape[-1], t, storage_kws)
+    if index is None and not storage_kws.get("compress", False):
+        np.save(os.path.join(dirname, "simulations_all.npy"), data)
+        if os.path.isfile(os.path.join(dirname, "simulations_all.npz")):
+            os.remove(os.path.join(dirname, "simulations_all.npz"))
+        return
+    if index is None:
+        index = np.arange(data.shape[-1])
+    save = np.savez_compressed if storage_kws.get("compress", False) else np.savez
+    save(
+        os.path.join(dirname, "simulations_all.npz"),
+        simulations_all=data[..., index],
+        t_index=index,
+        n_t=data.shape[-1],
+        t=np.asarray(t, dtype=float),
+    )
+    os.remove(os.path.join(dirname, "simulations_all.npy"))
+
+
+def load_simulations(dirname: str, mmap_mode: Optional[str] = None) -> np.ndarray:
+    """
+    Load ``simulations_all`` saved in ``dirname``, stored in full or in compact form.
+
+    Values are returned at every integration time point, in float64. Time points
+    not kept in compact storage are linearly interpolated in time between the kept ones
+    (between their indices in files stored without the time points).
+
+    Parameters
+    ----------
+    dirname : str
+        ``simulation_data`` directory of a patient.
+
+    mmap_mode : str, optional
+        Passed to ``numpy.load`` for ``simulations_all.npy`` stored in full precision.
+
+    Returns
+    -------
+    simulations_all : numpy.ndarray
+        Array of shape (observables, parameter sets, conditions, time).
+    """
+    if os.path.isfile(os.path.join(dirname, "simulations_all.npy")):
+        data = np.load(os.path.join(dirname, "simulations_all.npy"), mmap_mode=mmap_mode)
+        return data if data.dtype == np.float64 else data.astype(np.float64)
+    if not os.path.isfile(os.path.join(dirname, "simulations_all.npz")):
+        raise FileNotFoundError(f"No simulation results in {dirname}.")
+    with np.load(os.path.join(dirname, "simulations_all.npz")) as f:
+        data = f["simulations_all"].astype(np.float64)
+        index = f["t_index"]
+        n_t = int(f["n_t"])
+        t = f["t"] if "t" in f.files else np.arange(n_t, dtype=float)
+    if len(index) == n_t:
+        return data
+    if len(index) == 1:
+        return np.repeat(data, n_t, axis=-1)
+    # Linear interpolation between the kept time points, constant outside them
+    kept = t[index]
+    right = np.clip(np.searchsorted(kept, t), 1, len(index) - 1)
+    left = right - 1
+    weight = np.clip((t - kept[left]) / (kept[right] - kept[left]), 0.0, 1.0)
+    return data[..., left] * (1.0 - weight) + data[..., right] * weight
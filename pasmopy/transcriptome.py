@@ -0,0 +1,547 @@
+import bz2
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import urllib.request
+import warnings
+import zipfile
+from contextlib import ExitStack, contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+#: Version of the on-disk layout of cached expression tables.
+CACHE_VERSION: int = 1
+
+
+def default_cache_dir() -> str:
+    """
+    Directory in which pasmopy caches transcriptomic data.
+
+    ``$PASMOPY_CACHE_DIR`` if set, otherwise ``$XDG_CACHE_HOME/pasmopy``
+    (``~/.cache/pasmopy`` by default).
+    """
+    if os.environ.get("PASMOPY_CACHE_DIR"):
+        return os.environ["PASMOPY_CACHE_DIR"]
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "pasmopy",
+    )
+
+
+def is_url(path: str) -> bool:
+    """
+    Whether path is a URL rather than a local file.
+    """
+    return "://" in str(path)
+
+
+def file_digest(path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    SHA-256 of a file.
+
+    The digest is memoized in ``cache_dir`` against the size and modification time
+    of the file, so that large tables are hashed only once.
+    """
+    stat = os.stat(path)
+    memo = None
+    if cache_dir is not None:
+        fingerprint = hashlib.sha256(
+            f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()
+        memo = os.path.join(cache_dir, "digests", fingerprint)
+        if os.path.isfile(memo):
+            with open(memo, mode="r") as f:
+                return f.read().strip()
+    sha256 = hashlib.sha256()
+    with open(path, mode="rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    digest = sha256.hexdigest()
+    if memo is not None:
+        _atomic_write(memo, digest)
+    return digest
+
+
+def _atomic_write(path: str, text: str) -> None:
+    """
+    Write text to path so that concurrent readers never see a partial file.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, mode="w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        warnings.warn(f"Could not write {path}: {e}", RuntimeWarning)
+
+
+def _index_name(path: str, read_csv_kws: dict) -> Optional[str]:
+    """
+    Name of the index column (:obj:`None` if the table has no index column).
+    """
+    index_col = read_csv_kws.get("index_col")
+    if index_col is None or index_col is False:
+        return None
+    if isinstance(index_col, str):
+        return index_col
+    if isinstance(index_col, int):
+        kwargs = {k: v for k, v in read_csv_kws.items() if k not in ("index_col", "usecols")}
+        return pd.read_csv(path, nrows=0, **kwargs).columns[index_col]
+    # MultiIndex is not supported for pruning.
+    return None
+
+
+def read_pruned_csv(
+    path: str,
+    genes: Iterable[str],
+    samples: Optional[Iterable[str]] = None,
+    read_csv_kws: Optional[dict] = None,
+    chunksize: int = 2000,
+) -> pd.DataFrame:
+    """
+    Read only the rows of ``genes`` (and the columns of ``samples``) of a CSV file.
+
+    The file is parsed in chunks, so the whole table is never held in memory.
+    """
+    kwargs = dict(read_csv_kws) if read_csv_kws is not None else {}
+    index_name = _index_name(path, kwargs)
+    if index_name is None:
+        return pd.read_csv(path, **kwargs)
+    if samples is not None:
+        columns = set(samples) | {index_name}
+        kwargs["usecols"] = lambda column: column in columns
+    genes = set(genes)
+    chunks = [
+        chunk[chunk.index.isin(genes)]
+        for chunk in pd.read_csv(path, chunksize=chunksize, **kwargs)
+    ]
+    return pd.concat(chunks) if chunks else pd.read_csv(path, nrows=0, **kwargs)
+
+
+def _cache_key(
+    digest: str,
+    genes: Iterable[str],
+    samples: Optional[Iterable[str]],
+    read_csv_kws: dict,
+) -> str:
+    spec = json.dumps(
+        {
+            "version": CACHE_VERSION,
+            "source": digest,
+            "genes": sorted(genes),
+            "samples": sorted(samples) if samples is not None else None,
+            "read_csv_kws": {k: repr(v) for k, v in sorted(read_csv_kws.items())},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def _load_table(dirname: str, mmap_mode: Optional[str] = "r") -> pd.DataFrame:
+    with open(os.path.join(dirname, "index.json"), mode="r") as f:
+        index = json.load(f)
+    values = np.load(os.path.join(dirname, "values.npy"), mmap_mode=mmap_mode)
+    df = pd.DataFrame(values, index=index["genes"], columns=index["samples"], copy=False)
+    df.index.name = index["index_name"]
+    return df
+
+
+def _save_table(dirname: str, df: pd.DataFrame) -> None:
+    parent = os.path.dirname(dirname)
+    os.makedirs(parent, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(dir=parent)
+    try:
+        np.save(os.path.join(tmpdir, "values.npy"), df.to_numpy(dtype=np.float64))
+        with open(os.path.join(tmpdir, "index.json"), mode="w") as f:
+            json.dump(
+                {
+                    "index_name": df.index.name,
+                    "genes": [str(gene) for gene in df.index],
+                    "samples": [str(sample) for sample in df.columns],
+                },
+                f,
+            )
+        try:
+            os.replace(tmpdir, dirname)
+        except OSError:
+            # Another process has written the same table first.
+            pass
+    finally:
+        if os.path.isdir(tmpdir):
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@contextmanager
+def _lock(path: str) -> Iterator[None]:
+    """
+    Inter-process lock, so that concurrent workers download or extract a file only once.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="a") as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows
+            yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _verify(path: str, checksum: Optional[str], cache_dir: Optional[str]) -> None:
+    """
+    Compare the SHA-256 of path with checksum (``"<hex>"`` or ``"sha256:<hex>"``).
+    """
+    if checksum is None:
+        return
+    expected = checksum.split(":", 1)[-1].lower()
+    if (digest := file_digest(path, cache_dir)) != expected:
+        raise ValueError(f"Checksum mismatch for {path}: expected {expected}, got {digest}.")
+
+
+def _download(url: str, cache_dir: str, checksum: Optional[str], offline: bool) -> str:
+    """
+    Fetch url into ``cache_dir/downloads`` unless it is already there.
+    """
+    dirname = os.path.join(cache_dir, "downloads", hashlib.sha256(url.encode()).hexdigest())
+    path = os.path.join(dirname, os.path.basename(url.split("?")[0]) or "data")
+    if not os.path.isfile(path):
+        if offline:
+            raise FileNotFoundError(f"{url} is not cached in {cache_dir} (offline mode).")
+        with _lock(os.path.join(cache_dir, "locks", os.path.basename(dirname))):
+            if not os.path.isfile(path):
+                os.makedirs(dirname, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=dirname)
+                try:
+                    with os.fdopen(fd, mode="wb") as f, urllib.request.urlopen(url) as r:
+                        shutil.copyfileobj(r, f)
+                    _verify(tmp, checksum, cache_dir)
+                    os.replace(tmp, path)
+                finally:
+                    if os.path.isfile(tmp):
+                        os.remove(tmp)
+                return path
+    _verify(path, checksum, cache_dir)
+    return path
+
+
+def _extract(path: str, cache_dir: str) -> str:
+    """
+    Decompress an archive into ``cache_dir/extracted`` unless it is already there.
+    Paths to uncompressed files are returned unchanged.
+    """
+    name = os.path.basename(path)
+    lower = name.lower()
+    if lower.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")):
+        kind = "tar"
+    elif lower.endswith(".zip"):
+        kind = "zip"
+    elif lower.endswith((".gz", ".bz2", ".xz")):
+        kind = "stream"
+    else:
+        return path
+    dirname = os.path.join(cache_dir, "extracted", file_digest(path, cache_dir))
+    done = os.path.join(dirname, ".complete")
+    if not os.path.isfile(done):
+        with _lock(os.path.join(cache_dir, "locks", os.path.basename(dirname))):
+            if not os.path.isfile(done):
+                os.makedirs(dirname, exist_ok=True)
+                with ExitStack() as stack:
+                    if kind == "tar":
+                        tar = stack.enter_context(tarfile.open(path))
+                        members = [m for m in tar.getmembers() if m.isfile()]
+                        if len(members) != 1:
+                            raise ValueError(f"{path} must contain exactly one file.")
+                        src = stack.enter_context(tar.extractfile(members[0]))
+                        target = os.path.basename(members[0].name)
+                    elif kind == "zip":
+                        archive = stack.enter_context(zipfile.ZipFile(path))
+                        members = [m for m in archive.infolist() if not m.is_dir()]
+                        if len(members) != 1:
+                            raise ValueError(f"{path} must contain exactly one file.")
+                        src = stack.enter_context(archive.open(members[0]))
+                        target = os.path.basename(members[0].filename)
+                    else:
+                        opener = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}[
+                            os.path.splitext(lower)[1]
+                        ]
+                        src = stack.enter_context(opener(path, mode="rb"))
+                        target = os.path.splitext(name)[0]
+                    with open(os.path.join(dirname, target), mode="wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                open(done, mode="w").close()
+    files = [f for f in os.listdir(dirname) if not f.startswith(".")]
+    return os.path.join(dirname, files[0])
+
+
+def resolve(
+    path: str,
+    cache_dir: str,
+    checksum: Optional[str] = None,
+    offline: bool = False,
+) -> str:
+    """
+    Local, uncompressed copy of transcriptomic data.
+
+    URLs (including ``file://``) are downloaded into ``cache_dir`` once
+    and archives (``.tar.xz``, ``.zip``, ``.gz``, ...) are decompressed once;
+    later calls return the cached file without touching the network.
+
+    Parameters
+    ----------
+    path : str
+        Local path or URL.
+
+    cache_dir : str
+        Cache directory.
+
+    checksum : str, optional
+        Expected SHA-256 of the downloaded (or local) file,
+        as ``"<hex>"`` or ``"sha256:<hex>"``.
+
+    offline : bool (default: :obj:`False`)
+        If :obj:`True`, raise ``FileNotFoundError`` instead of downloading
+        data missing from the cache.
+        ``PASMOPY_OFFLINE=1`` has the same effect.
+
+    Returns
+    -------
+    path : str
+        Path to the cached file.
+    """
+    offline = offline or os.environ.get("PASMOPY_OFFLINE", "") not in ("", "0")
+    if is_url(path):
+        path = _download(path, cache_dir, checksum, offline)
+    else:
+        _verify(path, checksum, cache_dir)
+    return _extract(path, cache_dir)
+
+
+def load_expression_level(
+    path: str,
+    genes: Iterable[str],
+    samples: Optional[Iterable[str]] = None,
+    read_csv_kws: Optional[dict] = None,
+    cache_dir: Optional[str] = None,
+    checksum: Optional[str] = None,
+    offline: bool = False,
+) -> pd.DataFrame:
+    """
+    Load the expression levels of ``genes`` from a transcriptome table.
+
+    Only the requested genes (and samples) are kept. If ``cache_dir`` is given,
+    the pruned table is stored there as a memory-mappable ``.npy`` file plus an index,
+    keyed by the SHA-256 of the source file, so that later loads skip CSV parsing.
+
+    Parameters
+    ----------
+    path : str
+        Path to the CSV-formatted transcriptome table.
+
+    genes : Iterable[str]
+        Genes to load.
+
+    samples : Iterable[str], optional
+        Samples (columns) to load. If :obj:`None`, all samples are loaded.
+
+    read_csv_kws : dict, optional
+        Keyword arguments to pass to ``pandas.read_csv``.
+
+    cache_dir : str, optional
+        Directory in which downloads, decompressed archives and the binary sidecar
+        are stored. If :obj:`None`, nothing is cached.
+
+    checksum : str, optional
+        Expected SHA-256 of ``path``, see :func:`resolve`.
+        Remote ``path`` can only be verified with a ``cache_dir``.
+
+    offline : bool (default: :obj:`False`)
+        Fail fast instead of downloading, see :func:`resolve`.
+        Without a ``cache_dir``, remote ``path`` is never available offline.
+
+    Returns
+    -------
+    expression_level : pandas.DataFrame
+        Genes x samples table.
+    """
+    genes = list(dict.fromkeys(genes))
+    samples = list(dict.fromkeys(samples)) if samples is not None else None
+    kwargs = dict(read_csv_kws) if read_csv_kws is not None else {}
+    if cache_dir is not None:
+        if (resolved := resolve(path, cache_dir, checksum, offline)) != path:
+            # Already decompressed.
+            kwargs.pop("compression", None)
+        path = resolved
+    elif is_url(path):
+        if offline or os.environ.get("PASMOPY_OFFLINE", "") not in ("", "0"):
+            raise FileNotFoundError(f"{path} is not cached (offline mode).")
+        if checksum is not None:
+            raise ValueError(f"Verifying the checksum of {path} requires a cache_dir.")
+    else:
+        _verify(path, checksum, None)
+    if cache_dir is None or _index_name(path, kwargs) is None:
+        return read_pruned_csv(path, genes, samples, kwargs)
+    dirname = os.path.join(
+        cache_dir,
+        "tables",
+        _cache_key(file_digest(path, cache_dir), genes, samples, kwargs),
+    )
+    if os.path.isfile(os.path.join(dirname, "index.json")):
+        return _load_table(dirname)
+    df = read_pruned_csv(path, genes, samples, kwargs)
+    try:
+        _save_table(dirname, df)
+    except OSError as e:
+        warnings.warn(f"Could not cache {path} in {cache_dir}: {e}", RuntimeWarning)
+    return df
+
+
+# Expression tables loaded in this process, see get_expression_level.
+_registry: Dict[str, pd.DataFrame] = {}
+# Shared memory blocks attached in this process; kept alive as long as the process.
+_attached: List[SharedMemory] = []
+
+
+class SharedExpressionLevel(NamedTuple):
+    """
+    Description of an expression table published in shared memory.
+    """
+
+    key: str
+    name: str
+    shape: Tuple[int, int]
+    index_name: Optional[str]
+    genes: List[str]
+    samples: List[str]
+
+
+def _registry_key(
+    path: str,
+    genes: Iterable[str],
+    samples: Optional[Iterable[str]],
+    read_csv_kws: Optional[dict],
+) -> str:
+    spec = json.dumps(
+        {
+            "path": path if is_url(path) else os.path.abspath(path),
+            "genes": sorted(genes),
+            "samples": sorted(samples) if samples is not None else None,
+            "read_csv_kws": {k: repr(v) for k, v in sorted((read_csv_kws or {}).items())},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def get_expression_level(
+    path: str,
+    genes: Iterable[str],
+    samples: Optional[Iterable[str]] = None,
+    read_csv_kws: Optional[dict] = None,
+    cache_dir: Optional[str] = None,
+    checksum: Optional[str] = None,
+    offline: bool = False,
+) -> pd.DataFrame:
+    """
+    Process-wide version of :func:`load_expression_level`.
+
+    Identical requests (same ``path``, ``genes``, ``samples`` and ``read_csv_kws``)
+    return the same table, so importing many patient-specific models
+    in one process reads the transcriptome only once.
+    The returned table is shared and must not be modified.
+    """
+    genes = list(genes)
+    key = _registry_key(path, genes, samples, read_csv_kws)
+    if key not in _registry:
+        _registry[key] = load_expression_level(
+            path, genes, samples, read_csv_kws, cache_dir, checksum, offline
+        )
+    return _registry[key]
+
+
+def clear_registry() -> None:
+    """
+    Forget all expression tables loaded in this process.
+    """
+    _registry.clear()
+
+
+@contextmanager
+def share_expression_levels() -> Iterator[List[SharedExpressionLevel]]:
+    """
+    Publish every expression table loaded in this process in shared memory.
+
+    Worker processes pass the yielded descriptions to :func:`attach_expression_levels`,
+    after which :func:`get_expression_level` returns zero-copy views
+    of the published tables. The shared memory is released on exit.
+
+    Examples
+    --------
+    >>> with share_expression_levels() as shared:
+    ...     pool = ctx.Pool(initializer=attach_expression_levels, initargs=(shared,))
+    """
+    blocks: List[SharedMemory] = []
+    shared: List[SharedExpressionLevel] = []
+    try:
+        for key, df in _registry.items():
+            try:
+                values = df.to_numpy(dtype=np.float64)
+            except (TypeError, ValueError):
+                warnings.warn("Skipped sharing a non-numeric expression table.", RuntimeWarning)
+                continue
+            block = SharedMemory(create=True, size=max(values.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(values.shape, dtype=np.float64, buffer=block.buf)[:] = values
+            shared.append(
+                SharedExpressionLevel(
+                    key=key,
+                    name=block.name,
+                    shape=values.shape,
+                    index_name=df.index.name,
+                    genes=[str(gene) for gene in df.index],
+                    samples=[str(sample) for sample in df.columns],
+                )
+            )
+        yield shared
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach(name: str) -> SharedMemory:
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the block is owned by the publishing process,
+        # so do not let this process's resource tracker unlink it at exit.
+        block = SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def attach_expression_levels(shared: List[SharedExpressionLevel]) -> None:
+    """
+    Register expression tables published by :func:`share_expression_levels`
+    in this process. Intended as a ``multiprocessing.Pool`` initializer.
+    """
+    for table in shared:
+        block = _attach(table.name)
+        _attached.append(block)
+        values = np.ndarray(table.shape, dtype=np.float64, buffer=block.buf)
+        values.flags.writeable = False
+        df = pd.DataFrame(values, index=table.genes, columns=table.samples, copy=False)
+        df.index.name = table.index_name
+        _registry[table.key] = df
@@ -0,0 +1,124 @@
+import argparse
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+from benchmarks.toy_cohort import PATIENTS, build_toy_model
+
+from pasmopy import PatientModelSimulations, PatientOverlay
+from pasmopy.cli import Job, _shard, main, run
+from pasmopy.features import load_features
+
+DYNAMICAL_FEATURES = {"Phosphorylated_E": {"high": ["max", "AUC"], "low": ["max"]}}
+
+NORMALIZATION = {"Phosphorylated_E": {"timepoint": None, "condition": []}}
+
+
+@pytest.fixture(scope="module")
+def job_file(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("cli"))
+    sys.path.insert(0, root)
+    cwd = os.getcwd()
+    try:
+        os.chdir(root)
+        build_toy_model(root)
+        with open("patients.txt", mode="w") as f:
+            f.write("\n".join(PATIENTS) + "\n")
+        with open("job.json", mode="w") as f:
+            json.dump(
+                dict(
+                    path_to_models="toy_models.toy",
+                    patients="patients.txt",
+                    overlay=os.path.join("overlays", "{patient}"),
+                    dynamical_features=DYNAMICAL_FEATURES,
+                    normalization=NORMALIZATION,
+                    run_kws={"n_proc": 1, "render": False},
+                ),
+                f,
+            )
+        yield "job.json"
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(root)
+
+
+def test_shard():
+    assert _shard("0/1") == (0, 1)
+    assert _shard("3/4") == (3, 4)
+    for value in ["4/4", "1", "-1/2", "a/b"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            _shard(value)
+    job = Job("models", [f"P{i:d}" for i in range(10)])
+    shards = [job.shard(i, 3) for i in range(3)]
+    assert sorted(sum(shards, [])) == sorted(job.patients)
+    assert shards[0] == ["P0", "P3", "P6", "P9"]
+
+
+def test_sharded_run(job_file, capsys):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    shards = [
+        subprocess.Popen(
+            [sys.executable, "-m", "pasmopy", "run", job_file, "--shard", f"{i:d}/2"],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        for i in range(2)
+    ]
+    for shard in shards:
+        _, stderr = shard.communicate(timeout=600)
+        assert shard.returncode == 0, stderr.decode()
+    with open(os.path.join("shards", "shard-0-of-2", "shard.json")) as f:
+        assert json.load(f)["patients"] == ["P1", "P3"]
+
+    assert main(["merge", job_file]) == 0
+    assert "2 shards: 3 of 3 patients merged." in capsys.readouterr().out
+    merged, _ = load_features(os.path.join("shards", "features.npz"))
+    reference = PatientModelSimulations(
+        "toy_models.toy", [PatientOverlay(p, os.path.join("overlays", p)) for p in PATIENTS]
+    ).extract_characteristics(
+        DYNAMICAL_FEATURES, copy.deepcopy(NORMALIZATION), progress=False, n_proc=1
+    )
+    pd.testing.assert_frame_equal(merged["Phosphorylated_E"], reference["Phosphorylated_E"])
+
+    shutil.rmtree(os.path.join("shards", "shard-1-of-2"))
+    assert main(["merge", job_file]) == 2
+    assert "Missing shards: 1/2." in capsys.readouterr().err
+
+
+def test_failed_paramset(job_file):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("broken", patient, "out")
+        )
+    with open(os.path.join("broken", "P2", "out", "1", "fit_param1.npy"), mode="w") as f:
+        f.write("broken")
+    job = Job(
+        "toy_models.toy",
+        list(PATIENTS),
+        overlay=os.path.join("broken", "{patient}"),
+        dynamical_features=DYNAMICAL_FEATURES,
+        normalization=NORMALIZATION,
+        run_kws={"n_proc": 1, "render": False, "split_paramsets": True},
+        output="broken_shards",
+    )
+    with pytest.warns(RuntimeWarning):
+        assert run(job, 0, 1) == 1
+    with open(os.path.join("broken_shards", "shard-0-of-1", "shard.json")) as f:
+        shard = json.load(f)
+    assert [failure["patient"] for failure in shard["failures"]] == ["P2/1"]
+    # The patient of the failed parameter set is left out of the outputs.
+    assert shard["patients"] == ["P1", "P3"]
+    characteristics, _ = load_features(
+        os.path.join("broken_shards", "shard-0-of-1", "features.npz")
+    )
+    assert list(characteristics["Phosphorylated_E"].index) == ["P1", "P3"]
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.cluster.hierarchy import fcluster, linkage
+
+from pasmopy.clustering import Subtypes, minibatch_kmeans, ward_linkage
+
+
+def _blobs(n: int, n_clusters: int = 3, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-10, 10, (n_clusters, 4))
+    labels = rng.integers(n_clusters, size=n)
+    return pd.DataFrame(
+        centers[labels] + rng.normal(size=(n, 4)),
+        index=[f"patient{i}" for i in range(n)],
+        columns=[f"feature{j}" for j in range(4)],
+    )
+
+
+@pytest.mark.parametrize("n", [2, 3, 17, 300])
+def test_ward_linkage(n):
+    X = np.random.default_rng(n).normal(size=(n, 5))
+    np.testing.assert_allclose(ward_linkage(X), linkage(X, "ward"))
+
+
+def test_minibatch_kmeans():
+    features = _blobs(2000)
+    centroids = minibatch_kmeans(features.to_numpy(), 3, batch_size=256)
+    reference = fcluster(linkage(features.to_numpy(), "ward"), 3, criterion="maxclust")
+    labels = np.argmin(
+        ((features.to_numpy()[:, np.newaxis] - centroids[np.newaxis]) ** 2).sum(axis=2), axis=1
+    )
+    # Same partition up to relabeling
+    assert len(set(zip(labels, reference))) == 3
+    with pytest.raises(ValueError):
+        minibatch_kmeans(features.to_numpy(), 0)
+
+
+@pytest.mark.parametrize("method", ["ward", "kmeans"])
+def test_subtypes(tmp_path, method):
+    features = _blobs(500)
+    subtypes = Subtypes(n_clusters=3, method=method, batch_size=128).fit(features)
+    assert list(subtypes.labels_.index) == list(features.index)
+    assert subtypes.centroids_.shape == (3, 4)
+    assert (subtypes.linkage_ is not None) == (method == "ward")
+    # Patients are assigned to the subtypes they were classified into.
+    pd.testing.assert_series_equal(subtypes.predict(features), subtypes.labels_)
+    subtypes.plot(os.path.join(tmp_path, "subtypes.png"), max_patients=100)
+    assert os.path.isfile(os.path.join(tmp_path, "subtypes.png"))
+    with pytest.raises(ValueError):
+        Subtypes(method="dbscan")
+    with pytest.raises(ValueError):
+        Subtypes().fit(features.assign(feature0=np.nan))
+
+
+@pytest.mark.parametrize("method", ["ward", "kmeans"])
+def test_assign_and_persist(tmp_path, method):
+    features = _blobs(200)
+    subtypes = Subtypes(n_clusters=3, method=method).fit(features.iloc[:150])
+    path = os.path.join(tmp_path, "subtypes.npz")
+    subtypes.save(path, normalization={"obs": {"timepoint": None, "condition": []}})
+    loaded, metadata = Subtypes.load(path)
+    assert metadata == {"normalization": {"obs": {"timepoint": None, "condition": []}}}
+    pd.testing.assert_series_equal(loaded.labels_, subtypes.labels_)
+    pd.testing.assert_frame_equal(loaded.features_, subtypes.features_)
+    labels = loaded.assign(features.iloc[150:])
+    pd.testing.assert_series_equal(labels, subtypes.predict(features.iloc[150:]))
+    assert list(loaded.labels_.index) == list(features.index)
+    # Assigned again: replaced, not duplicated
+    loaded.assign(features.iloc[190:])
+    assert len(loaded.labels_) == len(features)
+    pd.testing.assert_series_equal(loaded.mean_, subtypes.mean_)
+    loaded.save(path)
+    assert len(Subtypes.load(path)[0].features_) == len(features)
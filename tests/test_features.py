@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.integrate import simpson
+
+from pasmopy import PatientModelSimulations
+from pasmopy.features import (
+    evaluate,
+    extract_features,
+    is_vectorized,
+    load_features,
+    save_features,
+)
+
+CONDITIONS = ["EGF", "HRG"]
+
+
+def _time_courses() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(61)
+    rates = rng.uniform(0.05, 0.5, (5, len(CONDITIONS), 2))
+    # Transient responses (patients, conditions, time)
+    return np.exp(-rates[..., 1:] * t) - np.exp(-rates[..., :1] * t)
+
+
+def _half_decay_time(time_course: np.ndarray) -> float:
+    peak = np.argmax(time_course)
+    for i in range(peak + 1, len(time_course)):
+        if time_course[i] <= time_course[peak] / 2:
+            return float(i - peak)
+    return np.nan
+
+
+def _droprate(time_course: np.ndarray) -> float:
+    return -(time_course[-1] - np.max(time_course)) / (len(time_course) - np.argmax(time_course))
+
+
+def test_builtin_characteristics():
+    time_courses = _time_courses()
+    response_characteristics = PatientModelSimulations("models", []).response_characteristics
+    assert all(is_vectorized(func) for func in response_characteristics.values())
+    references = {
+        "max": np.max,
+        "AUC": simpson,
+        "time_to_peak": np.argmax,
+        "half_decay_time": _half_decay_time,
+        "steady_state": lambda time_course: time_course[-1],
+        "droprate": _droprate,
+    }
+    values = evaluate(time_courses, list(response_characteristics.values()))
+    assert values.shape == (5, len(CONDITIONS), len(response_characteristics))
+    for i, metric in enumerate(response_characteristics):
+        expected = np.apply_along_axis(references[metric], -1, time_courses)
+        np.testing.assert_allclose(values[..., i], expected, err_msg=metric)
+    # Not decayed to half of the maximum
+    assert np.isnan(evaluate(np.linspace(0, 1, 10), [response_characteristics["half_decay_time"]]))
+
+
+def test_extract_features():
+    time_courses = _time_courses()
+    response_characteristics = PatientModelSimulations("models", []).response_characteristics
+    # Applied to one time course at a time
+    response_characteristics["range"] = lambda time_course: np.max(time_course) - np.min(
+        time_course
+    )
+    patients = [f"patient{i}" for i in range(len(time_courses))]
+    df = extract_features(
+        time_courses,
+        patients,
+        CONDITIONS,
+        {"HRG": ["max", "range"], "EGF": ["AUC"]},
+        response_characteristics,
+    )
+    assert list(df.columns) == ["HRG_max", "HRG_range", "EGF_AUC"]
+    assert list(df.index) == patients
+    assert (df.dtypes == float).all()
+    for i, patient in enumerate(patients):
+        assert df.loc[patient, "HRG_max"] == np.max(time_courses[i, 1])
+        assert df.loc[patient, "HRG_range"] == np.ptp(time_courses[i, 1])
+        assert np.isclose(df.loc[patient, "EGF_AUC"], simpson(time_courses[i, 0]))
+    # Empty cohort
+    empty = extract_features(
+        time_courses[:0], [], CONDITIONS, {"HRG": ["max", "range"]}, response_characteristics
+    )
+    assert empty.shape == (0, 2)
+
+
+def test_save_and_load_features(tmp_path):
+    time_courses = _time_courses()
+    response_characteristics = PatientModelSimulations("models", []).response_characteristics
+    patients = [f"patient{i}" for i in range(len(time_courses))]
+    dynamical_features = {
+        "Phosphorylated_ERK": {"EGF": ["max", "time_to_peak"], "HRG": ["AUC"]},
+        "c_FOS_mRNA": {"HRG-low": ["half_decay_time"]},
+    }
+    characteristics = {
+        obs_name: extract_features(
+            time_courses,
+            patients,
+            ["EGF", "HRG-low"] if obs_name == "c_FOS_mRNA" else CONDITIONS,
+            conditions_and_metrics,
+            response_characteristics,
+        )
+        for obs_name, conditions_and_metrics in dynamical_features.items()
+    }
+    normalization = {"Phosphorylated_ERK": {"timepoint": None, "condition": ["EGF"]}}
+    path = os.path.join(tmp_path, "features.npz")
+    save_features(path, characteristics, dynamical_features, normalization)
+    loaded, columns = load_features(path)
+    assert list(loaded) == list(characteristics)
+    for obs_name, df in characteristics.items():
+        pd.testing.assert_frame_equal(loaded[obs_name], df)
+    # Metric names containing underscores are not split.
+    assert columns.to_dict("records")[-1] == {
+        "observable": "c_FOS_mRNA",
+        "condition": "HRG-low",
+        "metric": "half_decay_time",
+        "normalization": None,
+    }
+    assert columns["normalization"][0] == normalization["Phosphorylated_ERK"]
+    # Conditions containing the separator of column names are rejected.
+    with pytest.raises(ValueError, match="must not contain '_'"):
+        extract_features(
+            time_courses,
+            patients,
+            ["EGF_low"],
+            {"EGF_low": ["max"]},
+            response_characteristics,
+        )
+    with pytest.raises(ValueError, match="must not contain '_'"):
+        save_features(path, characteristics, {"Phosphorylated_ERK": {"EGF_low": ["max"]}})
@@ -0,0 +1,268 @@
+import hashlib
+import multiprocessing
+import os
+import pathlib
+import tarfile
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pasmopy.transcriptome
+from pasmopy import Individualization
+from pasmopy.individualization import active_patient
+
+GENE_EXPRESSION: Dict[str, List[str]] = {
+    "ErbB1": ["EGFR"],
+    "Shc": ["SHC1", "SHC2", "SHC3"],
+    "RasGAP": ["RASA1", "RASA2"],
+    "DUSP": ["DUSP5", "DUSP6", "DUSP7"],
+}
+GENES: List[str] = [gene for genes in GENE_EXPRESSION.values() for gene in genes]
+SAMPLES: List[str] = ["patient1", "patient2", "patient3"]
+PARAMETERS: List[str] = ["k1", "V291", "k2"] + [f"w_{gene}" for gene in GENES] + ["k3"]
+SPECIES: List[str] = ["EGF", "ErbB1", "Shc", "RasGAP", "DUSP"]
+
+
+def _write_transcriptome(dirname: str) -> str:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        rng.uniform(0.5, 2.0, (len(GENES) + 2, len(SAMPLES))),
+        index=GENES + ["GAPDH", "ACTB"],
+        columns=SAMPLES,
+    )
+    df.index.name = "Description"
+    path = os.path.join(dirname, "transcriptome.csv")
+    df.to_csv(path)
+    return path
+
+
+def _individualization(dirname: str, **kwargs) -> Individualization:
+    kwargs.setdefault("cache_dir", os.path.join(dirname, "cache"))
+    return Individualization(
+        parameters=PARAMETERS,
+        species=SPECIES,
+        transcriptomic_data=_write_transcriptome(dirname),
+        gene_expression=GENE_EXPRESSION,
+        read_csv_kws={"index_col": "Description"},
+        **kwargs,
+    )
+
+
+def _reference_weighted_sum(indiv: Individualization, id: str, x: List[float]) -> dict:
+    weighted_sum = dict.fromkeys(indiv.gene_expression, 0.0)
+    for protein, genes in indiv.gene_expression.items():
+        for gene in genes:
+            weighted_sum[protein] += (
+                x[indiv.parameters.index(indiv.prefix + gene)]
+                * indiv.expression_level.at[gene, id]
+            )
+    return weighted_sum
+
+
+def test_as_reaction_rate(tmp_path):
+    indiv = _individualization(str(tmp_path))
+    x = list(np.random.default_rng(1).uniform(0.1, 10, len(PARAMETERS)))
+    for patient in SAMPLES:
+        expected = x[PARAMETERS.index("V291")] * _reference_weighted_sum(indiv, patient, x)["DUSP"]
+        assert np.isclose(indiv.as_reaction_rate(patient, x, "V291", "DUSP"), expected)
+        # numpy arrays are accepted as well as lists
+        assert np.isclose(indiv.as_reaction_rate(patient, np.array(x), "V291", "DUSP"), expected)
+
+
+def test_as_initial_conditions(tmp_path):
+    indiv = _individualization(str(tmp_path))
+    x = list(np.random.default_rng(2).uniform(0.1, 10, len(PARAMETERS)))
+    for patient in SAMPLES:
+        y0 = [1.0, 2.0, 3.0, 4.0, 5.0]
+        weighted_sum = _reference_weighted_sum(indiv, patient, x)
+        expected = [y0[SPECIES.index(s)] * weighted_sum.get(s, 1.0) for s in SPECIES]
+        assert np.allclose(indiv.as_initial_conditions(patient, x, y0), expected)
+
+
+def test_active_patient(tmp_path):
+    indiv = _individualization(str(tmp_path))
+    x = list(np.random.default_rng(3).uniform(0.1, 10, len(PARAMETERS)))
+    with active_patient("patient2"):
+        assert indiv.as_reaction_rate(None, x, "V291", "DUSP") == indiv.as_reaction_rate(
+            "patient2", x, "V291", "DUSP"
+        )
+        # Another patient is not silently replaced.
+        with pytest.raises(ValueError, match="active_patient"):
+            indiv.as_reaction_rate("patient1", x, "V291", "DUSP")
+    with pytest.raises(ValueError, match="No ID"):
+        indiv.as_reaction_rate(None, x, "V291", "DUSP")
+
+
+def test_as_cohort(tmp_path):
+    indiv = _individualization(str(tmp_path))
+    rng = np.random.default_rng(3)
+    y0 = [1.0, 2.0, 3.0, 4.0, 5.0]
+    candidates = rng.uniform(0.1, 10, (4, len(PARAMETERS)))
+    x_cohort, y0_cohort = indiv.as_cohort(SAMPLES, candidates, y0, {"V291": "DUSP"})
+    assert x_cohort.shape == (4, len(SAMPLES), len(PARAMETERS))
+    assert y0_cohort.shape == (4, len(SAMPLES), len(SPECIES))
+    for k, x in enumerate(candidates):
+        x_single, y0_single = indiv.as_cohort(SAMPLES, x, y0, {"V291": "DUSP"})
+        assert np.allclose(x_single, x_cohort[k])
+        assert np.allclose(y0_single, y0_cohort[k])
+        for i, patient in enumerate(SAMPLES):
+            expected_x = list(x)
+            expected_x[PARAMETERS.index("V291")] = indiv.as_reaction_rate(
+                patient, list(x), "V291", "DUSP"
+            )
+            assert np.allclose(x_cohort[k, i], expected_x)
+            assert np.allclose(
+                y0_cohort[k, i], indiv.as_initial_conditions(patient, expected_x, list(y0))
+            )
+    # A single x for a stack of initial values
+    y0_stack = rng.uniform(0.1, 10, (3, len(SPECIES)))
+    x_cohort, y0_cohort = indiv.as_cohort(SAMPLES, candidates[0], y0_stack)
+    assert x_cohort.shape == (3, len(SAMPLES), len(PARAMETERS))
+    for k, y0 in enumerate(y0_stack):
+        assert np.allclose(y0_cohort[k], indiv.as_cohort(SAMPLES, candidates[0], y0)[1])
+    with pytest.raises(ValueError, match="stacks of 4 and 3 candidates"):
+        indiv.as_cohort(SAMPLES, candidates, y0_stack)
+
+
+def test_pruned_loading(tmp_path):
+    indiv = _individualization(str(tmp_path), samples=["patient2"], cache=False)
+    assert list(indiv.expression_level.index) == GENES
+    assert list(indiv.expression_level.columns) == ["patient2"]
+    assert not os.path.isdir(os.path.join(str(tmp_path), "cache"))
+    full = pd.read_csv(os.path.join(str(tmp_path), "transcriptome.csv"), index_col="Description")
+    assert np.array_equal(indiv.expression_level.to_numpy(), full.loc[GENES, ["patient2"]])
+
+
+def test_binary_cache(tmp_path, monkeypatch):
+    x = list(np.random.default_rng(4).uniform(0.1, 10, len(PARAMETERS)))
+    parsed = _individualization(str(tmp_path))
+    assert os.listdir(os.path.join(str(tmp_path), "cache", "tables"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV must not be parsed when the cache is valid.")
+
+    monkeypatch.setattr(pasmopy.transcriptome, "read_pruned_csv", fail)
+    pasmopy.transcriptome.clear_registry()
+    cached = Individualization(
+        parameters=PARAMETERS,
+        species=SPECIES,
+        transcriptomic_data=os.path.join(str(tmp_path), "transcriptome.csv"),
+        gene_expression=GENE_EXPRESSION,
+        read_csv_kws={"index_col": "Description"},
+        cache_dir=os.path.join(str(tmp_path), "cache"),
+    )
+    pd.testing.assert_frame_equal(cached.expression_level, parsed.expression_level)
+    for patient in SAMPLES:
+        assert cached.as_initial_conditions(patient, x, [1.0] * 5) == (
+            parsed.as_initial_conditions(patient, x, [1.0] * 5)
+        )
+
+
+def test_shared_expression_level(tmp_path):
+    pasmopy.transcriptome.clear_registry()
+    first = _individualization(str(tmp_path), cache=False)
+    second = _individualization(str(tmp_path), cache=False)
+    assert first.expression_level is second.expression_level
+
+    with pasmopy.transcriptome.share_expression_levels() as shared:
+        assert len(shared) == 1
+        expected = first.expression_level.to_numpy()
+        # Workers must not need the file once the table is published.
+        os.remove(os.path.join(str(tmp_path), "transcriptome.csv"))
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(
+            1,
+            initializer=pasmopy.transcriptome.attach_expression_levels,
+            initargs=(shared,),
+        ) as p:
+            values = p.apply(_expression_level_in_worker, (str(tmp_path),))
+    assert np.array_equal(values, expected)
+    pasmopy.transcriptome.clear_registry()
+
+
+def _expression_level_in_worker(dirname: str) -> np.ndarray:
+    indiv = Individualization(
+        parameters=PARAMETERS,
+        species=SPECIES,
+        transcriptomic_data=os.path.join(dirname, "transcriptome.csv"),
+        gene_expression=GENE_EXPRESSION,
+        read_csv_kws={"index_col": "Description"},
+        cache=False,
+    )
+    return indiv.expression_level.to_numpy().copy()
+
+
+def test_remote_archive_cache(tmp_path):
+    pasmopy.transcriptome.clear_registry()
+    dirname = str(tmp_path)
+    csv = _write_transcriptome(dirname)
+    archive = os.path.join(dirname, "transcriptome.tar.xz")
+    with tarfile.open(archive, mode="w:xz") as tar:
+        tar.add(csv, arcname="transcriptome.csv")
+    with open(archive, mode="rb") as f:
+        checksum = "sha256:" + hashlib.sha256(f.read()).hexdigest()
+    url = pathlib.Path(archive).as_uri()
+    kwargs = dict(
+        parameters=PARAMETERS,
+        species=SPECIES,
+        transcriptomic_data=url,
+        gene_expression=GENE_EXPRESSION,
+        read_csv_kws={"index_col": "Description"},
+        cache_dir=os.path.join(dirname, "cache"),
+    )
+    downloaded = Individualization(checksum=checksum, **kwargs)
+    expected = pd.read_csv(csv, index_col="Description").loc[GENES]
+    assert np.array_equal(downloaded.expression_level.to_numpy(), expected.to_numpy())
+    # The archive is served from the cache from now on.
+    os.remove(archive)
+    pasmopy.transcriptome.clear_registry()
+    cached = Individualization(offline=True, **kwargs)
+    pd.testing.assert_frame_equal(cached.expression_level, downloaded.expression_level)
+
+    kwargs["transcriptomic_data"] = pathlib.Path(os.path.join(dirname, "missing.csv")).as_uri()
+    with pytest.raises(FileNotFoundError):
+        Individualization(offline=True, **kwargs)
+    kwargs["transcriptomic_data"] = pathlib.Path(csv).as_uri()
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        Individualization(checksum=checksum, **kwargs)
+    # Not ignored without the cache
+    kwargs["cache"] = False
+    with pytest.raises(FileNotFoundError):
+        Individualization(offline=True, **kwargs)
+    with pytest.raises(ValueError, match="requires a cache_dir"):
+        Individualization(checksum=checksum, **kwargs)
+    kwargs["transcriptomic_data"] = csv
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        Individualization(checksum=checksum, **kwargs)
+    pasmopy.transcriptome.clear_registry()
+
+
+def test_jacobian(tmp_path):
+    indiv = _individualization(str(tmp_path))
+    x = np.random.default_rng(5).uniform(0.1, 10, len(PARAMETERS))
+    y0 = [1.0, 2.0, 3.0, 4.0, 5.0]
+    weights = [PARAMETERS.index(f"w_{gene}") for gene in GENES]
+    eps = 1e-6
+    for patient in SAMPLES:
+        rate_jac = indiv.reaction_rate_jacobian(patient, list(x), "V291", "DUSP").toarray()
+        ic_jac = indiv.initial_conditions_jacobian(patient, list(x), y0).toarray()
+        assert rate_jac.shape == (1, len(PARAMETERS))
+        assert ic_jac.shape == (len(SPECIES), len(PARAMETERS))
+        for j in range(len(PARAMETERS)):
+            if j not in weights:
+                assert not rate_jac[:, j].any() and not ic_jac[:, j].any()
+                continue
+            x_eps = x.copy()
+            x_eps[j] += eps
+            fd_rate = (
+                indiv.as_reaction_rate(patient, x_eps, "V291", "DUSP")
+                - indiv.as_reaction_rate(patient, x, "V291", "DUSP")
+            ) / eps
+            fd_ic = (
+                np.array(indiv.as_initial_conditions(patient, x_eps, list(y0)))
+                - np.array(indiv.as_initial_conditions(patient, x, list(y0)))
+            ) / eps
+            assert np.isclose(rate_jac[0, j], fd_rate, rtol=1e-5)
+            assert np.allclose(ic_jac[:, j], fd_ic, rtol=1e-5)
@@ -0,0 +1,76 @@
+import os
+from typing import List
+
+import pytest
+from threadpoolctl import threadpool_info
+
+from pasmopy import parallel
+from pasmopy.parallel import (
+    WorkerPool,
+    auto_n_proc,
+    available_cpus,
+    available_memory,
+    peak_rss,
+)
+
+
+def _cgroup(root, files):
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        with open(os.path.join(root, name), mode="w") as f:
+            f.write(content)
+
+
+def _affinity():
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+
+@pytest.mark.parametrize(
+    "files, n_cpus",
+    [
+        ({}, None),
+        ({"cpu.max": "max 100000\n"}, None),
+        ({"cpu.max": "150000 100000\n"}, 2),
+        ({"cpu/cpu.cfs_quota_us": "50000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 1),
+        ({"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"}, None),
+    ],
+)
+def test_available_cpus(tmp_path, monkeypatch, files, n_cpus):
+    monkeypatch.setattr(parallel, "_CGROUP", str(tmp_path))
+    _cgroup(str(tmp_path), files)
+    assert available_cpus() == (_affinity() if n_cpus is None else min(n_cpus, _affinity()))
+
+
+def test_available_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel, "_CGROUP", str(tmp_path))
+    _cgroup(str(tmp_path), {"memory.max": "max\n", "memory.current": "100\n"})
+    # Not limited by cgroup, from /proc/meminfo if available
+    assert available_memory() is None or available_memory() > 0
+    _cgroup(str(tmp_path), {"memory.max": f"{2 * 2**30}\n", "memory.current": f"{2**29}\n"})
+    assert available_memory() == 3 * 2**29
+    assert peak_rss() > 0
+    # Four workers of 256 MiB fit in 80% of 1.5 GiB.
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 64)
+    assert auto_n_proc(2**28) == 4
+    assert auto_n_proc(2**40) == 1
+    assert auto_n_proc() == 63
+
+
+def _blas_threads(_) -> List[int]:
+    return [info["num_threads"] for info in threadpool_info() if info["user_api"] == "blas"]
+
+
+@pytest.mark.parametrize("n_threads", [1, 3])
+def test_thread_limits(n_threads):
+    environ = dict(os.environ)
+    # Effective in the worker, although numpy is imported before the initializer runs.
+    with WorkerPool(n_proc=1, threads_per_worker=n_threads) as pool:
+        limits = list(pool.imap(_blas_threads, [None]))[0]
+    assert limits and all(limit == n_threads for limit in limits)
+    # The parent process is left unchanged.
+    assert dict(os.environ) == environ
+
+
+def test_preload_failure():
+    with pytest.warns(RuntimeWarning, match="Could not import no_such_model"):
+        parallel._initialize_worker(["no_such_model"], [])
@@ -0,0 +1,787 @@
+import copy
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import replace
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.toy_cohort import N_PARAMSETS, PATIENTS, build_toy_model
+from biomass.dynamics.solver import solve_ode
+
+import pasmopy.patient_model
+from pasmopy import (
+    PatientModelAnalyses,
+    PatientModelSimulations,
+    PatientOverlay,
+    Profiling,
+    WorkerPool,
+)
+from pasmopy.clustering import Subtypes
+from pasmopy.features import load_features
+from pasmopy.parallel import auto_n_proc
+from pasmopy.patient_model import (
+    InSilico,
+    _execute_indexed,
+    _ParamsetTask,
+    _retry_solver,
+    _with_solver,
+)
+from pasmopy.store import CohortStore
+
+
+@pytest.fixture(scope="module")
+def toy_cohort(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("cohort"))
+    sys.path.insert(0, root)
+    cwd = os.getcwd()
+    try:
+        os.chdir(root)
+        build_toy_model(root)
+        # Simulation results read by tests that do not simulate themselves
+        PatientModelSimulations("toy_models", PATIENTS).run(n_proc=2, progress=False)
+        PatientModelSimulations("toy_models.toy", _overlays()).run(n_proc=2, progress=False)
+        yield root
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(root)
+
+
+def _overlays(dirname: str = "overlays") -> List[PatientOverlay]:
+    return [PatientOverlay(patient, os.path.join(dirname, patient)) for patient in PATIENTS]
+
+
+def _load_simulations(path: str) -> np.ndarray:
+    return np.load(os.path.join(path, "simulation_data", "simulations_all.npy"))
+
+
+def test_patient_model_simulations(toy_cohort):
+    simulations = PatientModelSimulations("toy_models", PATIENTS)
+    assert simulations.run(n_proc=2, progress=False) is None
+    for patient in PATIENTS:
+        assert _load_simulations(os.path.join("toy_models", patient)).shape == (
+            2,
+            N_PARAMSETS,
+            2,
+            61,
+        )
+    assert not np.allclose(
+        _load_simulations(os.path.join("toy_models", "P1")),
+        _load_simulations(os.path.join("toy_models", "P2")),
+    )
+
+
+def test_patient_overlay(toy_cohort):
+    simulations = PatientModelSimulations("toy_models.toy", _overlays())
+    assert simulations.run(n_proc=2, progress=False) is None
+    for patient in PATIENTS:
+        # Identical to the simulations of the patient-specific copies of the model.
+        assert np.allclose(
+            _load_simulations(os.path.join("overlays", patient)),
+            _load_simulations(os.path.join("toy_models", patient)),
+            equal_nan=True,
+        )
+
+
+def test_overlay_models(toy_cohort):
+    simulations = PatientModelSimulations("toy_models.toy", _overlays())
+    models = [simulations._create_model(patient) for patient in simulations.patients]
+    assert [model.path for model in models] == [p.path for p in simulations.patients]
+    # Simulations are written into the problem, which must not be shared.
+    assert models[0].problem is not models[1].problem
+    assert models[0].problem.simulations is not models[1].problem.simulations
+
+
+def test_worker_pool(toy_cohort):
+    with WorkerPool(n_proc=2, preload=["toy_models.toy"]) as pool:
+        for _ in range(2):
+            PatientModelSimulations("toy_models.toy", _overlays()).run(pool=pool, progress=False)
+            assert pool.started
+    assert not pool.started
+
+
+def test_schedule_without_history():
+    # Classes without runtime_history execute patients in list order.
+    cohort = InSilico("toy_models", PATIENTS)
+    assert cohort._schedule(cohort.patients, "_run_single_patient") == [0, 1, 2]
+    cohort._record_runtimes("_run_single_patient", {"P1": 1.0})
+    assert cohort._load_history() == {}
+
+
+def test_runtime_history(toy_cohort):
+    # Not recorded unless requested
+    assert not os.path.isfile(os.path.join("toy_models", "toy", "runtime_history.json"))
+    history_file = os.path.join("history", "runtime_history.json")
+    simulations = PatientModelSimulations(
+        "toy_models.toy", _overlays(), runtime_history=history_file
+    )
+    assert replace(simulations, patients=PATIENTS[:1]).runtime_history == history_file
+    # Nothing recorded, all patients have the same number of parameter sets.
+    assert simulations._schedule(simulations.patients, "_run_single_patient") == [0, 1, 2]
+    simulations.run(n_proc=2, progress=False)
+    with open(history_file) as f:
+        history = json.load(f)
+    assert sorted(history["_run_single_patient"]) == PATIENTS
+    assert all(t > 0 for t in history["_run_single_patient"].values())
+    # P2 is estimated from seconds per parameter set of the others.
+    simulations._record_runtimes("task", {"P1": 1.0, "P3": 5.0})
+    assert simulations._schedule(simulations.patients, "task") == [2, 1, 0]
+    for paramset in range(1, 7):
+        shutil.copytree(
+            os.path.join("overlays", "P1", "out", "1"),
+            os.path.join("scheduled", "P4", "out", str(paramset)),
+        )
+    # P4 has twice as many parameter sets.
+    patients = _overlays()[1:] + [PatientOverlay("P4", os.path.join("scheduled", "P4"))]
+    assert simulations._schedule(patients, "task") == [2, 0, 1]
+    simulations.runtime_history = None
+    assert simulations._schedule(simulations.patients, "task") == [0, 1, 2]
+
+
+def test_split_paramsets(toy_cohort):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("split", patient, "out")
+        )
+    PatientModelSimulations("toy_models.toy", _overlays()).run(n_proc=2, progress=False)
+    simulations = PatientModelSimulations(
+        "toy_models.toy", _overlays("split")[:1], runtime_history="split_history.json"
+    )
+    assert simulations.run(n_proc=3, progress=False, split_paramsets=True) is None
+    with open("split_history.json") as f:
+        assert sorted(json.load(f)["_simulate_paramset"]) == [
+            f"P1/{paramset}" for paramset in range(1, N_PARAMSETS + 1)
+        ]
+    np.testing.assert_array_equal(
+        _load_simulations(os.path.join("split", "P1")),
+        _load_simulations(os.path.join("overlays", "P1")),
+    )
+    assert not os.path.isdir(os.path.join("split", "P1", "simulation_data", "paramsets"))
+    assert os.path.isfile(os.path.join("split", "P1", "out", "best_fit_param.txt"))
+    assert os.path.isdir(os.path.join("split", "P1", "figure"))
+    assert simulations._is_fresh(simulations.patients[0])
+
+    biomass_kws = {"target": "parameter", "metric": "maximum", "style": "barplot"}
+    coefficients = os.path.join("sensitivity_coefficients", "parameter", "maximum.npy")
+    PatientModelAnalyses("toy_models.toy", _overlays()[:1], biomass_kws=dict(biomass_kws)).run(
+        n_proc=2, progress=False
+    )
+    PatientModelAnalyses(
+        "toy_models.toy", _overlays("split")[:1], biomass_kws=dict(biomass_kws)
+    ).run(n_proc=3, progress=False, split_paramsets=True)
+    np.testing.assert_allclose(
+        np.load(os.path.join("split", "P1", coefficients)),
+        np.load(os.path.join("overlays", "P1", coefficients)),
+    )
+    assert not os.path.isdir(os.path.join("split", "P1", "sensitivity_coefficients", "paramsets"))
+    # A parameter set that failed is left out with a warning, not the whole patient.
+    analyses = PatientModelAnalyses(
+        "toy_models.toy", _overlays("split")[1:2], biomass_kws=dict(biomass_kws)
+    )
+    for paramset in range(1, N_PARAMSETS):
+        analyses._analyze_paramset(_ParamsetTask(analyses.patients[0], paramset))
+    with pytest.warns(RuntimeWarning, match=f"#{N_PARAMSETS:d}"):
+        analyses._reduce_single_patient(analyses.patients[0])
+    assembled = np.load(os.path.join("split", "P2", coefficients))
+    failed = analyses._create_model(analyses.patients[0]).get_executable().index(N_PARAMSETS)
+    assert assembled.shape[0] == N_PARAMSETS
+    assert np.isnan(assembled[failed]).all()
+    assert not np.isnan(np.delete(assembled, failed, axis=0)).any()
+
+
+def test_execute_indexed():
+    _, _, elapsed, failure, stats = _execute_indexed(time.sleep, (0, 10.0), timeout=0.1)
+    assert stats is None
+    assert isinstance(failure[0], TimeoutError)
+    assert failure[2] == 1
+    assert 0.1 <= elapsed < 5.0
+
+    def stiff(patient):
+        method = (_retry_solver.get() or {}).get("method", "LSODA")
+        if method == "LSODA":
+            raise RuntimeError(f"{patient} is stiff.")
+        return method
+
+    assert _execute_indexed(stiff, (3, "P1"), retries=1, retry_solver={"method": "BDF"})[1] == (
+        "BDF"
+    )
+    assert _retry_solver.get() is None
+    i, result, _, failure, _ = _execute_indexed(stiff, (3, "P1"), retries=2)
+    assert (i, result) == (3, None)
+    assert "P1 is stiff." in failure[1]
+    assert failure[2] == 3
+
+
+def test_retry_solver(toy_cohort):
+    simulations = PatientModelSimulations("toy_models.toy", _overlays())
+    token = _retry_solver.set({"method": "unknown"})
+    try:
+        retried = simulations._create_model(simulations.patients[0])
+    finally:
+        _retry_solver.reset(token)
+    model = simulations._create_model(simulations.patients[0])
+    # The options reach solve_ode of the retried model only.
+    with pytest.raises(ValueError, match="`method` must be one of"):
+        retried.problem.simulate(retried.pval(), retried.ival())
+    assert model.problem.simulate(model.pval(), model.ival()) is None
+    assert retried.path == model.path
+    assert solve_ode.__kwdefaults__["method"] == "LSODA"
+
+
+class _Problem:
+    def simulate(self, x, y0):
+        return None
+
+
+class _ProblemWithOptions(_Problem):
+    solver_options: dict = {"rtol": 1e-6}
+
+
+def test_retry_solver_hooks():
+    # Models reading solver_options get the arguments there.
+    model = _with_solver(SimpleNamespace(problem=_ProblemWithOptions()), method="BDF")
+    assert model.problem.solver_options == {"rtol": 1e-6, "method": "BDF"}
+    assert _ProblemWithOptions.solver_options == {"rtol": 1e-6}
+    # Other models cannot be retried with other solver options.
+    with pytest.raises(ValueError, match="retry_solver cannot be applied"):
+        _with_solver(SimpleNamespace(path="toy", problem=_Problem()), method="BDF")
+
+
+def test_negative_retries(toy_cohort):
+    with pytest.raises(ValueError, match="retries"):
+        PatientModelSimulations("toy_models.toy", _overlays()).run(progress=False, retries=-1)
+    with pytest.raises(ValueError, match="retries"):
+        PatientModelAnalyses("toy_models.toy", _overlays()).run(progress=False, retries=-1)
+
+
+def test_failure_isolation(toy_cohort):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("failing", patient, "out")
+        )
+    with open(os.path.join("failing", "P3", "out", "1", "fit_param1.npy"), mode="w") as f:
+        f.write("broken")
+    simulations = PatientModelSimulations("toy_models.toy", _overlays("failing"))
+    with pytest.warns(RuntimeWarning, match="Failed: P3"):
+        assert simulations.run(n_proc=2, progress=False, retries=1) is None
+    assert [failure.patient for failure in simulations.failures] == ["P3"]
+    assert simulations.failures[0].attempts == 2
+    assert simulations.failures[0].elapsed > 0
+    for patient in ["P1", "P2"]:
+        assert os.path.isfile(
+            os.path.join("failing", patient, "simulation_data", "simulations_all.npy")
+        )
+    # Only the broken parameter set fails and is left out of the patient's results.
+    with pytest.warns(RuntimeWarning, match="Failed: P3/1"):
+        simulations.run(n_proc=2, progress=False, split_paramsets=True)
+    assert [failure.patient for failure in simulations.failures] == ["P3/1"]
+    simulations_all = _load_simulations(os.path.join("failing", "P3"))
+    assert np.isnan(simulations_all).any() and not np.isnan(simulations_all).all()
+
+
+def test_auto_n_proc(toy_cohort, monkeypatch):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("auto", patient, "out")
+        )
+    simulations = PatientModelSimulations("toy_models.toy", _overlays("auto"))
+    assert simulations.run(n_proc="auto", progress=False) is None
+    assert not simulations.failures
+    for patient in PATIENTS:
+        np.testing.assert_array_equal(
+            _load_simulations(os.path.join("auto", patient)),
+            _load_simulations(os.path.join("overlays", patient)),
+        )
+    characteristics = simulations.extract_characteristics(
+        {"Phosphorylated_E": {"high": ["max"]}}, progress=False, n_proc="auto"
+    )
+    assert list(characteristics["Phosphorylated_E"].index) == PATIENTS
+    # Parameter sets and their reduction run in one pool, sized by one probe.
+    probes = []
+    monkeypatch.setattr(
+        pasmopy.patient_model,
+        "auto_n_proc",
+        lambda rss: probes.append(rss) or auto_n_proc(rss),
+    )
+    simulations.run(n_proc="auto", progress=False, split_paramsets=True)
+    assert not simulations.failures
+    assert len(probes) == 1
+    for patient in PATIENTS:
+        np.testing.assert_array_equal(
+            _load_simulations(os.path.join("auto", patient)),
+            _load_simulations(os.path.join("overlays", patient)),
+        )
+
+
+def test_incremental_run(toy_cohort):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("incremental", patient, "out")
+        )
+
+    def simulated_at():
+        return {
+            patient: os.stat(
+                os.path.join("incremental", patient, "simulation_data", "simulations_all.npy")
+            ).st_mtime_ns
+            for patient in PATIENTS
+        }
+
+    simulations = PatientModelSimulations("toy_models.toy", _overlays("incremental"))
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    before = simulated_at()
+    # Nothing changed.
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    assert simulated_at() == before
+    # Modify the parameter sets of P2 only.
+    shutil.copytree(
+        os.path.join("incremental", "P2", "out", "1"),
+        os.path.join("incremental", "P2", "out", "4"),
+    )
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    after = simulated_at()
+    assert after["P2"] != before["P2"]
+    assert {p: t for p, t in after.items() if p != "P2"} == {
+        p: t for p, t in before.items() if p != "P2"
+    }
+
+
+def test_manifest(toy_cohort):
+    shutil.copytree(os.path.join("toy_models", "P1"), os.path.join("manifest", "P1"))
+    simulations = PatientModelSimulations("manifest", ["P1"])
+    before = simulations._manifest("P1")["model"]
+    # Outputs are not model code, ...
+    for dirname in ["out", "simulation_data"]:
+        os.makedirs(os.path.join("manifest", "P1", dirname), exist_ok=True)
+        with open(os.path.join("manifest", "P1", dirname, "notes.py"), mode="w") as f:
+            f.write("# not model code\n")
+    assert simulations._manifest("P1")["model"] == before
+    # ... but modules whose names start alike are.
+    with open(os.path.join("manifest", "P1", "outer.py"), mode="w") as f:
+        f.write("# model code\n")
+    assert simulations._manifest("P1")["model"] != before
+
+
+def test_parallel_extraction(toy_cohort):
+    simulations = PatientModelSimulations("toy_models.toy", _overlays())
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    dynamical_features = {
+        "Phosphorylated_E": {"high": ["max", "AUC"], "low": ["max"]},
+        "Active_receptor": {"high": ["max"]},
+    }
+    normalization = {"Phosphorylated_E": {"timepoint": None, "condition": []}}
+    characteristics = {}
+    for n_proc in [1, 2]:
+        simulations.subtyping(
+            None, dynamical_features, normalization, progress=False, n_proc=n_proc
+        )
+        characteristics[n_proc] = {
+            obs_name: pd.read_csv(
+                os.path.join("classification", f"{obs_name}.csv"), index_col="Sample"
+            )
+            for obs_name in dynamical_features
+        }
+    for obs_name in dynamical_features:
+        pd.testing.assert_frame_equal(characteristics[1][obs_name], characteristics[2][obs_name])
+    typed = simulations.extract_characteristics(
+        dynamical_features, normalization, progress=False, n_proc=1
+    )
+    for obs_name, df in typed.items():
+        assert (df.dtypes == float).all()
+        pd.testing.assert_frame_equal(df, characteristics[2][obs_name])
+    df = characteristics[2]["Phosphorylated_E"]
+    assert list(df.index) == PATIENTS
+    assert list(df.columns) == ["high_max", "high_AUC", "low_max"]
+    for patient in PATIENTS:
+        data = _load_simulations(os.path.join("overlays", patient))[0]
+        data = np.nanmean(data / np.nanmax(data, axis=(1, 2), keepdims=True), axis=0)
+        assert np.isclose(df.loc[patient, "high_max"], np.max(data[0]) / np.max(data))
+
+
+def test_unpicklable_metric(toy_cohort):
+    simulations = PatientModelSimulations("toy_models.toy", _overlays())
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    simulations.response_characteristics["range"] = lambda x: np.max(x) - np.min(x)
+    df = simulations.extract_characteristics(
+        {"Phosphorylated_E": {"high": ["max", "range"]}}, progress=False, n_proc=2
+    )["Phosphorylated_E"]
+    assert list(df.index) == PATIENTS
+    assert (df["high_range"] > 0).all()
+    assert (df["high_range"] <= df["high_max"]).all()
+
+
+def _normalize_reference(data, patient_specific, obs_name, normalization):
+    # PatientModelSimulations._normalize before vectorization
+    if not normalization[obs_name]["condition"]:
+        normalization[obs_name]["condition"] = patient_specific.problem.conditions
+    for i in range(data.shape[0]):
+        if not np.isnan(data[i]).all() and not np.all(data[i] == 0.0):
+            data[i] /= (
+                data[i][
+                    [
+                        patient_specific.problem.conditions.index(c)
+                        for c in normalization[obs_name]["condition"]
+                    ],
+                    normalization[obs_name]["timepoint"],
+                ]
+                if normalization[obs_name]["timepoint"] is not None
+                else np.nanmax(
+                    data[i][
+                        [
+                            patient_specific.problem.conditions.index(c)
+                            for c in normalization[obs_name]["condition"]
+                        ],
+                    ]
+                )
+            )
+    data = np.nanmean(data, axis=0)
+    norm_max: float = np.max(
+        data[
+            [
+                patient_specific.problem.conditions.index(c)
+                for c in normalization[obs_name]["condition"]
+            ],
+        ]
+    )
+    if normalization[obs_name]["timepoint"] is None and norm_max != 0.0:
+        data /= norm_max
+    return data
+
+
+@pytest.mark.parametrize(
+    "timepoint, condition",
+    [(None, []), (None, ["EGF", "HRG"]), (None, ["HRG"]), (10, ["EGF"]), (0, ["HRG"])],
+)
+def test_normalize(timepoint, condition):
+    rng = np.random.default_rng(0)
+    conditions = ["EGF", "HRG", "TGF"]
+    patient_specific = SimpleNamespace(problem=SimpleNamespace(conditions=conditions))
+    # (patients, parameter sets, conditions, time)
+    data = rng.uniform(0.0, 1.0, (4, 6, 3, 21))
+    data[0, 1] = np.nan
+    data[1, 2] = 0.0
+    data[2, 3, :, 5:] = np.nan
+    data[3, 4, 1] = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.stack(
+            [
+                _normalize_reference(
+                    patient.copy(),
+                    patient_specific,
+                    "obs",
+                    {"obs": {"timepoint": timepoint, "condition": list(condition)}},
+                )
+                for patient in data
+            ]
+        )
+        for patient, reference in zip(data, expected):
+            np.testing.assert_allclose(
+                PatientModelSimulations._normalize(
+                    patient.copy(),
+                    conditions,
+                    "obs",
+                    {"obs": {"timepoint": timepoint, "condition": list(condition)}},
+                ),
+                reference,
+            )
+        # All patients at once; read-only (e.g., memory-mapped) input is left intact
+        data.flags.writeable = False
+        normalized = PatientModelSimulations._normalize(
+            data,
+            conditions,
+            "obs",
+            {"obs": {"timepoint": timepoint, "condition": list(condition)}},
+        )
+    np.testing.assert_allclose(normalized, expected)
+    assert np.isnan(data[0, 1]).all() and np.all(data[1, 2] == 0.0) and np.nanmax(data) < 1.0
+
+
+def test_cohort_store(toy_cohort):
+    dynamical_features = {
+        "Phosphorylated_E": {"high": ["max", "AUC"], "low": ["max"]},
+        "Active_receptor": {"low": ["AUC"]},
+    }
+    normalization = {"Phosphorylated_E": {"timepoint": None, "condition": ["high"]}}
+    simulations = PatientModelSimulations("toy_models.toy", _overlays(), cohort_store="cohort")
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    store = CohortStore("cohort")
+    assert store.patients == PATIENTS
+    assert store.observables == ["Phosphorylated_E", "Active_receptor"]
+    assert store.written().all()
+    for i, patient in enumerate(PATIENTS):
+        np.testing.assert_array_equal(
+            store.read("Active_receptor")[i],
+            _load_simulations(os.path.join("overlays", patient))[1],
+        )
+    from_store = simulations.extract_characteristics(
+        dynamical_features, normalization, progress=False
+    )
+    # Per-patient directories are not read.
+    shutil.move("overlays", "overlays.bak")
+    try:
+        for obs_name, df in simulations.extract_characteristics(
+            dynamical_features, normalization, progress=False
+        ).items():
+            pd.testing.assert_frame_equal(from_store[obs_name], df)
+    finally:
+        shutil.move("overlays.bak", "overlays")
+    from_directories = PatientModelSimulations("toy_models.toy", _overlays())
+    for obs_name, df in from_directories.extract_characteristics(
+        dynamical_features, normalization, progress=False, n_proc=1
+    ).items():
+        pd.testing.assert_frame_equal(from_store[obs_name], df)
+
+
+def test_cohort_store_invalid(toy_cohort):
+    # Nothing to simulate or store
+    PatientModelSimulations("toy_models.toy", [], cohort_store="empty_store").run(progress=False)
+    assert not os.path.exists("empty_store")
+    with pytest.raises(ValueError, match="No patients"):
+        PatientModelSimulations("toy_models.toy", [], cohort_store="empty_store")._create_store()
+    for viz_type in ["original", "experiment"]:
+        with pytest.raises(ValueError, match="viz_type"):
+            PatientModelSimulations(
+                "toy_models.toy",
+                _overlays(),
+                biomass_kws={"viz_type": viz_type},
+                cohort_store="original_store",
+            ).run(progress=False)
+    assert not os.path.exists("original_store")
+
+
+def test_cohort_store_growth(toy_cohort):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("growing", patient, "out")
+        )
+    PatientModelSimulations(
+        "toy_models.toy", _overlays("growing")[:2], cohort_store="growing_store"
+    ).run(n_proc=2, progress=False, incremental=True)
+    # A parameter set is added to P1, and P3 to the cohort.
+    shutil.copytree(
+        os.path.join("growing", "P1", "out", "1"),
+        os.path.join("growing", "P1", "out", f"{N_PARAMSETS + 1:d}"),
+    )
+    simulations = PatientModelSimulations(
+        "toy_models.toy", _overlays("growing"), cohort_store="growing_store"
+    )
+    simulations.run(n_proc=2, progress=False, incremental=True)
+    assert not simulations.failures
+    store = CohortStore("growing_store")
+    assert store.patients == PATIENTS
+    assert store.written().all()
+    assert store.read("Active_receptor").shape[1] == N_PARAMSETS + 1
+    for i, patient in enumerate(PATIENTS):
+        stored = _load_simulations(os.path.join("growing", patient))[1]
+        np.testing.assert_array_equal(store.read("Active_receptor")[i, : len(stored)], stored)
+    characteristics = simulations.extract_characteristics(
+        {"Active_receptor": {"low": ["AUC"]}}, progress=False
+    )
+    assert list(characteristics["Active_receptor"].index) == PATIENTS
+
+
+def test_compact_storage(toy_cohort):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("compact", patient, "out")
+        )
+    dynamical_features = {
+        "Phosphorylated_E": {"high": ["max", "AUC", "time_to_peak"], "low": ["max"]},
+    }
+    normalization = {"Phosphorylated_E": {"timepoint": None, "condition": []}}
+    simulations = PatientModelSimulations(
+        "toy_models.toy",
+        _overlays("compact"),
+        storage_kws={"dtype": "float32", "decimate": 2, "compress": True},
+    )
+    simulations.run(n_proc=2, progress=False)
+    for patient in PATIENTS:
+        files = os.listdir(os.path.join("compact", patient, "simulation_data"))
+        assert "simulations_all.npz" in files and "simulations_all.npy" not in files
+    compact = simulations.extract_characteristics(
+        dynamical_features, normalization, progress=False, n_proc=1
+    )["Phosphorylated_E"]
+    full = PatientModelSimulations("toy_models.toy", _overlays()).extract_characteristics(
+        dynamical_features, normalization, progress=False, n_proc=1
+    )["Phosphorylated_E"]
+    pd.testing.assert_frame_equal(compact, full, rtol=1e-2)
+
+
+def test_compact_storage_original(toy_cohort):
+    shutil.copytree(
+        os.path.join("overlays", "P1", "out"), os.path.join("compact_original", "P1", "out")
+    )
+    # viz_type "original" saves no simulations_all to compact.
+    simulations = PatientModelSimulations(
+        "toy_models.toy",
+        _overlays("compact_original")[:1],
+        biomass_kws={"viz_type": "original"},
+        storage_kws={"dtype": "float32"},
+    )
+    simulations.run(n_proc=1, progress=False, render=False)
+    assert not simulations.failures
+    assert os.path.isfile(
+        os.path.join("compact_original", "P1", "simulation_data", "manifest.json")
+    )
+
+
+def test_data_only_run(toy_cohort):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("data_only", patient, "out")
+        )
+    simulations = PatientModelSimulations("toy_models.toy", _overlays("data_only"))
+    simulations.run(n_proc=2, progress=False, render=False)
+    for patient in PATIENTS:
+        assert not os.path.isdir(os.path.join("data_only", patient, "figure"))
+        np.testing.assert_array_equal(
+            _load_simulations(os.path.join("data_only", patient)),
+            _load_simulations(os.path.join("overlays", patient)),
+        )
+    simulations.render(["P2"], n_proc=2, progress=False)
+    figures = os.path.join("data_only", "P2", "figure", "simulation", "average")
+    assert sorted(os.listdir(figures)) == sorted(
+        os.listdir(os.path.join("overlays", "P2", "figure", "simulation", "average"))
+    )
+    assert not os.path.isdir(os.path.join("data_only", "P1", "figure"))
+    with pytest.raises(NameError):
+        simulations.render(["P4"], n_proc=2, progress=False)
+
+
+def test_streamed_subtyping(toy_cohort):
+    dynamical_features = {
+        "Phosphorylated_E": {"high": ["max", "AUC"], "low": ["max"]},
+        "Active_receptor": {"low": ["AUC"]},
+    }
+    normalization = {"Phosphorylated_E": {"timepoint": None, "condition": []}}
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("streamed", patient, "out")
+        )
+    simulations = PatientModelSimulations("toy_models.toy", _overlays("streamed"))
+    results = list(
+        simulations.stream(
+            dynamical_features,
+            normalization,
+            time_courses=True,
+            save=False,
+            n_proc=2,
+            progress=False,
+        )
+    )
+    assert sorted(result.patient for result in results) == PATIENTS
+    for result in results:
+        assert result.time_courses["Phosphorylated_E"].shape == (2, 61)
+        # Simulation results are not written.
+        assert not os.path.isfile(
+            os.path.join("streamed", result.patient, "simulation_data", "simulations_all.npy")
+        )
+    simulations.subtyping(None, dynamical_features, normalization, results=iter(results))
+    streamed = {
+        obs_name: pd.read_csv(
+            os.path.join("classification", f"{obs_name}.csv"), index_col="Sample"
+        )
+        for obs_name in dynamical_features
+    }
+    from_disk = PatientModelSimulations("toy_models.toy", _overlays()).extract_characteristics(
+        dynamical_features, normalization, progress=False, n_proc=1
+    )
+    for obs_name in dynamical_features:
+        pd.testing.assert_frame_equal(streamed[obs_name], from_disk[obs_name])
+
+
+def test_subtyping_clustering(toy_cohort):
+    simulations = PatientModelSimulations("toy_models.toy", _overlays())
+    subtypes = simulations.subtyping(
+        "subtypes.png",
+        {"Phosphorylated_E": {"high": ["max", "AUC"], "low": ["max", "AUC"]}},
+        {"Phosphorylated_E": {"timepoint": None, "condition": []}},
+        progress=False,
+        n_proc=1,
+        clustering=Subtypes(n_clusters=2),
+    )
+    assert list(subtypes.labels_.index) == PATIENTS
+    assert subtypes.labels_.nunique() == 2
+    assert os.path.isfile("subtypes.png")
+
+
+def test_assign_new_patients(toy_cohort):
+    dynamical_features = {"Phosphorylated_E": {"high": ["max", "AUC"], "low": ["max", "AUC"]}}
+    normalization = {"Phosphorylated_E": {"timepoint": None, "condition": []}}
+    simulations = PatientModelSimulations("toy_models.toy", _overlays()[:2])
+    if os.path.isfile(os.path.join("classification", "subtypes.npz")):
+        os.remove(os.path.join("classification", "subtypes.npz"))
+    with pytest.raises(FileNotFoundError):
+        simulations.assign(_overlays()[2:], progress=False, n_proc=1)
+    simulations.subtyping(
+        None,
+        dynamical_features,
+        copy.deepcopy(normalization),
+        progress=False,
+        n_proc=1,
+        clustering=Subtypes(n_clusters=2),
+    )
+    labels = simulations.assign(_overlays()[2:], progress=False, n_proc=1)
+    assert list(labels.index) == ["P3"]
+    subtypes, metadata = Subtypes.load(os.path.join("classification", "subtypes.npz"))
+    assert metadata == {"dynamical_features": dynamical_features, "normalization": normalization}
+    assert list(subtypes.labels_.index) == PATIENTS
+    df = pd.read_csv(os.path.join("classification", "Phosphorylated_E.csv"), index_col="Sample")
+    assert list(df.index) == PATIENTS
+    # Same characteristics as extracting the whole cohort at once
+    reference = PatientModelSimulations("toy_models.toy", _overlays()).extract_characteristics(
+        dynamical_features, copy.deepcopy(normalization), progress=False, n_proc=1
+    )["Phosphorylated_E"]
+    np.testing.assert_allclose(df.to_numpy(), reference.to_numpy())
+    stored, columns = load_features(os.path.join("classification", "features.npz"))
+    pd.testing.assert_frame_equal(stored["Phosphorylated_E"], reference)
+    assert set(columns["condition"]) == {"high", "low"}
+    labels = simulations.assign(_overlays()[2:], recluster=True, progress=False, n_proc=1)
+    assert list(labels.index) == PATIENTS
+
+
+def test_profiling(toy_cohort, capsys):
+    for patient in PATIENTS:
+        shutil.copytree(
+            os.path.join("overlays", patient, "out"), os.path.join("profiled", patient, "out")
+        )
+    simulations = PatientModelSimulations(
+        "toy_models.toy", _overlays("profiled"), profiling=Profiling(path="profile", n_slowest=2)
+    )
+    assert PatientModelSimulations("toy_models.toy", _overlays()).profiling is None
+    simulations.run(n_proc=2, progress=False)
+    with open(os.path.join("profile", "PatientModelSimulations.run.json")) as f:
+        report = json.load(f)
+    timings = report["tasks"]["_run_single_patient"]
+    assert sorted(timings["patients"]) == PATIENTS
+    assert all(timings["patients"][p]["peak_rss"] > 0 for p in PATIENTS)
+    assert {"model", "integration", "write", "render", "other"} <= set(timings["stages"])
+    assert timings["stages"]["integration"]["total"] > 0
+    # Stages do not add up to more than the wall time of each patient.
+    for patient, timing in timings["patients"].items():
+        assert sum(timing["stages"].values()) <= timing["elapsed"]
+    assert sorted(timings["profiles"]) == sorted(timings["slowest"][:2])
+    dumps = os.path.join("profile", "PatientModelSimulations.run", "_run_single_patient")
+    assert sorted(os.listdir(dumps)) == sorted(f"{p}.prof" for p in timings["slowest"][:2])
+    assert "_run_single_patient (3 patients)" in capsys.readouterr().out
+
+    simulations.profiling = Profiling(path="profile", summary=False)
+    simulations.subtyping(
+        None,
+        {"Phosphorylated_E": {"high": ["max"]}},
+        progress=False,
+        n_proc=2,
+        clustering=Subtypes(n_clusters=2),
+    )
+    with open(os.path.join("profile", "PatientModelSimulations.subtyping.json")) as f:
+        report = json.load(f)
+    assert {"features", "write", "clustering"} <= set(report["stages"])
+    assert {"model", "read", "features"} <= set(report["tasks"]["_extract_time_courses"]["stages"])
+    assert not report["tasks"]["_extract_time_courses"]["profiles"]
+    assert not capsys.readouterr().out
+    assert simulations._report is None
@@ -0,0 +1,45 @@
+import json
+import os
+import time
+
+from pasmopy.profiling import Profiling, _Report, record, stage, summary
+
+
+def test_stages():
+    with stage("outside"):
+        pass
+    with record() as stats:
+        with stage("model"):
+            time.sleep(0.05)
+            with stage("transcriptome"):
+                time.sleep(0.1)
+        with stage("model"):
+            time.sleep(0.05)
+    assert sorted(stats["stages"]) == ["model", "transcriptome"]
+    # Nested stages are not counted twice.
+    assert 0.1 <= stats["stages"]["model"] < 0.15
+    assert 0.1 <= stats["stages"]["transcriptome"] < 0.15
+    assert stats["peak_rss"] > 0
+
+
+def test_report(tmp_path, capsys):
+    profiling = Profiling(path=str(tmp_path), n_slowest=1)
+    report = _Report(profiling, "Test.run")
+    for i, patient in enumerate(["P1", "P2"]):
+        with record(os.path.join(report.profile_dir("task"), f"{i:d}.prof")) as stats:
+            with stage("integration"):
+                time.sleep(0.01 * (i + 1))
+        report.add("task", i, patient, 0.1 * (i + 1), stats, failed=i == 0)
+    written = report.finish({"clustering": 0.5})
+    with open(os.path.join(tmp_path, "Test.run.json")) as f:
+        assert json.load(f) == json.loads(json.dumps(written))
+    task = written["tasks"]["task"]
+    assert task["slowest"] == ["P2", "P1"]
+    assert task["patients"]["P1"]["failed"]
+    assert list(task["profiles"]) == ["P2"]
+    assert os.listdir(os.path.join(tmp_path, "Test.run", "task")) == ["P2.prof"]
+    assert task["stages"]["integration"]["max"] >= 0.02
+    assert task["stages"]["other"]["total"] > 0
+    out = capsys.readouterr().out
+    assert out.strip() == summary(written)
+    assert "P2 (0.20 s" in out and "failed" in out
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+
+from pasmopy.store import CohortStore, compact_simulations, load_simulations
+
+T = list(range(0, 61))
+
+
+def _save(dirname: str) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    # (observables, parameter sets, conditions, time), linear in time
+    data = rng.uniform(0, 1, (2, 3, 2, 1)) * np.array(T) + rng.uniform(0, 1, (2, 3, 2, 1))
+    np.save(os.path.join(dirname, "simulations_all.npy"), data)
+    return data
+
+
+@pytest.mark.parametrize(
+    "storage_kws",
+    [
+        {"dtype": "float32"},
+        {"compress": True},
+        {"decimate": 4},
+        {"decimate": 7, "dtype": "float32", "compress": True},
+        {"t": [0, 10, 30, 60]},
+    ],
+)
+def test_compact_simulations(tmp_path, storage_kws):
+    data = _save(tmp_path)
+    compact_simulations(tmp_path, T, storage_kws)
+    stored = [f for f in os.listdir(tmp_path) if f.startswith("simulations_all")]
+    assert len(stored) == 1
+    loaded = load_simulations(tmp_path)
+    assert loaded.dtype == np.float64 and loaded.shape == data.shape
+    np.testing.assert_allclose(loaded, data, rtol=1e-6 if "dtype" in storage_kws else 1e-12)
+    assert os.path.getsize(os.path.join(tmp_path, stored[0])) <= data.nbytes + 1024
+
+
+def test_uneven_time_points(tmp_path):
+    t = [0.0, 1.0, 2.0, 5.0, 10.0, 20.0, 40.0, 60.0]
+    # Linear in time, thus exactly interpolated in time
+    data = np.linspace(1.0, 2.0, 4).reshape(2, 1, 2, 1) * np.array(t)
+    np.save(os.path.join(tmp_path, "simulations_all.npy"), data)
+    compact_simulations(tmp_path, t, {"t": [0, 10, 60]})
+    np.testing.assert_allclose(load_simulations(tmp_path), data)
+
+
+def test_invalid_time_point(tmp_path):
+    _save(tmp_path)
+    with pytest.raises(ValueError):
+        compact_simulations(tmp_path, T, {"t": [0, 10.5]})
+    with pytest.raises(FileNotFoundError):
+        load_simulations(os.path.join(tmp_path, "missing"))
+
+
+def test_cohort_store_layout(tmp_path):
+    path = os.path.join(tmp_path, "cohort")
+    store = CohortStore.create(path, ["P1", "P2"], ["A", "B"], ["EGF", "HRG"], T, 4)
+    simulations = np.ones((2, 3, 2, len(T)))
+    store.write("P2", simulations)
+    assert store.written().tolist() == [False, True]
+    np.testing.assert_array_equal(store.read("B", ["P2"])[0, :3], simulations[1])
+    assert np.isnan(store.read("B")[1, 3]).all()
+    with pytest.raises(ValueError):
+        store.write("P1", np.ones((2, 5, 2, len(T))))
+    with pytest.raises(NameError):
+        store.read("C")
+    # Reused with the same layout, replaced only if asked to.
+    assert CohortStore.create(path, ["P1", "P2"], ["A", "B"], ["EGF", "HRG"], T, 4).written()[1]
+    with pytest.raises(ValueError, match="different layout"):
+        CohortStore.create(path, ["P1", "P2"], ["A", "C"], ["EGF", "HRG"], T, 4)
+    assert store.written()[1]
+    with open(os.path.join(path, "notes.txt"), mode="w") as f:
+        f.write("kept")
+    replaced = CohortStore.create(path, ["P1", "P3"], ["A"], ["EGF", "HRG"], T, 4, overwrite=True)
+    assert not replaced.written().any()
+    assert sorted(os.listdir(path)) == ["A.npy", "index.json", "notes.txt", "written.npy"]
+
+
+def test_cohort_store_growth(tmp_path):
+    path = os.path.join(tmp_path, "cohort")
+    store = CohortStore.create(path, ["P1", "P2"], ["A", "B"], ["EGF", "HRG"], T, 2)
+    simulations = np.random.default_rng(0).uniform(size=(2, 2, 2, len(T)))
+    store.write("P2", simulations)
+    # A patient and a parameter set are added.
+    grown = CohortStore.create(path, ["P3", "P2"], ["A", "B"], ["EGF", "HRG"], T, 3)
+    assert grown.patients == ["P1", "P2", "P3"]
+    assert grown.written().tolist() == [False, True, False]
+    assert grown.read("A").shape == (3, 3, 2, len(T))
+    np.testing.assert_array_equal(grown.read("B", ["P2"])[0, :2], simulations[1])
+    assert np.isnan(grown.read("B", ["P2"])[0, 2]).all()
+    grown.write("P3", np.ones((2, 3, 2, len(T))))
+    assert grown.written().tolist() == [False, True, True]
+    # Never shrunk
+    reused = CohortStore.create(path, ["P1"], ["A", "B"], ["EGF", "HRG"], T, 1)
+    assert reused.read("A").shape == (3, 3, 2, len(T))
+    assert sorted(os.listdir(path)) == ["A.npy", "B.npy", "index.json", "written.npy"]
+
+
+def test_cohort_store_existing_directory(tmp_path):
+    empty = os.path.join(tmp_path, "empty")
+    os.makedirs(empty)
+    assert CohortStore.create(empty, ["P1"], ["A"], ["EGF"], T, 1).patients == ["P1"]
+    path = os.path.join(tmp_path, "results")
+    os.makedirs(path)
+    with open(os.path.join(path, "notes.txt"), mode="w") as f:
+        f.write("kept")
+    with pytest.raises(FileExistsError):
+        CohortStore.create(path, ["P1"], ["A"], ["EGF"], T, 1)
+    assert os.listdir(path) == ["notes.txt"]
+    CohortStore.create(path, ["P1"], ["A"], ["EGF"], T, 1, overwrite=True)
+    assert os.path.isfile(os.path.join(path, "notes.txt"))